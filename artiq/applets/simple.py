@@ -9,6 +9,7 @@ from quamash import QEventLoop, QtWidgets, QtCore
 from artiq.protocols.sync_struct import Subscriber, process_mod
 from artiq.protocols import pyon
 from artiq.protocols.pipe_ipc import AsyncioChildComm
+from artiq.tools import is_ring_dataset, ring_dataset_view
 
 
 logger = logging.getLogger(__name__)
@@ -179,8 +180,15 @@ class SimpleApplet:
     def emit_data_changed(self, data, mod_buffer):
         self.main_widget.data_changed(data, mod_buffer)
 
+    def get_data(self):
+        """Returns the datasets, with ring buffers replaced by their samples
+        in chronological order."""
+        return {k: (persist, ring_dataset_view(v)) if is_ring_dataset(v)
+                   else (persist, v)
+                for k, (persist, v) in self.data.items()}
+
     def flush_mod_buffer(self):
-        self.emit_data_changed(self.data, self.mod_buffer)
+        self.emit_data_changed(self.get_data(), self.mod_buffer)
         del self.mod_buffer
 
     def sub_mod(self, mod):
@@ -195,7 +203,7 @@ class SimpleApplet:
                 asyncio.get_event_loop().call_later(self.args.update_delay,
                                                     self.flush_mod_buffer)
         else:
-            self.emit_data_changed(self.data, [mod])
+            self.emit_data_changed(self.get_data(), [mod])
 
     def subscribe(self):
         if self.embed is None:
@@ -405,6 +405,7 @@ class ExperimentsArea(QtWidgets.QMdiArea):
         self.worker_handlers = {
             "get_device_db": lambda: {},
             "get_device": lambda k: {"type": "dummy"},
+            "get_device_db_snapshot": lambda version: None,
             "get_dataset": self._ddb.get,
             "update_dataset": self._ddb.update,
         }
@@ -3,20 +3,35 @@
 marked kernel invariant.
 """
 
+from collections import defaultdict
 from pythonparser import diagnostic
-from .. import ir, types
+from .. import ir, types, builtins
 
 class InvariantDetection:
     def __init__(self, engine):
         self.engine = engine
 
-    def process(self, functions):
+    def analyze(self, functions):
         self.attr_locs = dict()
+        self.attr_loads = defaultdict(lambda: 0)
         self.attr_written = set()
 
         for func in functions:
             self.process_function(func)
 
+    def invariant_candidates(self):
+        """Returns the ``(type, attribute)`` pairs of the attributes that are
+        loaded but never written to, and are not yet kernel invariant."""
+        for key in self.attr_loads:
+            if key not in self.attr_written:
+                typ, attr = key
+                if attr in typ.constant_attributes:
+                    continue
+                yield key
+
+    def process(self, functions):
+        self.analyze(functions)
+
         for key in self.attr_locs:
             if key not in self.attr_written:
                 typ, attr = key
@@ -31,6 +46,32 @@ class InvariantDetection:
                     self.attr_locs[key])
                 self.engine.process(diag)
 
+    def promote(self, functions):
+        """Marks the attributes that are never written to as kernel invariant.
+
+        Attributes holding mutable values are left alone, since their
+        contents may still be modified in place and have to be written back.
+
+        Returns the number of promoted attributes, and the number of
+        attribute loads that became invariant."""
+        self.analyze(functions)
+
+        promoted = defaultdict(set)
+        loads = 0
+        for key in self.invariant_candidates():
+            typ, attr = key
+            if attr not in typ.attributes or builtins.is_mutable(typ.attributes[attr]):
+                continue
+            promoted[typ].add(attr)
+            loads += self.attr_loads[key]
+
+        for typ, attrs in promoted.items():
+            # The set may be shared with the kernel_invariants of the host
+            # object; do not modify it in place.
+            typ.constant_attributes = typ.constant_attributes | attrs
+
+        return sum(len(attrs) for attrs in promoted.values()), loads
+
     def process_function(self, func):
         for block in func.basic_blocks:
             for insn in block.instructions:
@@ -39,10 +80,11 @@ class InvariantDetection:
                 if not types.is_instance(insn.object().type):
                     continue
 
-                key = (insn.object().type, insn.attr)
+                key = (insn.object().type.find(), insn.attr)
                 if isinstance(insn, ir.GetAttr):
                     if types.is_method(insn.type):
                         continue
+                    self.attr_loads[key] += 1
                     if key not in self.attr_locs and insn.loc is not None:
                         self.attr_locs[key] = insn.loc
                 elif isinstance(insn, ir.SetAttr):
@@ -281,6 +281,16 @@ def is_listish(typ, elt=None):
     else:
         return False
 
+def is_mutable(typ):
+    """Determines if values of type ``typ`` can be modified in place."""
+    typ = typ.find()
+    if is_list(typ) or is_array(typ) or is_bytearray(typ):
+        return True
+    elif types.is_tuple(typ):
+        return any(is_mutable(elt) for elt in typ.elts)
+    else:
+        return False
+
 def is_range(typ, elt=None):
     if elt is not None:
         return types.is_mono(typ, "range", {"elt": elt})
@@ -8,7 +8,7 @@ annotated as ``@kernel`` when they are referenced.
 import sys, os, re, linecache, inspect, textwrap, types as pytypes, numpy
 from collections import OrderedDict, defaultdict
 
-from pythonparser import ast, algorithm, source, diagnostic, parse_buffer
+from pythonparser import ast, source, diagnostic, parse_buffer
 from pythonparser import lexer as source_lexer, parser as source_parser
 
 from Levenshtein import ratio as similarity, jaro_winkler
@@ -85,14 +85,6 @@ class EmbeddingMap:
                 n += 1
                 new_instance_type.name = "{}.{}".format(new_instance_type.name, n)
 
-    def attribute_count(self):
-        count = 0
-        for host_type in self.type_map:
-            instance_type, constructor_type = self.type_map[host_type]
-            count += len(instance_type.attributes)
-            count += len(constructor_type.attributes)
-        return count
-
     # Functions
     def store_function(self, function, ir_function_name):
         self.function_map[function] = ir_function_name
@@ -489,6 +481,15 @@ class StitchingInferencer(Inferencer):
         self.value_map = value_map
         self.quote = quote
         self.attr_type_cache = {}
+        self.changes = 0
+
+    def progress(self):
+        """
+        Returns a number that increases whenever inference adds information:
+        binds a type variable, adds an attribute to the type of a host object
+        or inserts a coercion.
+        """
+        return types.TVar.bindings + self.changes
 
     def _compute_attr_type(self, object_value, object_type, object_loc, attr_name, loc):
         if not hasattr(object_value, attr_name):
@@ -606,6 +607,7 @@ class StitchingInferencer(Inferencer):
             if attr_name not in attributes:
                 # We just figured out what the type should be. Add it.
                 attributes[attr_name] = attr_value_type
+                self.changes += 1
             else:
                 # Does this conflict with an earlier guess?
                 try:
@@ -623,6 +625,18 @@ class StitchingInferencer(Inferencer):
 
         super()._unify_attribute(result_type, value_node, attr_name, attr_loc, loc)
 
+    def _coerce_one(self, typ, coerced_node, other_node):
+        node = super()._coerce_one(typ, coerced_node, other_node)
+        if node is not coerced_node:
+            self.changes += 1
+        return node
+
+    def _visit_coerce(self, node):
+        # The coerced value has just been visited; visiting it again, which
+        # takes time exponential in the depth of nested arithmetic expressions,
+        # is unnecessary since inference is iterated to a fixed point anyway.
+        self._check_coerce(node)
+
     def visit_QuoteT(self, node):
         if inspect.ismethod(node.value):
             if types.is_rpc(types.get_method_function(node.type)):
@@ -633,23 +647,24 @@ class StitchingInferencer(Inferencer):
                                     loc=node.loc,
                                     self_loc=node.self_loc)
 
-class TypedtreeHasher(algorithm.Visitor):
-    def generic_visit(self, node):
-        def freeze(obj):
-            if isinstance(obj, ast.AST):
-                return self.visit(obj)
-            elif isinstance(obj, list):
-                return hash(tuple(freeze(elem) for elem in obj))
-            elif isinstance(obj, types.Type):
-                return hash(obj.find())
-            else:
-                # We don't care; only types change during inference.
-                pass
-
-        fields = node._fields
-        if hasattr(node, '_types'):
-            fields = fields + node._types
-        return hash(tuple(freeze(getattr(node, field_name)) for field_name in fields))
+# Parsetrees of embedded functions, shared by all compilations in the process,
+# since the same driver methods end up being parsed again for every kernel.
+# Keyed on the code object and source of the function, so that functions
+# that are redefined or whose source changes are parsed again.
+_parse_cache = OrderedDict()
+_parse_cache_size = 1024
+
+def _copy_parsetree(node):
+    if isinstance(node, list):
+        return [_copy_parsetree(elt) for elt in node]
+    elif isinstance(node, ast.AST):
+        node_copy = node.__class__.__new__(node.__class__)
+        for attr, value in node.__dict__.items():
+            node_copy.__dict__[attr] = _copy_parsetree(value)
+        return node_copy
+    else:
+        # Locations and literal values are never mutated.
+        return node
 
 class Stitcher:
     def __init__(self, core, dmgr, engine=None, print_as_rpc=True):
@@ -665,6 +680,10 @@ class Stitcher:
         self.inject_at = 0
         self.globals = {}
 
+        # Work done by finalize(), for diagnosing slow compilation.
+        self.inference_sweeps = 0
+        self.inference_visits = 0
+
         # We don't want some things from the prelude as they are provided in
         # the host Python namespace and gain special meaning when quoted.
         self.prelude = prelude.globals()
@@ -689,20 +708,29 @@ class Stitcher:
         inferencer = StitchingInferencer(engine=self.engine,
                                          value_map=self.value_map,
                                          quote=self._quote)
-        typedtree_hasher = TypedtreeHasher()
 
-        # Iterate inference to fixed point.
-        old_typedtree_hash = None
-        old_attr_count = None
+        # Iterate inference to fixed point. Inferring types for a function
+        # again can only make progress if inference has made progress anywhere
+        # since the last time the function was visited, so remember the progress
+        # count at each visit and skip the functions that are already up to date.
+        visited_at = {}
         while True:
-            inferencer.visit(self.typedtree)
-            typedtree_hash = typedtree_hasher.visit(self.typedtree)
-            attr_count = self.embedding_map.attribute_count()
+            self.inference_sweeps += 1
+            visited_any = False
+            for node in list(self.typedtree):
+                progress = inferencer.progress()
+                if visited_at.get(id(node)) == progress:
+                    continue
+                visited_at[id(node)] = progress
+                visited_any = True
+                self.inference_visits += 1
 
-            if old_typedtree_hash == typedtree_hash and old_attr_count == attr_count:
+                # Type variables created from now on are considered fresh.
+                types.TVar.next_generation()
+                inferencer.visit(node)
+
+            if not visited_any:
                 break
-            old_typedtree_hash = typedtree_hash
-            old_attr_count = attr_count
 
         # After we've discovered every referenced attribute, check if any kernel_invariant
         # specifications refers to ones we didn't encounter.
@@ -872,20 +900,9 @@ class Stitcher:
         cell_names = embedded_function.__code__.co_freevars
         host_environment.update({var: cells[index] for index, var in enumerate(cell_names)})
 
-        # Find out how indented we are.
-        initial_whitespace = re.search(r"^\s*", source_code).group(0)
-        initial_indent = len(initial_whitespace.expandtabs())
-
         # Parse.
-        source_buffer = source.Buffer(source_code, filename, first_line)
-        lexer = source_lexer.Lexer(source_buffer, version=sys.version_info[0:2],
-                                   diagnostic_engine=self.engine)
-        lexer.indent = [(initial_indent,
-                         source.Range(source_buffer, 0, len(initial_whitespace)),
-                         initial_whitespace)]
-        parser = source_parser.Parser(lexer, version=sys.version_info[0:2],
-                                      diagnostic_engine=self.engine)
-        function_node = parser.file_input().body[0]
+        function_node = self._parse_function(embedded_function.__code__, source_code,
+                                             filename, first_line)
 
         # Mangle the name, since we put everything into a single module.
         full_function_name = "{}.{}".format(module_name, host_function.__qualname__)
@@ -920,6 +937,33 @@ class Stitcher:
 
         return function_node
 
+    def _parse_function(self, code, source_code, filename, first_line):
+        key = (code, filename, source_code)
+        try:
+            function_node = _parse_cache.pop(key)
+        except KeyError:
+            # Find out how indented we are.
+            initial_whitespace = re.search(r"^\s*", source_code).group(0)
+            initial_indent = len(initial_whitespace.expandtabs())
+
+            source_buffer = source.Buffer(source_code, filename, first_line)
+            lexer = source_lexer.Lexer(source_buffer, version=sys.version_info[0:2],
+                                       diagnostic_engine=self.engine)
+            lexer.indent = [(initial_indent,
+                             source.Range(source_buffer, 0, len(initial_whitespace)),
+                             initial_whitespace)]
+            parser = source_parser.Parser(lexer, version=sys.version_info[0:2],
+                                          diagnostic_engine=self.engine)
+            function_node = parser.file_input().body[0]
+
+        _parse_cache[key] = function_node
+        while len(_parse_cache) > _parse_cache_size:
+            _parse_cache.popitem(last=False)
+
+        # The parsetree is rewritten in place into a typedtree, so the cached
+        # one must not be handed out.
+        return _copy_parsetree(function_node)
+
     def _extract_annot(self, function, annot, kind, call_loc, fn_kind):
         if not isinstance(annot, types.Type):
             diag = diagnostic.Diagnostic("error",
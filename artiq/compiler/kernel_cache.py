@@ -0,0 +1,118 @@
+"""
+The :class:`KernelCache` class stores linked kernel libraries on disk,
+so that kernels that have already been compiled, in this or in a previous
+process, skip LLVM optimization, code generation, linking and stripping.
+
+Kernels are keyed on their unoptimized LLVM IR. The IR contains every
+value embedded from the host, the identifiers of the host objects
+referenced by RPCs and attribute writeback (which only depend on the order
+in which the stitcher encountered them, and therefore match the embedding
+map of the current compilation), as well as the debug locations; hence two
+kernels with identical IR produce identical libraries.
+"""
+
+import os
+import struct
+import hashlib
+import tempfile
+import logging
+
+from artiq import __version__ as artiq_version
+
+
+logger = logging.getLogger(__name__)
+
+
+class KernelCache:
+    """
+    :param directory: where the cached libraries are stored. Created if it
+        does not exist.
+    :param max_size: total size in bytes of the cached libraries above which
+        the least recently used ones are evicted.
+    """
+    suffix = ".kernel"
+
+    def __init__(self, directory, max_size=256*1024*1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, target, llvm_ir):
+        """Returns the cache key of the LLVM IR ``llvm_ir`` (as a string)
+        compiled for ``target``."""
+        h = hashlib.sha256()
+        for part in (artiq_version, target.triple, target.data_layout,
+                     ",".join(target.features), target.opt_level, llvm_ir):
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Returns ``(library, stripped_library)`` if ``key`` is cached,
+        and ``None`` otherwise."""
+        filename = self._filename(key)
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+            # Mark as recently used.
+            os.utime(filename)
+        except OSError:
+            return None
+
+        try:
+            length, = struct.unpack(">I", data[:4])
+            library = data[4:4+length]
+            stripped_library = data[4+length:]
+            if len(library) != length:
+                raise ValueError("truncated cache entry")
+        except (struct.error, ValueError):
+            logger.warning("removing corrupted kernel cache entry %s",
+                           filename)
+            self._remove(filename)
+            return None
+
+        logger.debug("kernel cache hit (%s)", key)
+        return library, stripped_library
+
+    def put(self, key, library, stripped_library):
+        """Stores a kernel library and its stripped counterpart, then evicts
+        the least recently used entries if the cache is over its maximum
+        size."""
+        data = struct.pack(">I", len(library)) + library + stripped_library
+        with tempfile.NamedTemporaryFile("wb", dir=self.directory,
+                                         delete=False) as f:
+            f.write(data)
+            tmpname = f.name
+        os.replace(tmpname, self._filename(key))
+        logger.debug("kernel cache store (%s)", key)
+        self.evict()
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for de in os.scandir(self.directory):
+            if not de.name.endswith(self.suffix):
+                continue
+            try:
+                st = de.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, de.path))
+            total_size += st.st_size
+
+        entries.sort()
+        for _, size, filename in entries:
+            if total_size <= self.max_size:
+                break
+            logger.debug("evicting kernel cache entry %s", filename)
+            self._remove(filename)
+            total_size -= size
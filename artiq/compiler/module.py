@@ -11,6 +11,7 @@ string and infers types for it using a trivial :module:`prelude`.
 import os
 from pythonparser import source, diagnostic, parse_buffer
 from . import prelude, types, transforms, analyses, validators
+from .statistics import CompilerStatistics
 
 class Source:
     def __init__(self, source_buffer, engine=None):
@@ -40,7 +41,11 @@ class Source:
             return cls(source.Buffer(f.read(), filename, 1), engine=engine)
 
 class Module:
-    def __init__(self, src, ref_period=1e-6, attribute_writeback=True, remarks=False):
+    def __init__(self, src, ref_period=1e-6, attribute_writeback=True, remarks=False,
+                 auto_invariants=False, statistics=None):
+        if statistics is None:
+            statistics = CompilerStatistics(enabled=False)
+        self.statistics = statistics
         self.attribute_writeback = attribute_writeback
         self.engine = src.engine
         self.embedding_map = src.embedding_map
@@ -62,31 +67,62 @@ class Module:
         local_access_validator = validators.LocalAccessValidator(engine=self.engine)
         devirtualization = analyses.Devirtualization()
         interleaver = transforms.Interleaver(engine=self.engine)
+        rtio_coalescer = transforms.RTIOCoalescer(engine=self.engine)
         invariant_detection = analyses.InvariantDetection(engine=self.engine)
 
-        cast_monomorphizer.visit(src.typedtree)
-        int_monomorphizer.visit(src.typedtree)
-        inferencer.visit(src.typedtree)
-        monomorphism_validator.visit(src.typedtree)
-        escape_validator.visit(src.typedtree)
-        iodelay_estimator.visit_fixpoint(src.typedtree)
-        constness_validator.visit(src.typedtree)
-        devirtualization.visit(src.typedtree)
-        self.artiq_ir = artiq_ir_generator.visit(src.typedtree)
-        artiq_ir_generator.annotate_calls(devirtualization)
-        dead_code_eliminator.process(self.artiq_ir)
-        interleaver.process(self.artiq_ir)
-        local_access_validator.process(self.artiq_ir)
+        with statistics.measure("CastMonomorphizer"):
+            cast_monomorphizer.visit(src.typedtree)
+        with statistics.measure("IntMonomorphizer"):
+            int_monomorphizer.visit(src.typedtree)
+        with statistics.measure("Inferencer") as pass_:
+            inferencer.visit(src.typedtree)
+        pass_.count(src.typedtree)
+        with statistics.measure("MonomorphismValidator"):
+            monomorphism_validator.visit(src.typedtree)
+        with statistics.measure("EscapeValidator"):
+            escape_validator.visit(src.typedtree)
+        with statistics.measure("IODelayEstimator") as pass_:
+            iodelay_estimator.visit_fixpoint(src.typedtree)
+        pass_.count(iterations=iodelay_estimator.iterations)
+        with statistics.measure("ConstnessValidator"):
+            constness_validator.visit(src.typedtree)
+        with statistics.measure("Devirtualization"):
+            devirtualization.visit(src.typedtree)
+        with statistics.measure("ARTIQIRGenerator") as pass_:
+            self.artiq_ir = artiq_ir_generator.visit(src.typedtree)
+            artiq_ir_generator.annotate_calls(devirtualization)
+        pass_.count(self.artiq_ir)
+        with statistics.measure("DeadCodeEliminator") as pass_:
+            dead_code_eliminator.process(self.artiq_ir)
+        pass_.count(self.artiq_ir)
+        with statistics.measure("Interleaver") as pass_:
+            interleaver.process(self.artiq_ir)
+        pass_.count(self.artiq_ir)
+        with statistics.measure("RTIOCoalescer") as pass_:
+            rtio_coalescer.process(self.artiq_ir)
+        pass_.count(outputs=rtio_coalescer.coalesced)
+        with statistics.measure("LocalAccessValidator"):
+            local_access_validator.process(self.artiq_ir)
         if remarks:
             invariant_detection.process(self.artiq_ir)
+        self.promoted_invariants = self.invariant_loads = 0
+        if auto_invariants:
+            with statistics.measure("InvariantPromotion") as pass_:
+                self.promoted_invariants, self.invariant_loads = \
+                    invariant_detection.promote(self.artiq_ir)
+            pass_.count(attributes=self.promoted_invariants,
+                        loads=self.invariant_loads)
 
     def build_llvm_ir(self, target):
         """Compile the module to LLVM IR for the specified target."""
         llvm_ir_generator = transforms.LLVMIRGenerator(
             engine=self.engine, module_name=self.name, target=target,
             embedding_map=self.embedding_map)
-        return llvm_ir_generator.process(self.artiq_ir,
-            attribute_writeback=self.attribute_writeback)
+        with self.statistics.measure("LLVMIRGenerator") as pass_:
+            llmodule = llvm_ir_generator.process(self.artiq_ir,
+                attribute_writeback=self.attribute_writeback)
+        pass_.count(llmodule)
+        return llmodule
 
     def __repr__(self):
         printer = types.TypePrinter()
@@ -0,0 +1,151 @@
+"""
+The :class:`CompilerStatistics` class records, for a single kernel,
+the wall time spent in each pass of the compiler pipeline together with
+counters describing the size of the code each pass produced (AST nodes,
+ARTIQ IR and LLVM IR instructions and loads, object sizes) and the number
+of iterations of passes that run to a fixed point.
+
+A disabled instance records nothing and costs next to nothing, so that
+the compiler can be instrumented unconditionally.
+"""
+
+import os
+import re
+import json
+import time
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pythonparser import ast
+from . import ir
+
+
+def _count_nodes(node):
+    count = 0
+    worklist = [node]
+    while worklist:
+        node = worklist.pop()
+        if isinstance(node, list):
+            worklist.extend(node)
+        elif isinstance(node, ast.AST):
+            count += 1
+            for field in node._fields:
+                worklist.append(getattr(node, field, None))
+    return count
+
+def _count_llvm_instructions(llmodule):
+    functions = instructions = loads = 0
+    in_body = False
+    for line in str(llmodule).splitlines():
+        if line.startswith("define "):
+            functions += 1
+            in_body = True
+        elif line == "}":
+            in_body = False
+        elif in_body and line.startswith("  "):
+            instructions += 1
+            if " = load " in line:
+                loads += 1
+    return functions, instructions, loads
+
+def _counters(subject):
+    if isinstance(subject, ast.AST):
+        return [("nodes", _count_nodes(subject))]
+    elif isinstance(subject, list) and all(isinstance(fn, ir.Function) for fn in subject):
+        return [("functions", len(subject)),
+                ("instructions", sum(len(list(fn.instructions())) for fn in subject))]
+    elif isinstance(subject, (bytes, bytearray)):
+        return [("size", len(subject))]
+    else:
+        # LLVM IR, either generated or parsed.
+        functions, instructions, loads = _count_llvm_instructions(subject)
+        return [("functions", functions), ("instructions", instructions),
+                ("loads", loads)]
+
+
+class _Pass:
+    def __init__(self, name):
+        self.name = name
+        self.time = None
+        self.counters = OrderedDict()
+
+    def count(self, subject=None, **counters):
+        """Records the size of ``subject`` (a typed AST, a list of ARTIQ IR
+        functions, an LLVM module or a binary) and any additional counters
+        given as keyword arguments."""
+        if subject is not None:
+            self.counters.update(_counters(subject))
+        self.counters.update(sorted(counters.items()))
+
+    def as_dict(self):
+        result = OrderedDict([("name", self.name), ("time", self.time)])
+        result.update(self.counters)
+        return result
+
+class _NullPass:
+    def count(self, subject=None, **counters):
+        pass
+
+_null_pass = _NullPass()
+
+
+class CompilerStatistics:
+    """
+    :param kernel: name of the compiled kernel, included in the report.
+    :param enabled: if false, :meth:`measure` does not record anything.
+    """
+
+    def __init__(self, kernel=None, enabled=True):
+        self.kernel = kernel
+        self.enabled = enabled
+        self.passes = []
+
+    @contextmanager
+    def measure(self, name):
+        """Measures the wall time of the enclosed block as the pass ``name``.
+        Yields an object whose ``count()`` method records counters for
+        the pass."""
+        if not self.enabled:
+            yield _null_pass
+            return
+
+        pass_ = _Pass(name)
+        self.passes.append(pass_)
+        start = time.perf_counter()
+        try:
+            yield pass_
+        finally:
+            pass_.time = time.perf_counter() - start
+
+    def total_time(self):
+        return sum(pass_.time for pass_ in self.passes if pass_.time is not None)
+
+    def as_dict(self):
+        return OrderedDict([
+            ("kernel", self.kernel),
+            ("time", self.total_time()),
+            ("passes", [pass_.as_dict() for pass_ in self.passes]),
+        ])
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def write(self, directory):
+        """Writes the report as JSON to a new file in ``directory``, and
+        returns the name of that file."""
+        os.makedirs(directory, exist_ok=True)
+        prefix = re.sub(r"[^\w.]", "_", self.kernel or "kernel") + "_"
+        with tempfile.NamedTemporaryFile("w", prefix=prefix, suffix=".json",
+                                         dir=directory, delete=False) as f:
+            f.write(self.to_json())
+            return f.name
+
+    def __str__(self):
+        lines = ["{:<24} {:>10}  {}".format("pass", "time (ms)", "counters")]
+        for pass_ in self.passes:
+            lines.append("{:<24} {:>10.3f}  {}".format(
+                pass_.name, (pass_.time or 0)*1e3,
+                ", ".join("{}={}".format(key, value)
+                          for key, value in pass_.counters.items())))
+        return "\n".join(lines)
@@ -0,0 +1,600 @@
+"""
+The :class:`Symbolizer` class maps the addresses in a kernel backtrace to
+source locations and function names using the DWARF debug information of
+the unstripped kernel library, with the same results as
+``addr2line --functions --inlines --demangle``, and :func:`demangle`
+demangles the names of kernel functions, like ``c++filt``.
+
+The debug information is parsed once, when the symbolizer is created, and
+the result of each lookup is cached, so that kernels that raise exceptions
+repeatedly do not pay for it more than once.
+
+Only the DWARF 2 to 4 line tables, compilation units, subprograms and
+inlined subroutines are interpreted, which is what the ARTIQ compiler
+emits; anything else raises :class:`SymbolizerError`.
+"""
+
+import re
+import struct
+import bisect
+import posixpath
+
+
+class SymbolizerError(Exception):
+    """Raised when the debug information cannot be interpreted."""
+
+
+DW_TAG_compile_unit = 0x11
+DW_TAG_subprogram = 0x2e
+DW_TAG_inlined_subroutine = 0x1d
+
+DW_AT_stmt_list = 0x10
+DW_AT_name = 0x03
+DW_AT_low_pc = 0x11
+DW_AT_high_pc = 0x12
+DW_AT_comp_dir = 0x1b
+DW_AT_abstract_origin = 0x31
+DW_AT_specification = 0x47
+DW_AT_ranges = 0x55
+DW_AT_call_file = 0x58
+DW_AT_call_line = 0x59
+DW_AT_linkage_name = 0x6e
+DW_AT_MIPS_linkage_name = 0x2007
+
+DW_FORM_addr = 0x01
+DW_FORM_block2 = 0x03
+DW_FORM_block4 = 0x04
+DW_FORM_data2 = 0x05
+DW_FORM_data4 = 0x06
+DW_FORM_data8 = 0x07
+DW_FORM_string = 0x08
+DW_FORM_block = 0x09
+DW_FORM_block1 = 0x0a
+DW_FORM_data1 = 0x0b
+DW_FORM_flag = 0x0c
+DW_FORM_sdata = 0x0d
+DW_FORM_strp = 0x0e
+DW_FORM_udata = 0x0f
+DW_FORM_ref_addr = 0x10
+DW_FORM_ref1 = 0x11
+DW_FORM_ref2 = 0x12
+DW_FORM_ref4 = 0x13
+DW_FORM_ref8 = 0x14
+DW_FORM_ref_udata = 0x15
+DW_FORM_indirect = 0x16
+DW_FORM_sec_offset = 0x17
+DW_FORM_exprloc = 0x18
+DW_FORM_flag_present = 0x19
+DW_FORM_ref_sig8 = 0x20
+
+DW_LNS_copy = 1
+DW_LNS_advance_pc = 2
+DW_LNS_advance_line = 3
+DW_LNS_set_file = 4
+DW_LNS_set_column = 5
+DW_LNS_negate_stmt = 6
+DW_LNS_set_basic_block = 7
+DW_LNS_const_add_pc = 8
+DW_LNS_fixed_advance_pc = 9
+
+DW_LNE_end_sequence = 1
+DW_LNE_set_address = 2
+DW_LNE_define_file = 3
+
+
+def _read_sections(data):
+    """Returns the byte order, the address size and the contents of the
+    sections of the ELF file ``data``, by name."""
+    if data[:4] != b"\x7fELF":
+        raise SymbolizerError("not an ELF file")
+    if data[5] == 1:
+        endian = "<"
+    elif data[5] == 2:
+        endian = ">"
+    else:
+        raise SymbolizerError("unknown byte order")
+
+    if data[4] == 1:
+        address_size = 4
+        e_shoff, = struct.unpack_from(endian + "I", data, 32)
+        e_shentsize, e_shnum, e_shstrndx = struct.unpack_from(endian + "HHH", data, 46)
+        shdr = struct.Struct(endian + "IIIIIIIIII")
+    elif data[4] == 2:
+        address_size = 8
+        e_shoff, = struct.unpack_from(endian + "Q", data, 40)
+        e_shentsize, e_shnum, e_shstrndx = struct.unpack_from(endian + "HHH", data, 58)
+        shdr = struct.Struct(endian + "IIQQQQIIQQ")
+    else:
+        raise SymbolizerError("unknown ELF class")
+
+    headers = [shdr.unpack_from(data, e_shoff + index * e_shentsize)
+               for index in range(e_shnum)]
+    _, _, _, _, shstrtab_offset, *_ = headers[e_shstrndx]
+    sections = {}
+    for sh_name, sh_type, _, _, sh_offset, sh_size, *_ in headers:
+        start = shstrtab_offset + sh_name
+        name = data[start:data.index(b"\x00", start)].decode("ascii")
+        sections[name] = data[sh_offset:sh_offset + sh_size]
+    return endian, address_size, sections
+
+
+class _Reader:
+    def __init__(self, data, endian, offset=0):
+        self.data = data
+        self.endian = endian
+        self.offset = offset
+
+    def _unpack(self, fmt, size):
+        value, = struct.unpack_from(self.endian + fmt, self.data, self.offset)
+        self.offset += size
+        return value
+
+    def u8(self):
+        return self._unpack("B", 1)
+
+    def s8(self):
+        return self._unpack("b", 1)
+
+    def u16(self):
+        return self._unpack("H", 2)
+
+    def u32(self):
+        return self._unpack("I", 4)
+
+    def u64(self):
+        return self._unpack("Q", 8)
+
+    def address(self, size):
+        if size == 4:
+            return self.u32()
+        elif size == 8:
+            return self.u64()
+        raise SymbolizerError("unsupported address size {}".format(size))
+
+    def uleb128(self):
+        value = shift = 0
+        while True:
+            byte = self.data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                return value
+
+    def sleb128(self):
+        value = shift = 0
+        while True:
+            byte = self.data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                if byte & 0x40:
+                    value -= 1 << shift
+                return value
+
+    def cstring(self):
+        end = self.data.index(b"\x00", self.offset)
+        value = self.data[self.offset:end].decode("utf-8", errors="replace")
+        self.offset = end + 1
+        return value
+
+    def unit_length(self):
+        length = self.u32()
+        if length >= 0xfffffff0:
+            raise SymbolizerError("64-bit DWARF is not supported")
+        return length
+
+
+class _DIE:
+    def __init__(self, offset, tag, unit):
+        self.offset = offset
+        self.tag = tag
+        self.unit = unit
+        self.attributes = {}
+        self.children = []
+        self.high_pc_is_offset = False
+
+
+class _Unit:
+    def __init__(self):
+        self.files = []
+        self.base_address = 0
+
+
+def _join_path(directory, filename):
+    if not directory or posixpath.isabs(filename):
+        return filename
+    return posixpath.join(directory, filename)
+
+
+_special_demangled_types = {"z": "...", "v": "void"}
+
+def _demangle_source_name(name, position):
+    match = re.compile(r"[1-9][0-9]*").match(name, position)
+    if match is None:
+        raise ValueError
+    length = int(match.group(0))
+    start = match.end()
+    if start + length > len(name):
+        raise ValueError
+    return name[start:start + length], start + length
+
+def _demangle_type(name, position):
+    if name[position] in _special_demangled_types:
+        return _special_demangled_types[name[position]], position + 1
+    return _demangle_source_name(name, position)
+
+def demangle(name):
+    """
+    Demangles a function name mangled by the ARTIQ compiler, i.e.
+    ``_Z<length><name>zz``, or ``_Z<length><name>I<length><type>Ezz`` for
+    methods specialized for an instance type. The result is the same as
+    that of ``c++filt``, e.g. ``foo(..., ...)``. Other names are returned
+    unchanged.
+    """
+    if not name.startswith("_Z"):
+        return name
+    try:
+        function, position = _demangle_source_name(name, 2)
+        template = None
+        if position < len(name) and name[position] == "I":
+            template, position = [], position + 1
+            while name[position] != "E":
+                argument, position = _demangle_type(name, position)
+                template.append(argument)
+            position += 1
+        argument_types = []
+        while position < len(name):
+            argument_type, position = _demangle_type(name, position)
+            argument_types.append(argument_type)
+    except (ValueError, IndexError):
+        return name
+
+    if template is not None:
+        function += "<{}>".format(", ".join(template))
+    if not argument_types:
+        return function
+    if template is not None:
+        return_type, argument_types = argument_types[0], argument_types[1:]
+        function = "{} {}".format(return_type, function)
+    if argument_types == ["void"]:
+        argument_types = []
+    return "{}({})".format(function, ", ".join(argument_types))
+
+
+class Symbolizer:
+    """
+    :param library: unstripped shared library, as :class:`bytes`.
+    :raises SymbolizerError: if the debug information of the library is in
+        a format that is not supported.
+    """
+
+    def __init__(self, library):
+        self.endian, self.address_size, sections = _read_sections(library)
+        self.debug_str = sections.get(".debug_str", b"")
+        self.debug_ranges = sections.get(".debug_ranges", b"")
+        self.debug_line = sections.get(".debug_line", b"")
+        self.dies = {}
+        self.subprograms = []
+        self.rows = []
+        self.cache = {}
+
+        try:
+            self._parse_info(sections.get(".debug_info", b""),
+                             sections.get(".debug_abbrev", b""))
+        except (struct.error, IndexError, ValueError, KeyError) as error:
+            raise SymbolizerError("malformed debug information: {}"
+                                  .format(error)) from error
+
+        self.rows.sort()
+        self.row_addresses = [row[0] for row in self.rows]
+
+    def _parse_abbreviations(self, data, offset):
+        abbreviations = {}
+        reader = _Reader(data, self.endian, offset)
+        while True:
+            code = reader.uleb128()
+            if code == 0:
+                return abbreviations
+            tag = reader.uleb128()
+            has_children = reader.u8()
+            attributes = []
+            while True:
+                name, form = reader.uleb128(), reader.uleb128()
+                if name == 0 and form == 0:
+                    break
+                attributes.append((name, form))
+            abbreviations[code] = tag, has_children, attributes
+
+    def _read_form(self, reader, form, unit_offset, version, address_size):
+        if form == DW_FORM_addr:
+            return reader.address(address_size)
+        elif form in (DW_FORM_data1, DW_FORM_ref1, DW_FORM_flag):
+            value = reader.u8()
+        elif form in (DW_FORM_data2, DW_FORM_ref2):
+            value = reader.u16()
+        elif form in (DW_FORM_data4, DW_FORM_ref4, DW_FORM_sec_offset):
+            value = reader.u32()
+        elif form in (DW_FORM_data8, DW_FORM_ref8, DW_FORM_ref_sig8):
+            value = reader.u64()
+        elif form in (DW_FORM_udata, DW_FORM_ref_udata):
+            value = reader.uleb128()
+        elif form == DW_FORM_sdata:
+            return reader.sleb128()
+        elif form == DW_FORM_string:
+            return reader.cstring()
+        elif form == DW_FORM_strp:
+            return _Reader(self.debug_str, self.endian, reader.u32()).cstring()
+        elif form == DW_FORM_ref_addr:
+            return reader.address(address_size) if version == 2 else reader.u32()
+        elif form in (DW_FORM_block, DW_FORM_exprloc):
+            length = reader.uleb128()
+            reader.offset += length
+            return None
+        elif form == DW_FORM_block1:
+            length = reader.u8()
+            reader.offset += length
+            return None
+        elif form == DW_FORM_block2:
+            length = reader.u16()
+            reader.offset += length
+            return None
+        elif form == DW_FORM_block4:
+            length = reader.u32()
+            reader.offset += length
+            return None
+        elif form == DW_FORM_flag_present:
+            return True
+        elif form == DW_FORM_indirect:
+            return self._read_form(reader, reader.uleb128(), unit_offset,
+                                   version, address_size)
+        else:
+            raise SymbolizerError("unsupported attribute form {:#x}".format(form))
+
+        if form in (DW_FORM_ref1, DW_FORM_ref2, DW_FORM_ref4, DW_FORM_ref8,
+                    DW_FORM_ref_udata):
+            return unit_offset + value
+        return value
+
+    def _parse_info(self, data, abbrev_data):
+        reader = _Reader(data, self.endian)
+        while reader.offset < len(data):
+            unit_offset = reader.offset
+            end = reader.offset + 4 + reader.unit_length()
+            version = reader.u16()
+            if not 2 <= version <= 4:
+                raise SymbolizerError("unsupported DWARF version {}".format(version))
+            abbreviations = self._parse_abbreviations(abbrev_data, reader.u32())
+            address_size = reader.u8()
+
+            unit = _Unit()
+            parents = [None]
+            while reader.offset < end:
+                offset = reader.offset
+                code = reader.uleb128()
+                if code == 0:
+                    parents.pop()
+                    if not parents:
+                        break
+                    continue
+
+                tag, has_children, attributes = abbreviations[code]
+                die = _DIE(offset, tag, unit)
+                for name, form in attributes:
+                    value = self._read_form(reader, form, unit_offset, version,
+                                            address_size)
+                    die.attributes[name] = value
+                    if name == DW_AT_high_pc and form != DW_FORM_addr:
+                        die.high_pc_is_offset = True
+                self.dies[offset] = die
+
+                parent = parents[-1]
+                if parent is not None:
+                    parent.children.append(die)
+                if tag == DW_TAG_compile_unit:
+                    self._parse_unit(die, address_size)
+                elif tag == DW_TAG_subprogram and self._ranges(die):
+                    self.subprograms.append(die)
+                if has_children:
+                    parents.append(die)
+            reader.offset = end
+
+    def _parse_unit(self, die, address_size):
+        unit = die.unit
+        unit.base_address = die.attributes.get(DW_AT_low_pc, 0)
+        comp_dir = die.attributes.get(DW_AT_comp_dir)
+        if DW_AT_stmt_list in die.attributes:
+            self._parse_lines(die.attributes[DW_AT_stmt_list], comp_dir,
+                              address_size, unit)
+
+    def _parse_lines(self, offset, comp_dir, address_size, unit):
+        reader = _Reader(self.debug_line, self.endian, offset)
+        end = reader.offset + 4 + reader.unit_length()
+        version = reader.u16()
+        if not 2 <= version <= 4:
+            raise SymbolizerError("unsupported line table version {}".format(version))
+        header_length = reader.u32()
+        program = reader.offset + header_length
+        min_instruction_length = reader.u8()
+        if version >= 4:
+            reader.u8() # maximum operations per instruction
+        reader.u8()     # default is_stmt
+        line_base = reader.s8()
+        line_range = reader.u8()
+        opcode_base = reader.u8()
+        opcode_lengths = [reader.u8() for _ in range(opcode_base - 1)]
+
+        directories = [comp_dir]
+        while True:
+            directory = reader.cstring()
+            if not directory:
+                break
+            directories.append(_join_path(comp_dir, directory))
+
+        files = unit.files
+        files.append(None)
+        def add_file(reader):
+            name = reader.cstring()
+            if not name:
+                return name
+            directory = reader.uleb128()
+            reader.uleb128() # modification time
+            reader.uleb128() # length
+            files.append(_join_path(directories[directory], name))
+            return name
+        while add_file(reader):
+            pass
+        files.pop()
+
+        reader.offset = program
+        sequence = []
+        def reset():
+            return 0, 1, 1
+        address, file, line = reset()
+        while reader.offset < end:
+            opcode = reader.u8()
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                address += adjusted // line_range * min_instruction_length
+                line += line_base + adjusted % line_range
+                sequence.append((address, file, line))
+            elif opcode == DW_LNS_copy:
+                sequence.append((address, file, line))
+            elif opcode == DW_LNS_advance_pc:
+                address += reader.uleb128() * min_instruction_length
+            elif opcode == DW_LNS_advance_line:
+                line += reader.sleb128()
+            elif opcode == DW_LNS_set_file:
+                file = reader.uleb128()
+            elif opcode == DW_LNS_const_add_pc:
+                address += (255 - opcode_base) // line_range * min_instruction_length
+            elif opcode == DW_LNS_fixed_advance_pc:
+                address += reader.u16()
+            elif opcode == 0:
+                length = reader.uleb128()
+                next_offset = reader.offset + length
+                sub_opcode = reader.u8()
+                if sub_opcode == DW_LNE_end_sequence:
+                    for (start, file, line), (next_start, _, _) in \
+                            zip(sequence, sequence[1:] + [(address, 0, 0)]):
+                        if start < next_start:
+                            self.rows.append((start, next_start, file, line, unit))
+                    sequence = []
+                    address, file, line = reset()
+                elif sub_opcode == DW_LNE_set_address:
+                    address = reader.address(length - 1)
+                elif sub_opcode == DW_LNE_define_file:
+                    add_file(reader)
+                reader.offset = next_offset
+            else:
+                for _ in range(opcode_lengths[opcode - 1]):
+                    reader.uleb128()
+
+    def _ranges(self, die):
+        attributes = die.attributes
+        if DW_AT_low_pc in attributes and DW_AT_high_pc in attributes:
+            low = attributes[DW_AT_low_pc]
+            high = attributes[DW_AT_high_pc]
+            if die.high_pc_is_offset:
+                high += low
+            return [(low, high)]
+        elif DW_AT_ranges in attributes:
+            ranges = []
+            base = die.unit.base_address
+            reader = _Reader(self.debug_ranges, self.endian, attributes[DW_AT_ranges])
+            largest = (1 << (8 * self.address_size)) - 1
+            while True:
+                begin = reader.address(self.address_size)
+                end = reader.address(self.address_size)
+                if begin == 0 and end == 0:
+                    return ranges
+                elif begin == largest:
+                    base = end
+                else:
+                    ranges.append((base + begin, base + end))
+        return []
+
+    def _contains(self, die, address):
+        return any(low <= address < high for low, high in self._ranges(die))
+
+    def _function_name(self, die):
+        for _ in range(16):
+            attributes = die.attributes
+            for name in (DW_AT_linkage_name, DW_AT_MIPS_linkage_name, DW_AT_name):
+                if isinstance(attributes.get(name), str):
+                    return demangle(attributes[name])
+            if DW_AT_abstract_origin in attributes:
+                die = self.dies[attributes[DW_AT_abstract_origin]]
+            elif DW_AT_specification in attributes:
+                die = self.dies[attributes[DW_AT_specification]]
+            else:
+                break
+        return "??"
+
+    def _file_name(self, unit, index):
+        if 0 < index < len(unit.files):
+            return unit.files[index]
+        return "??"
+
+    def _inlined_chain(self, die, address):
+        chain = [die]
+        children = list(die.children)
+        while children:
+            child = children.pop(0)
+            if child.tag == DW_TAG_inlined_subroutine:
+                if self._contains(child, address):
+                    chain.append(child)
+                    children = list(child.children)
+            elif child.tag != DW_TAG_subprogram:
+                children.extend(child.children)
+        return chain
+
+    def lookup(self, address):
+        """Returns the ``(filename, line, function)`` frames at ``address``,
+        innermost first. Frames are repeated for each level of inlining."""
+        if address in self.cache:
+            return self.cache[address]
+
+        index = bisect.bisect_right(self.row_addresses, address) - 1
+        if index >= 0 and address < self.rows[index][1]:
+            _, _, file, line, unit = self.rows[index]
+            filename = self._file_name(unit, file)
+        else:
+            filename, line = "??", 0
+
+        chain = []
+        for subprogram in self.subprograms:
+            if self._contains(subprogram, address):
+                chain = self._inlined_chain(subprogram, address)
+                break
+
+        if not chain:
+            frames = [(filename, line, "??")]
+        else:
+            names = [self._function_name(die) for die in chain]
+            frames = [(filename, line, names[-1])]
+            for depth in range(len(chain) - 1, 0, -1):
+                inlined = chain[depth]
+                frames.append((self._file_name(inlined.unit,
+                                               inlined.attributes.get(DW_AT_call_file, 0)),
+                               inlined.attributes.get(DW_AT_call_line, 0),
+                               names[depth - 1]))
+
+        self.cache[address] = frames
+        return frames
+
+    def symbolize(self, addresses):
+        """Symbolizes the return addresses ``addresses`` of a backtrace, in
+        the format of :meth:`artiq.compiler.targets.Target.symbolize`."""
+        backtrace = []
+        for address in addresses:
+            # We got a list of return addresses, i.e. addresses of instructions
+            # just after the call. Look up an address somewhere inside the call
+            # instruction (or its delay slot), since that's what the backtrace
+            # entry should point at.
+            for filename, line, function in self.lookup(address - 1):
+                if filename == "??" or filename == "<synthesized>":
+                    continue
+                backtrace.append((filename, line if line else -1, -1, function, address))
+        return backtrace
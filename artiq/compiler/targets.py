@@ -1,7 +1,11 @@
-import os, sys, tempfile, subprocess
-from artiq.compiler import types
+import os, sys, tempfile, subprocess, logging
+from collections import OrderedDict
+from artiq.compiler import types, symbolizer
+from artiq.compiler.statistics import CompilerStatistics
 from llvmlite_artiq import ir as ll, binding as llvm
 
+logger = logging.getLogger(__name__)
+
 llvm.initialize()
 llvm.initialize_all_targets()
 llvm.initialize_all_asmprinters()
@@ -57,6 +61,17 @@ def _dump(target, kind, suffix, content):
         file.close()
         print("{} dumped as {}".format(kind, file.name), file=sys.stderr)
 
+# LLVM optimization presets as (optimization level, size level, inlining
+# threshold), using the same inlining thresholds as clang.
+opt_levels = {
+    "O0": (0, 0, None),
+    "O1": (1, 0, 225),
+    "O2": (2, 0, 225),
+    "O3": (3, 0, 250),
+    "Os": (2, 1, 75),
+    "Oz": (2, 2, 25),
+}
+
 class Target:
     """
     A description of the target environment where the binaries
@@ -71,6 +86,11 @@ class Target:
     :var print_function: (string)
         Name of a formatted print functions (with the signature of ``printf``)
         provided by the target, e.g. ``"printf"``.
+    :var statistics: (:class:`CompilerStatistics`)
+        Where the time spent in LLVM and in the external tools is recorded.
+    :var opt_level: (string)
+        LLVM optimization preset, one of the keys of :data:`opt_levels`,
+        or ``"default"`` for the pass pipeline tuned for ARTIQ kernels.
     """
     triple = "unknown"
     data_layout = ""
@@ -78,8 +98,15 @@ class Target:
     print_function = "printf"
 
 
-    def __init__(self):
+    def __init__(self, statistics=None, opt_level="default"):
         self.llcontext = ll.Context()
+        if statistics is None:
+            statistics = CompilerStatistics(enabled=False)
+        self.statistics = statistics
+        if opt_level != "default" and opt_level not in opt_levels:
+            raise ValueError("unknown optimization level {}".format(opt_level))
+        self.opt_level = opt_level
+        self._symbolizers = OrderedDict()
 
     def target_machine(self):
         lltarget = llvm.Target.from_triple(self.triple)
@@ -92,6 +119,17 @@ class Target:
     def optimize(self, llmodule):
         llpassmgr = llvm.create_module_pass_manager()
 
+        if self.opt_level != "default":
+            opt_level, size_level, inlining_threshold = opt_levels[self.opt_level]
+            llpassmgrbuilder = llvm.create_pass_manager_builder()
+            llpassmgrbuilder.opt_level = opt_level
+            llpassmgrbuilder.size_level = size_level
+            if inlining_threshold is not None:
+                llpassmgrbuilder.inlining_threshold = inlining_threshold
+            llpassmgrbuilder.populate(llpassmgr)
+            llpassmgr.run(llmodule)
+            return
+
         # Register our alias analysis passes.
         llpassmgr.add_basic_alias_analysis_pass()
         llpassmgr.add_type_based_alias_analysis_pass()
@@ -120,8 +158,8 @@ class Target:
 
         llpassmgr.run(llmodule)
 
-    def compile(self, module):
-        """Compile the module to a relocatable object for this target."""
+    def build_llvm_ir(self, module):
+        """Generate unoptimized LLVM IR for the module."""
 
         if os.getenv("ARTIQ_DUMP_SIG"):
             print("====== MODULE_SIGNATURE DUMP ======", file=sys.stderr)
@@ -131,11 +169,18 @@ class Target:
         _dump(os.getenv("ARTIQ_DUMP_IR"), "ARTIQ IR", ".txt",
               lambda: "\n".join(fn.as_entity(type_printer) for fn in module.artiq_ir))
 
-        llmod = module.build_llvm_ir(self)
+        return module.build_llvm_ir(self)
 
+    def compile(self, module):
+        """Compile the module to a relocatable object for this target."""
+        return self.compile_llvm_ir(self.build_llvm_ir(module))
+
+    def compile_llvm_ir(self, llmod):
+        """Verify and optimize LLVM IR generated for this target."""
         try:
-            llparsedmod = llvm.parse_assembly(str(llmod))
-            llparsedmod.verify()
+            with self.statistics.measure("LLVM parse"):
+                llparsedmod = llvm.parse_assembly(str(llmod))
+                llparsedmod.verify()
         except RuntimeError:
             _dump("", "LLVM IR (broken)", ".ll", lambda: str(llmod))
             raise
@@ -143,7 +188,9 @@ class Target:
         _dump(os.getenv("ARTIQ_DUMP_UNOPT_LLVM"), "LLVM IR (generated)", "_unopt.ll",
               lambda: str(llparsedmod))
 
-        self.optimize(llparsedmod)
+        with self.statistics.measure("LLVM optimize") as pass_:
+            self.optimize(llparsedmod)
+        pass_.count(llparsedmod)
 
         _dump(os.getenv("ARTIQ_DUMP_LLVM"), "LLVM IR (optimized)", ".ll",
               lambda: str(llparsedmod))
@@ -159,17 +206,22 @@ class Target:
         _dump(os.getenv("ARTIQ_DUMP_OBJ"), "Object file", ".o",
               lambda: llmachine.emit_object(llmodule))
 
-        return llmachine.emit_object(llmodule)
+        with self.statistics.measure("LLVM codegen") as pass_:
+            obj = llmachine.emit_object(llmodule)
+        pass_.count(obj)
+        return obj
 
     def link(self, objects):
         """Link the relocatable objects into a shared library for this target."""
-        with RunTool([self.triple + "-ld", "-shared", "--eh-frame-hdr"] +
-                     ["{{obj{}}}".format(index) for index in range(len(objects))] +
-                     ["-o", "{output}"],
-                     output=b"",
-                     **{"obj{}".format(index): obj for index, obj in enumerate(objects)}) \
+        with self.statistics.measure("ld") as pass_, \
+                RunTool([self.triple + "-ld", "-shared", "--eh-frame-hdr"] +
+                        ["{{obj{}}}".format(index) for index in range(len(objects))] +
+                        ["-o", "{output}"],
+                        output=b"",
+                        **{"obj{}".format(index): obj for index, obj in enumerate(objects)}) \
                 as results:
             library = results["output"].read()
+            pass_.count(library)
 
             _dump(os.getenv("ARTIQ_DUMP_ELF"), "Shared library", ".elf",
                   lambda: library)
@@ -180,15 +232,28 @@ class Target:
         return self.link([self.assemble(self.compile(module)) for module in modules])
 
     def strip(self, library):
-        with RunTool([self.triple + "-strip", "--strip-debug", "{library}", "-o", "{output}"],
-                     library=library, output=b"") \
+        with self.statistics.measure("strip") as pass_, \
+                RunTool([self.triple + "-strip", "--strip-debug", "{library}", "-o", "{output}"],
+                        library=library, output=b"") \
                 as results:
-            return results["output"].read()
-
-    def symbolize(self, library, addresses):
-        if addresses == []:
-            return []
-
+            stripped_library = results["output"].read()
+            pass_.count(stripped_library)
+            return stripped_library
+
+    def _symbolizer(self, library):
+        if library not in self._symbolizers:
+            try:
+                self._symbolizers[library] = symbolizer.Symbolizer(library)
+            except symbolizer.SymbolizerError as error:
+                logger.debug("in-process symbolizer failed, using %s-addr2line: %s",
+                             self.triple, error)
+                self._symbolizers[library] = None
+            # Keep the debug information of the last few kernels only.
+            while len(self._symbolizers) > 8:
+                self._symbolizers.popitem(last=False)
+        return self._symbolizers[library]
+
+    def _symbolize_external(self, library, addresses):
         # We got a list of return addresses, i.e. addresses of instructions
         # just after the call. Offset them back to get an address somewhere
         # inside the call instruction (or its delay slot), since that's what
@@ -224,13 +289,24 @@ class Target:
                 backtrace.append((filename, line, -1, function, address))
             return backtrace
 
+    def symbolize(self, library, addresses):
+        """Map the return addresses of a backtrace to a list of
+        ``(filename, line, column, function, address)`` frames, innermost
+        first, using the debug information in the unstripped ``library``."""
+        if addresses == []:
+            return []
+
+        library_symbolizer = self._symbolizer(library)
+        if library_symbolizer is None:
+            return self._symbolize_external(library, addresses)
+        return library_symbolizer.symbolize(addresses)
+
     def demangle(self, names):
-        with RunTool([self.triple + "-c++filt"] + names) as results:
-            return results["__stdout__"].rstrip().split("\n")
+        return [symbolizer.demangle(name) for name in names]
 
 class NativeTarget(Target):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, statistics=None, opt_level="default"):
+        super().__init__(statistics, opt_level)
         self.triple = llvm.get_default_triple()
 
 class OR1KTarget(Target):
@@ -4,6 +4,7 @@ from ...language.environment import ProcessArgumentManager
 from ...master.databases import DeviceDB, DatasetDB
 from ...master.worker_db import DeviceManager, DatasetManager
 from ..module import Module
+from .. import embedding
 from ..embedding import Stitcher
 from ..targets import OR1KTarget
 from . import benchmark
@@ -43,6 +44,10 @@ def main():
         stitcher.finalize()
         return stitcher
 
+    def embed_uncached():
+        embedding._parse_cache.clear()
+        return embed()
+
     stitcher = embed()
     module = Module(stitcher)
     target = OR1KTarget()
@@ -53,6 +58,9 @@ def main():
     benchmark(lambda: embed(),
               "ARTIQ embedding")
 
+    benchmark(lambda: embed_uncached(),
+              "ARTIQ embedding without parse cache")
+
     benchmark(lambda: Module(stitcher),
               "ARTIQ transforms and validators")
 
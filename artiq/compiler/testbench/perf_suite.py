@@ -0,0 +1,391 @@
+"""
+Runs a corpus of kernels through the whole compiler pipeline and records
+the time spent in each pass, optionally comparing it against a baseline.
+
+The corpus consists of the ``test/lit/integration`` tests, of synthetic
+kernels that stress the compiler (long straight-line RTIO sequences, deep
+call graphs, large list literals) and of any additional files given on
+the command line. A file that defines a ``Benchmark`` experiment class
+(as for :mod:`perf_embedding`) is embedded using a stub device database;
+any other file is compiled as a standalone module.
+
+Each case can be compiled at several LLVM optimization levels, and with
+``--run``, standalone modules compiled for the native target are also
+executed, to compare the compile time and the run time of each level.
+
+Example::
+
+    python -m artiq.compiler.testbench.perf_suite -o baseline.json
+    # ... change the compiler ...
+    python -m artiq.compiler.testbench.perf_suite -b baseline.json
+    LIBARTIQ_SUPPORT=... python -m artiq.compiler.testbench.perf_suite \
+        -t native -O default -O O1 -O O3 --run
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import ctypes
+import shutil
+import tempfile
+import argparse
+import platform
+from collections import OrderedDict
+
+from pythonparser import diagnostic
+from llvmlite_artiq import binding as llvm
+
+from artiq import __version__ as artiq_version, __artiq_dir__ as artiq_dir
+from ...language.environment import ProcessArgumentManager
+from ...master.worker_db import DeviceManager
+from ..module import Module, Source
+from ..embedding import Stitcher
+from ..targets import NativeTarget, OR1KTarget, opt_levels
+from ..statistics import CompilerStatistics
+
+
+_device_db = {
+    "core": {
+        "type": "local",
+        "module": "artiq.coredevice.core",
+        "class": "Core",
+        "arguments": {"host": None, "ref_period": 1e-9}
+    },
+}
+for _i in range(8):
+    _device_db["ttl{}".format(_i)] = {
+        "type": "local",
+        "module": "artiq.coredevice.ttl",
+        "class": "TTLInOut" if _i < 4 else "TTLOut",
+        "arguments": {"channel": _i}
+    }
+for _i in range(2):
+    _device_db["spi{}".format(_i)] = {
+        "type": "local",
+        "module": "artiq.coredevice.spi",
+        "class": "SPIMaster",
+        "arguments": {"channel": 8 + _i}
+    }
+
+
+class _StubDeviceDB:
+    def get_device_db(self):
+        return _device_db
+
+    def get(self, key):
+        return _device_db[key]
+
+
+def _rtio_sequence(events):
+    lines = [
+        "from artiq.experiment import *",
+        "",
+        "class Benchmark(EnvExperiment):",
+        "    def build(self):",
+        "        self.setattr_device(\"core\")",
+        "        for i in range(8):",
+        "            self.setattr_device(\"ttl{}\".format(i))",
+        "        self.setattr_device(\"spi0\")",
+        "",
+        "    @kernel",
+        "    def run(self):",
+        "        self.core.reset()",
+        "        self.spi0.set_config_mu(0, 4, 4)",
+        "        self.spi0.set_xfer(1, 32, 0)",
+    ]
+    for i in range(events):
+        if i % 10 == 9:
+            lines.append("        self.spi0.write({})".format(i))
+        else:
+            lines.append("        self.ttl{}.pulse({}*ns)".format(i % 8, 8*(i % 5 + 1)))
+    return "\n".join(lines) + "\n"
+
+def _call_graph(depth, width):
+    lines = [
+        "from artiq.experiment import *",
+        "",
+        "class Benchmark(EnvExperiment):",
+        "    def build(self):",
+        "        self.setattr_device(\"core\")",
+        "",
+    ]
+    function = "    @kernel\n    def f{}_{}(self, x):\n" \
+               "        if x == 0:\n            return 1\n        return {}\n"
+    lines += [function.format(0, i, "x + {}".format(i)) for i in range(width)]
+    for level in range(1, depth):
+        for i in range(width):
+            callees = ["self.f{}_{}(x + {})".format(level - 1, (i + j) % width, j)
+                       for j in range(2)]
+            lines.append(function.format(level, i, " - ".join(callees)))
+    lines += [
+        "    @kernel",
+        "    def run(self):",
+        "        n = 0",
+    ]
+    lines += ["        n += self.f{}_{}({})".format(depth - 1, i, i)
+              for i in range(width)]
+    return "\n".join(lines) + "\n"
+
+def _list_literals(length):
+    lines = [
+        "x = [{}]".format(", ".join(str(i) for i in range(length))),
+        "y = [{}]".format(", ".join("{}.5".format(i) for i in range(length))),
+        "z = [(x[i], y[i]) for i in range(len(x))]",
+        "assert len(z) == {}".format(length),
+    ]
+    return "\n".join(lines) + "\n"
+
+synthetic = OrderedDict([
+    ("synthetic/rtio_sequence.py", lambda: _rtio_sequence(1000)),
+    ("synthetic/call_graph.py",    lambda: _call_graph(20, 4)),
+    ("synthetic/list_literals.py", lambda: _list_literals(2000)),
+])
+
+
+def _is_embedded(code):
+    return re.search(r"^class Benchmark\b", code, re.MULTILINE) is not None
+
+def _compile_embedded(filename, code, statistics, device_mgr):
+    testcase_vars = {"__name__": "testbench"}
+    exec(compile(code, filename, "exec"), testcase_vars)
+    experiment = testcase_vars["Benchmark"](
+        (device_mgr, None, ProcessArgumentManager({})))
+
+    stitcher = Stitcher(core=experiment.core, dmgr=device_mgr)
+    with statistics.measure("Stitcher.stitch_call"):
+        stitcher.stitch_call(experiment.run, (), {})
+    with statistics.measure("Stitcher.finalize") as pass_:
+        stitcher.finalize()
+    pass_.count(stitcher.typedtree,
+                sweeps=stitcher.inference_sweeps,
+                visits=stitcher.inference_visits)
+    return Module(stitcher, ref_period=experiment.core.ref_period,
+                  statistics=statistics)
+
+def _compile_standalone(filename, code, statistics, engine):
+    with statistics.measure("Source") as pass_:
+        source = Source.from_string(code, filename, engine=engine)
+    pass_.count(source.typedtree)
+    return Module(source, statistics=statistics)
+
+def _run_jit(target, module, llmodule):
+    llmachine = llvm.Target.from_triple(target.triple).create_target_machine()
+    lljit = llvm.create_mcjit_compiler(llmodule, llmachine)
+    llmain = lljit.get_function_address(module.name + ".__modinit__")
+    start = time.perf_counter()
+    ctypes.CFUNCTYPE(None)(llmain)()
+    return time.perf_counter() - start
+
+def run_case(name, filename, code, target_name, device_mgr, engine,
+             opt_level="default", run=False):
+    """Compiles ``code``, stored in ``filename``, once for the target
+    ``target_name`` (``"native"``, ``"or1k"`` or ``"frontend"``, which stops
+    after the ARTIQ transforms) at the LLVM optimization level ``opt_level``.
+
+    If ``run`` is true and ``code`` is a standalone module compiled for the
+    native target, the module is then executed.
+
+    Returns the :class:`CompilerStatistics` of the compilation and the run
+    time, or ``None`` if the module was not executed."""
+    statistics = CompilerStatistics(kernel=name)
+    if target_name == "native":
+        target = NativeTarget(statistics=statistics, opt_level=opt_level)
+    elif target_name == "or1k":
+        target = OR1KTarget(statistics=statistics, opt_level=opt_level)
+    else:
+        target = None
+
+    embedded = _is_embedded(code)
+    if embedded:
+        module = _compile_embedded(filename, code, statistics, device_mgr)
+    else:
+        module = _compile_standalone(filename, code, statistics, engine)
+
+    run_time = None
+    if target is not None:
+        llmodule = target.compile(module)
+        obj = target.assemble(llmodule)
+        if target_name == "or1k" and shutil.which(target.triple + "-ld"):
+            target.strip(target.link([obj]))
+        if run and target_name == "native" and not embedded:
+            run_time = _run_jit(target, module, llmodule)
+    return statistics, run_time
+
+def summarize(runs):
+    """Merges the statistics of several runs of the same case, keeping the
+    minimum time of each pass."""
+    passes = OrderedDict()
+    for statistics in runs:
+        for pass_ in statistics.as_dict()["passes"]:
+            if pass_["name"] in passes:
+                merged = passes[pass_["name"]]
+                merged["time"] = min(merged["time"], pass_["time"])
+            else:
+                passes[pass_["name"]] = pass_
+    return OrderedDict([
+        ("time", min(statistics.total_time() for statistics in runs)),
+        ("passes", list(passes.values())),
+    ])
+
+def compare(baseline, results, threshold, min_time=1e-3):
+    """Returns a list of ``(case, target, pass, old_time, new_time)`` for
+    every total or pass time in ``results`` that is more than ``threshold``
+    (a fraction) slower than in ``baseline``. Times under ``min_time``
+    seconds in the baseline are too noisy to be compared and are ignored."""
+    regressions = []
+    def check(case, target, name, old_time, new_time):
+        if old_time >= min_time and new_time > old_time * (1 + threshold):
+            regressions.append((case, target, name, old_time, new_time))
+
+    for case, targets in results.items():
+        for target, result in targets.items():
+            try:
+                old_result = baseline[case][target]
+            except KeyError:
+                continue
+            check(case, target, None, old_result["time"], result["time"])
+            if "run_time" in result and "run_time" in old_result:
+                check(case, target, "run", old_result["run_time"], result["run_time"])
+
+            old_passes = {pass_["name"]: pass_ for pass_ in old_result["passes"]}
+            for pass_ in result["passes"]:
+                if pass_["name"] in old_passes:
+                    check(case, target, pass_["name"],
+                          old_passes[pass_["name"]]["time"], pass_["time"])
+    return regressions
+
+
+def get_argparser():
+    parser = argparse.ArgumentParser(
+        description="ARTIQ compiler benchmark suite")
+    parser.add_argument("files", nargs="*", metavar="FILE",
+                        help="additional files to benchmark")
+    parser.add_argument("-t", "--target", action="append",
+                        choices=["native", "or1k", "frontend"],
+                        help="targets to compile for, may be given several "
+                             "times; \"frontend\" stops after the ARTIQ "
+                             "transforms (default: native and or1k)")
+    parser.add_argument("-O", "--opt-level", action="append",
+                        choices=["default"] + sorted(opt_levels),
+                        help="LLVM optimization levels, may be given several "
+                             "times (default: default)")
+    parser.add_argument("--run", default=False, action="store_true",
+                        help="also execute the standalone modules compiled "
+                             "for the native target, and record their run "
+                             "time; set LIBARTIQ_SUPPORT to the path of "
+                             "libartiq_support for the modules that need it")
+    parser.add_argument("-k", "--filter", default=None,
+                        help="only run the cases whose name matches this "
+                             "regular expression")
+    parser.add_argument("-n", "--repeat", type=int, default=5,
+                        help="number of runs of each case, of which the "
+                             "fastest is kept (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", default=None,
+                        help="compare the results against this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown above which a time is "
+                             "reported as a regression (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=1e-3,
+                        help="baseline times (in seconds) under which no "
+                             "comparison is made (default: %(default)s)")
+    parser.add_argument("--no-lit", default=False, action="store_true",
+                        help="do not include the lit integration tests")
+    parser.add_argument("--no-synthetic", default=False, action="store_true",
+                        help="do not include the synthetic kernels")
+    return parser
+
+def corpus(args):
+    cases = OrderedDict()
+    if not args.no_lit:
+        lit_dir = os.path.join(artiq_dir, "test", "lit", "integration")
+        for name in sorted(os.listdir(lit_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(lit_dir, name)) as f:
+                    cases["integration/" + name] = f.read()
+    if not args.no_synthetic:
+        for name, generate in synthetic.items():
+            cases[name] = generate()
+    for filename in args.files:
+        with open(filename) as f:
+            cases[filename] = f.read()
+    if args.filter is not None:
+        cases = OrderedDict((name, code) for name, code in cases.items()
+                            if re.search(args.filter, name))
+    return cases
+
+def main():
+    args = get_argparser().parse_args()
+    targets = args.target or ["native", "or1k"]
+    levels = args.opt_level or ["default"]
+
+    libartiq_support = os.getenv("LIBARTIQ_SUPPORT")
+    if libartiq_support is not None:
+        llvm.load_library_permanently(libartiq_support)
+
+    def process_diagnostic(diag):
+        if diag.level in ("fatal", "error"):
+            print("\n".join(diag.render()), file=sys.stderr)
+            raise diagnostic.Error(diag)
+    engine = diagnostic.Engine()
+    engine.process = process_diagnostic
+
+    device_mgr = DeviceManager(_StubDeviceDB())
+
+    results = OrderedDict()
+    # Embedded kernels are compiled from source files, which must exist on
+    # disk for the source of the kernel functions to be retrieved.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, code in corpus(args).items():
+            filename = os.path.join(tmpdir, name.replace("/", "_"))
+            with open(filename, "w") as f:
+                f.write(code)
+
+            results[name] = OrderedDict()
+            for target in targets:
+                for level in (levels if target != "frontend" else ["default"]):
+                    runs = [run_case(name, filename, code, target, device_mgr,
+                                     engine, level, args.run)
+                            for _ in range(args.repeat)]
+                    result = summarize([statistics for statistics, _ in runs])
+                    if runs[0][1] is not None:
+                        result["run_time"] = min(run_time for _, run_time in runs)
+
+                    key = target
+                    if level != "default":
+                        key = "{}-{}".format(target, level)
+                    results[name][key] = result
+
+                    line = "{:<40} {:<12} {:>10.2f} ms".format(
+                        name, key, result["time"]*1e3)
+                    if "run_time" in result:
+                        line += " {:>10.3f} ms run".format(result["run_time"]*1e3)
+                    print(line)
+
+    report = OrderedDict([
+        ("artiq_version", artiq_version),
+        ("python_version", platform.python_version()),
+        ("repeat", args.repeat),
+        ("results", results),
+    ])
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline["results"], results,
+                              args.threshold, args.min_time)
+        for case, target, name, old_time, new_time in regressions:
+            print("REGRESSION: {} ({}) {}: {:.2f} ms -> {:.2f} ms (+{:.0f}%)".format(
+                case, target, name or "total", old_time*1e3, new_time*1e3,
+                (new_time/old_time - 1)*100))
+        if regressions:
+            exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,5 @@ from .artiq_ir_generator import ARTIQIRGenerator
 from .dead_code_eliminator import DeadCodeEliminator
 from .llvm_ir_generator import LLVMIRGenerator
 from .interleaver import Interleaver
+from .rtio_coalescer import RTIOCoalescer
 from .typedtree_printer import TypedtreePrinter
@@ -278,6 +278,9 @@ class Inferencer(algorithm.Visitor):
 
     def visit_CoerceT(self, node):
         self.generic_visit(node)
+        self._check_coerce(node)
+
+    def _check_coerce(self, node):
         if builtins.is_numeric(node.type) and builtins.is_numeric(node.value.type):
             pass
         else:
@@ -302,9 +305,12 @@ class Inferencer(algorithm.Visitor):
         else:
             node = asttyped.CoerceT(type=typ, value=coerced_node, other_value=other_node,
                                     loc=coerced_node.loc)
-        self.visit(node)
+        self._visit_coerce(node)
         return node
 
+    def _visit_coerce(self, node):
+        self.visit(node)
+
     def _coerce_numeric(self, nodes, map_return=lambda typ: typ):
         # See https://docs.python.org/3/library/stdtypes.html#numeric-types-int-float-complex.
         node_types = []
@@ -19,6 +19,7 @@ class IODelayEstimator(algorithm.Visitor):
         self.engine         = engine
         self.ref_period     = ref_period
         self.changed        = False
+        self.iterations     = 0
         self.current_delay  = iodelay.Const(0)
         self.current_args   = None
         self.current_goto   = None
@@ -78,8 +79,10 @@ class IODelayEstimator(algorithm.Visitor):
         raise _IndeterminateDelay(diag)
 
     def visit_fixpoint(self, node):
+        self.iterations = 0
         while True:
             self.changed = False
+            self.iterations += 1
             self.visit(node)
             if not self.changed:
                 return
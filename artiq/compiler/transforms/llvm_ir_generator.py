@@ -137,6 +137,8 @@ class LLVMIRGenerator:
         self.llfunction = None
         self.llmap = {}
         self.llobject_map = {}
+        self.attribute_writeback = False
+        self.llwriteback_attrs = {}
         self.phis = []
         self.debug_info_emitter = DebugInfoEmitter(self.llmodule)
         self.empty_metadata = self.llmodule.add_metadata([])
@@ -487,14 +489,70 @@ class LLVMIRGenerator:
             assert False
 
     def process(self, functions, attribute_writeback):
+        self.attribute_writeback = \
+            attribute_writeback and self.embedding_map is not None
+
         for func in functions:
             self.process_function(func)
 
-        if attribute_writeback and self.embedding_map is not None:
+        if self.attribute_writeback:
             self.emit_attribute_writeback()
 
         return self.llmodule
 
+    def llrpcattrty(self):
+        llrpcattrty = self.llcontext.get_identified_type("A")
+        llrpcattrty.elements = [lli32, llslice, llslice]
+        return llrpcattrty
+
+    def llwriteback_attr(self, typ, attr):
+        """Returns the writeback descriptor for the attribute ``attr`` of
+        instance type ``typ`` and the length of its RPC tag, or ``None``
+        if this attribute is never written back."""
+        key = (typ.name, attr)
+        if key in self.llwriteback_attrs:
+            return self.llwriteback_attrs[key]
+
+        attrtyp = typ.attributes[attr]
+        if attr in typ.constant_attributes or types.is_function(attrtyp) or \
+                types.is_method(attrtyp) or types.is_rpc(attrtyp):
+            result = None
+        else:
+            def rpc_tag_error(typ):
+                print(typ)
+                assert False
+
+            rpctag = b"Os" + self._rpc_tag(attrtyp, error_handler=rpc_tag_error) + b":n"
+            llrpcattr = ll.GlobalVariable(self.llmodule, self.llrpcattrty(),
+                                          name="A.I.{}.{}".format(typ.name, attr))
+            llrpcattr.linkage = 'private'
+            result = llrpcattr, rpctag
+
+        self.llwriteback_attrs[key] = result
+        return result
+
+    def mark_attribute_dirty(self, typ, attr):
+        """Makes the attribute ``attr`` of instance type ``typ`` written back
+        at the end of the kernel.
+
+        Only the attributes that are stored to, or whose value is mutable and
+        loaded, by the kernel are included in the writeback tables at all.
+        The descriptors of those attributes start with an empty RPC tag, which
+        the runtime skips, and the tag length is only filled in when this code
+        is reached; unmodified attributes are then not sent to the host."""
+        if not self.attribute_writeback or not types.is_instance(typ):
+            return
+
+        writeback_attr = self.llwriteback_attr(typ, attr)
+        if writeback_attr is None:
+            return
+
+        llrpcattr, rpctag = writeback_attr
+        lltaglenptr = self.llbuilder.gep(llrpcattr, [self.llindex(0), self.llindex(1),
+                                                     self.llindex(1)],
+                                         inbounds=True)
+        self.llbuilder.store(ll.Constant(lli32, len(rpctag)), lltaglenptr)
+
     def emit_attribute_writeback(self):
         llobjects = defaultdict(lambda: [])
 
@@ -503,8 +561,7 @@ class LLVMIRGenerator:
             if llobject is not None:
                 llobjects[obj_typ].append(llobject.bitcast(llptr))
 
-        llrpcattrty = self.llcontext.get_identified_type("A")
-        llrpcattrty.elements = [lli32, llslice, llslice]
+        llrpcattrty = self.llrpcattrty()
 
         lldescty = self.llcontext.get_identified_type("D")
         lldescty.elements = [llrpcattrty.as_pointer().as_pointer(), llptr.as_pointer()]
@@ -520,32 +577,21 @@ class LLVMIRGenerator:
                 type_name = "I.{}".format(typ.name)
 
             def llrpcattr_of_attr(offset, name, typ):
-                def rpc_tag_error(typ):
-                    print(typ)
-                    assert False
-
-                if not (types.is_function(typ) or types.is_method(typ) or types.is_rpc(typ) or
-                        name == "__objectid__"):
-                    rpctag = b"Os" + self._rpc_tag(typ, error_handler=rpc_tag_error) + b":n"
-                else:
-                    rpctag = b""
+                if name == "__objectid__":
+                    llrpcattrinit = ll.Constant(llrpcattrty, [
+                        ll.Constant(lli32, offset),
+                        self.llconst_of_const(ir.Constant(b"", builtins.TStr())),
+                        self.llconst_of_const(ir.Constant(name, builtins.TStr()))
+                    ])
+                    return self.get_or_define_global(name, llrpcattrty, llrpcattrinit)
 
-                llrpcattrinit = ll.Constant(llrpcattrty, [
+                llrpcattr, rpctag = self.llwriteback_attrs[(typ.name, name)]
+                # The tag length is set by mark_attribute_dirty().
+                llrpcattr.initializer = ll.Constant(llrpcattrty, [
                     ll.Constant(lli32, offset),
-                    self.llconst_of_const(ir.Constant(rpctag, builtins.TStr())),
+                    ll.Constant(llslice, [self.llstr_of_str(rpctag), ll.Constant(lli32, 0)]),
                     self.llconst_of_const(ir.Constant(name, builtins.TStr()))
                 ])
-
-                if name == "__objectid__":
-                    return self.get_or_define_global(name, llrpcattrty, llrpcattrinit)
-
-                llrpcattr = ll.GlobalVariable(self.llmodule, llrpcattrty,
-                                              name="A.{}.{}".format(type_name, name))
-                llrpcattr.initializer = llrpcattrinit
-                llrpcattr.global_constant = True
-                llrpcattr.unnamed_addr = True
-                llrpcattr.linkage = 'private'
-
                 return llrpcattr
 
             offset = 0
@@ -560,8 +606,9 @@ class LLVMIRGenerator:
                 if offset % alignment != 0:
                     offset += alignment - (offset % alignment)
 
-                if types.is_instance(typ) and attr not in typ.constant_attributes:
-                    llrpcattrs.append(llrpcattr_of_attr(offset, attr, attrtyp))
+                if types.is_instance(typ) and (attr == "__objectid__" or
+                        self.llwriteback_attrs.get((typ.name, attr)) is not None):
+                    llrpcattrs.append(llrpcattr_of_attr(offset, attr, typ))
 
                 offset += size
 
@@ -876,6 +923,9 @@ class LLVMIRGenerator:
                 llvalue = self.llbuilder.load(llptr, name="val.{}".format(insn.name))
                 if types.is_instance(typ) and attr in typ.constant_attributes:
                     llvalue.set_metadata('unconditionally.invariant.load', self.empty_metadata)
+                elif attr in typ.attributes and builtins.is_mutable(insn.type):
+                    # The value may be modified in place.
+                    self.mark_attribute_dirty(typ, attr)
                 if isinstance(llvalue.type, ll.PointerType):
                     self.mark_dereferenceable(llvalue)
                 return llvalue
@@ -900,6 +950,7 @@ class LLVMIRGenerator:
             llptr = self.llbuilder.gep(obj, [self.llindex(0),
                                              self.llindex(self.attr_index(typ, attr))],
                                        inbounds=True, name=insn.name)
+            self.mark_attribute_dirty(typ, attr)
             return self.llbuilder.store(llvalue, llptr)
 
     def process_GetElem(self, insn):
@@ -1201,7 +1252,11 @@ class LLVMIRGenerator:
         for i, arg in enumerate(insn.arguments()):
             llarg = self.map(arg)
             if isinstance(llarg.type, (ll.LiteralStructType, ll.IdentifiedStructType)):
-                llslot = self.llbuilder.alloca(llarg.type)
+                # The slot is allocated in the entry block, so that calls
+                # in loops do not grow the stack.
+                llentrybuilder = ll.IRBuilder()
+                llentrybuilder.position_at_start(self.llfunction.blocks[0])
+                llslot = llentrybuilder.alloca(llarg.type)
                 self.llbuilder.store(llarg, llslot)
                 llargs.append(llslot)
                 byvals.append(i)
@@ -0,0 +1,136 @@
+"""
+:class:`RTIOCoalescer` merges consecutive ``rtio_output`` calls to the same
+channel at the same timestamp into a single ``rtio_output_batch`` call,
+in the functions that have the ``coalesce-rtio`` flag.
+"""
+
+from collections import OrderedDict
+from .. import types, builtins, ir
+
+
+# Instructions that neither write memory nor change the timeline, and may
+# separate two coalesced outputs.
+_PURE_INSNS = (ir.Quote, ir.GetLocal, ir.GetAttr, ir.Arith, ir.Compare,
+               ir.Select, ir.Coerce)
+
+def _is_rtio_output(insn):
+    if not isinstance(insn, ir.Call):
+        return False
+    function_type = insn.target_function().type.find()
+    return types.is_c_function(function_type) and \
+        function_type.name == "rtio_output" and len(insn.arguments()) == 4 and \
+        not any(insn.uses)
+
+def _is_pure(insn):
+    return isinstance(insn, _PURE_INSNS) or \
+        (isinstance(insn, ir.Builtin) and insn.op == "now_mu")
+
+
+class RTIOCoalescer:
+    def __init__(self, engine):
+        self.engine = engine
+        self.coalesced = 0
+
+    def process(self, functions):
+        for func in functions:
+            if "coalesce-rtio" in func.flags:
+                self.process_function(func)
+
+    def process_function(self, func):
+        for block in list(func.basic_blocks):
+            for run in self.find_runs(block):
+                self.coalesce(func, run)
+
+    def find_runs(self, block):
+        """
+        Returns the lists of ``rtio_output`` calls of ``block`` that can be
+        merged. Two calls can be merged if only pure instructions separate
+        them and their timestamp and channel operands provably have the
+        same value, i.e. are computed in the same way from the same values
+        by pure instructions that follow the last impure one.
+        """
+        runs = []
+        segment = set()
+        keys = {}
+        run, run_key = [], None
+
+        def key(value):
+            if value not in segment:
+                if isinstance(value, ir.Constant):
+                    return ("constant", value.value)
+                return value
+            if value not in keys:
+                if isinstance(value, ir.Builtin):
+                    keys[value] = ("now_mu",)
+                elif isinstance(value, ir.Quote):
+                    keys[value] = ("quote", id(value.value))
+                elif isinstance(value, ir.GetLocal):
+                    keys[value] = ("getlocal", key(value.environment()), value.var_name)
+                elif isinstance(value, ir.GetAttr):
+                    keys[value] = ("getattr", key(value.object()), value.attr)
+                elif isinstance(value, ir.Arith):
+                    keys[value] = ("arith", type(value.op),
+                                   key(value.lhs()), key(value.rhs()))
+                else:
+                    keys[value] = value
+            return keys[value]
+
+        def close():
+            if len(run) > 1:
+                runs.append(run)
+
+        for insn in block.instructions:
+            if _is_rtio_output(insn):
+                time, channel = insn.arguments()[:2]
+                insn_key = (key(time), key(channel))
+                if run and insn_key == run_key:
+                    run.append(insn)
+                else:
+                    close()
+                    run, run_key = [insn], insn_key
+            elif _is_pure(insn):
+                segment.add(insn)
+            else:
+                close()
+                segment, keys = set(), {}
+                run, run_key = [], None
+        close()
+        return runs
+
+    def coalesce(self, func, run):
+        first, last = run[0], run[-1]
+        time, channel = first.arguments()[:2]
+
+        # The lists are allocated once per call of the function, so that
+        # coalescing outputs in a loop does not grow the stack. (The slots
+        # of the list arguments of the call itself are also allocated in the
+        # entry block, by LLVMIRGenerator.)
+        size_type = builtins.TInt32()
+        length = ir.Constant(len(run), size_type)
+        entry = func.entry()
+        addrs = ir.Alloc([length], builtins.TList(builtins.TInt32()))
+        data = ir.Alloc([length], builtins.TList(builtins.TInt32()))
+        entry.insert(data, entry.instructions[0])
+        entry.insert(addrs, entry.instructions[0])
+
+        block = last.basic_block
+        for index, insn in enumerate(run):
+            _, _, addr, datum = insn.arguments()
+            for lst, value in ((addrs, addr), (data, datum)):
+                block.insert(ir.SetElem(lst, ir.Constant(index, size_type), value), last)
+
+        function_type = types.TCFunction(
+            OrderedDict([("time_mu", builtins.TInt64()),
+                         ("channel", builtins.TInt32()),
+                         ("addr", addrs.type),
+                         ("data", data.type)]),
+            builtins.TNone(), name="rtio_output_batch", flags={"nowrite"})
+        function = ir.Quote(None, function_type)
+        block.insert(function, last)
+        call = ir.Call(function, [time, channel, addrs, data], {})
+        call.loc = first.loc
+        block.insert(call, last)
+
+        for insn in run:
+            insn.erase()
+        self.coalesced += len(run) - 1
@@ -51,10 +51,26 @@ class TVar(Type):
 
     In effect, the classic union-find data structure is intrusively
     folded into this class.
+
+    To let iterative inference detect that a pass has made progress without
+    rehashing every type, type variables remember the generation (see
+    :meth:`next_generation`) in which they were created, and
+    :attr:`bindings` counts the unifications that bind a type variable
+    from an earlier generation. Binding such a variable to a fresh one
+    does not add any information and is not counted; instead, the fresh
+    variable inherits the generation of the old one.
     """
 
+    generation = 0
+    bindings = 0
+
+    @classmethod
+    def next_generation(cls):
+        cls.generation += 1
+
     def __init__(self):
         self.parent = self
+        self.created_in = TVar.generation
 
     def find(self):
         if self.parent is self:
@@ -84,6 +100,11 @@ class TVar(Type):
         other = other.find()
 
         if self.parent is self:
+            if other is not self and self.created_in != TVar.generation:
+                if other.__class__ == TVar and other.created_in == TVar.generation:
+                    other.created_in = self.created_in
+                else:
+                    TVar.bindings += 1
             self.parent = other
         else:
             self.find().unify(other)
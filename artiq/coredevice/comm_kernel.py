@@ -2,6 +2,9 @@ import struct
 import logging
 import socket
 import sys
+import time
+import queue
+import threading
 import traceback
 import numpy
 from enum import Enum
@@ -122,7 +125,7 @@ class CommKernelDummy:
     def run(self):
         pass
 
-    def serve(self, embedding_map, symbolizer, demangler):
+    def serve(self, embedding_map, symbolizer, demangler, profile=None):
         pass
 
     def check_system_info(self):
@@ -138,35 +141,87 @@ class CommKernelDummy:
 class CommKernel:
     warned_of_mismatch = False
 
+    # Size of the receive buffer. Longer reads are received in place.
+    read_buffer_size = 65536
+    # Maximum number of async RPCs waiting to be run. Once it is reached,
+    # the device is not read from until the oldest one has run.
+    async_queue_size = 1024
+
     def __init__(self, host, port=1381):
         self._read_type = None
         self.host = host
         self.port = port
+        self._reset_buffers()
+        self._async_queue = queue.Queue(self.async_queue_size)
+        self._async_thread = None
+        self._async_exception = None
+
+    def _reset_buffers(self):
+        self._read_buffer = bytearray(self.read_buffer_size)
+        self._read_view = memoryview(self._read_buffer)
+        self._read_start = self._read_end = 0
+        self._write_buffer = bytearray()
+        self.bytes_received = self.bytes_sent = 0
+        self._header_start = 0
 
     def open(self):
         if hasattr(self, "socket"):
             return
         self.socket = initialize_connection(self.host, self.port)
-        self.socket.sendall(b"ARTIQ coredev\n")
+        self._reset_buffers()
+        self.write(b"ARTIQ coredev\n")
 
     def close(self):
+        if self._async_thread is not None:
+            self._async_queue.put(None)
+            self._async_thread.join()
+            self._async_thread = None
         if not hasattr(self, "socket"):
             return
         self.socket.close()
         del self.socket
+        self._reset_buffers()
         logger.debug("disconnected")
 
+    def _recv_into(self, view):
+        # The device only sends data in response to our messages.
+        self.flush()
+        length = self.socket.recv_into(view)
+        if not length:
+            raise ConnectionResetError("Connection closed")
+        return length
+
     def read(self, length):
-        r = bytes()
-        while len(r) < length:
-            rn = self.socket.recv(min(8192, length - len(r)))
-            if not rn:
-                raise ConnectionResetError("Connection closed")
-            r += rn
-        return r
+        self.bytes_received += length
+        start, end = self._read_start, self._read_end
+        if end - start >= length:
+            self._read_start = start + length
+            return bytes(self._read_view[start:start + length])
+
+        buffered = end - start
+        self._read_start = self._read_end = 0
+        if length > len(self._read_buffer):
+            data = bytearray(length)
+            view = memoryview(data)
+            view[:buffered] = self._read_view[start:end]
+            while buffered < length:
+                buffered += self._recv_into(view[buffered:])
+            return bytes(data)
+
+        self._read_buffer[:buffered] = self._read_buffer[start:end]
+        while buffered < length:
+            buffered += self._recv_into(self._read_view[buffered:])
+        self._read_start, self._read_end = length, buffered
+        return bytes(self._read_view[:length])
 
     def write(self, data):
-        self.socket.sendall(data)
+        self.bytes_sent += len(data)
+        self._write_buffer += data
+
+    def flush(self):
+        if self._write_buffer:
+            self.socket.sendall(self._write_buffer)
+            self._write_buffer = bytearray()
 
     #
     # Reader interface
@@ -174,15 +229,12 @@ class CommKernel:
 
     def _read_header(self):
         self.open()
+        self._header_start = self.bytes_received
 
         # Wait for a synchronization sequence, 5a 5a 5a 5a.
-        sync_count = 0
-        while sync_count < 4:
-            (sync_byte, ) = struct.unpack("B", self.read(1))
-            if sync_byte == 0x5a:
-                sync_count += 1
-            else:
-                sync_count = 0
+        sync = self.read(4)
+        while sync != b"\x5a\x5a\x5a\x5a":
+            sync = sync[1:] + self.read(1)
 
         # Read message header.
         (raw_type, ) = struct.unpack("B", self.read(1))
@@ -274,6 +326,7 @@ class CommKernel:
 
     def reset_session(self):
         self.write(struct.pack(">ll", 0x5a5a5a5a, 0))
+        self.flush()
 
     def check_system_info(self):
         self._write_empty(_H2DMsgType.SYSTEM_INFO_REQUEST)
@@ -348,9 +401,33 @@ class CommKernel:
 
     _rpc_sentinel = object()
 
+    # Wire formats of the scalar RPC tags, used to transfer lists and arrays
+    # of scalars in bulk.
+    _rpc_scalar_dtypes = {
+        "b": numpy.dtype("u1"),
+        "i": numpy.dtype(">i4"),
+        "I": numpy.dtype(">i8"),
+        "f": numpy.dtype(">f8"),
+    }
+    # Types of the list elements that _send_rpc_value accepts for each scalar
+    # tag, and kinds of the numpy arrays that are accepted in their stead.
+    _rpc_scalar_types = {
+        "b": {bool},
+        "i": {int, numpy.int32},
+        "I": {int, numpy.int32, numpy.int64},
+        "f": {float, numpy.float64},
+    }
+    _rpc_scalar_kinds = {
+        "b": "b",
+        "i": "iu",
+        "I": "iu",
+        "f": "f",
+    }
+
     # See session.c:{send,receive}_rpc_value and llvm_ir_generator.py:_rpc_tag.
-    def _receive_rpc_value(self, embedding_map):
-        tag = chr(self._read_int8())
+    def _receive_rpc_value(self, embedding_map, tag=None):
+        if tag is None:
+            tag = chr(self._read_int8())
         if tag == "\x00":
             return self._rpc_sentinel
         elif tag == "t":
@@ -378,10 +455,16 @@ class CommKernel:
             return self._read_bytes()
         elif tag == "l":
             length = self._read_int32()
-            return [self._receive_rpc_value(embedding_map) for _ in range(length)]
+            elements = self._receive_rpc_elements(embedding_map, length)
+            if not isinstance(elements, numpy.ndarray):
+                return elements
+            elif elements.dtype.kind in "bf":
+                return elements.tolist()
+            else:
+                return list(elements)
         elif tag == "a":
             length = self._read_int32()
-            return numpy.array([self._receive_rpc_value(embedding_map) for _ in range(length)])
+            return numpy.array(self._receive_rpc_elements(embedding_map, length))
         elif tag == "r":
             start = self._receive_rpc_value(embedding_map)
             stop  = self._receive_rpc_value(embedding_map)
@@ -396,6 +479,28 @@ class CommKernel:
         else:
             raise IOError("Unknown RPC value tag: {}".format(repr(tag)))
 
+    def _receive_rpc_elements(self, embedding_map, length):
+        """Receives the ``length`` elements of a list or an array, as a numpy
+        array if they are scalars, and as a list otherwise."""
+        if length == 0:
+            return []
+        tag = chr(self._read_int8())
+        if tag not in self._rpc_scalar_dtypes:
+            return [self._receive_rpc_value(embedding_map, tag)] + \
+                [self._receive_rpc_value(embedding_map) for _ in range(length - 1)]
+
+        # Every element is preceded by its tag.
+        dtype = numpy.dtype([("tag", "u1"), ("value", self._rpc_scalar_dtypes[tag])])
+        data = bytes([ord(tag)]) + self._read_chunk(length * dtype.itemsize - 1)
+        elements = numpy.frombuffer(data, dtype)
+        if (elements["tag"] != ord(tag)).any():
+            raise IOError("Inconsistent RPC value tags in a list of {}"
+                          .format(repr(tag)))
+        if tag == "b":
+            return elements["value"].astype(bool)
+        else:
+            return elements["value"].astype(elements["value"].dtype.newbyteorder("="))
+
     def _receive_rpc_args(self, embedding_map):
         args, kwargs = [], {}
         while True:
@@ -476,13 +581,24 @@ class CommKernel:
             check(isinstance(value, bytearray),
                   lambda: "bytearray")
             self._write_bytes(value)
-        elif tag == "l":
-            check(isinstance(value, list),
-                  lambda: "list")
+        elif tag == "l" or tag == "a":
+            if tag == "l":
+                check(isinstance(value, list),
+                      lambda: "list")
+            else:
+                check(isinstance(value, list) or
+                        (isinstance(value, numpy.ndarray) and value.ndim == 1),
+                      lambda: "1-dimensional array")
             self._write_int32(len(value))
-            for elt in value:
-                tags_copy = bytearray(tags)
-                self._send_rpc_value(tags_copy, elt, root, function)
+            data = self._encode_rpc_elements(chr(tags[0]), value)
+            if data is not None:
+                self._write_chunk(data)
+            else:
+                if isinstance(value, numpy.ndarray):
+                    value = value.tolist()
+                for elt in value:
+                    tags_copy = bytearray(tags)
+                    self._send_rpc_value(tags_copy, elt, root, function)
             self._skip_rpc_value(tags)
         elif tag == "r":
             check(isinstance(value, range),
@@ -497,13 +613,59 @@ class CommKernel:
         else:
             raise IOError("Unknown RPC value tag: {}".format(repr(tag)))
 
+    def _encode_rpc_elements(self, tag, value):
+        """Returns the encoding of the elements of the list or array ``value``
+        if they are all scalars that :meth:`_send_rpc_value` accepts for the
+        tag ``tag``, and ``None`` otherwise."""
+        if tag not in self._rpc_scalar_dtypes:
+            return None
+        if isinstance(value, numpy.ndarray):
+            kind = value.dtype.kind
+            if kind not in self._rpc_scalar_kinds[tag] or \
+                    (kind == "u" and value.dtype.itemsize == 8):
+                return None
+        elif not set(map(type, value)) <= self._rpc_scalar_types[tag]:
+            return None
+        if len(value) == 0:
+            return b""
+
+        if tag == "b":
+            array = numpy.asarray(value, dtype=bool)
+        elif tag == "f":
+            array = numpy.asarray(value, dtype=numpy.float64)
+        else:
+            try:
+                array = numpy.asarray(value, dtype=numpy.int64)
+            except OverflowError:
+                return None
+            bound = 2**31 if tag == "i" else 2**63
+            if not (-bound < array.min() and array.max() < bound - 1):
+                return None
+        return array.astype(self._rpc_scalar_dtypes[tag]).tobytes()
+
     def _truncate_message(self, msg, limit=4096):
         if len(msg) > limit:
             return msg[0:limit] + "... (truncated)"
         else:
             return msg
 
-    def _serve_rpc(self, embedding_map):
+    def _serve_rpc(self, embedding_map, profile=None):
+        if profile is None:
+            self._serve_rpc_request(embedding_map)
+            return
+
+        start = time.perf_counter()
+        # The message header has already been read.
+        bytes_received, bytes_sent = self._header_start, self.bytes_sent
+        try:
+            service_profile = self._serve_rpc_request(embedding_map, profile)
+        finally:
+            profile.rpc_time += time.perf_counter() - start
+        service_profile.calls += 1
+        service_profile.bytes_received += self.bytes_received - bytes_received
+        service_profile.bytes_sent += self.bytes_sent - bytes_sent
+
+    def _serve_rpc_request(self, embedding_map, profile=None):
         async        = self._read_bool()
         service_id   = self._read_int32()
         args, kwargs = self._receive_rpc_args(embedding_map)
@@ -516,12 +678,24 @@ class CommKernel:
         logger.debug("rpc service: [%d]%r%s %r %r -> %s", service_id, service,
                      (" (async)" if async else ""), args, kwargs, return_tags)
 
+        if profile is None:
+            service_profile = None
+        else:
+            service_profile = profile.service(service_id, service, async)
+
         if async:
-            service(*args, **kwargs)
-            return
+            self._queue_async_rpc(service, args, kwargs, service_profile)
+            return service_profile
 
+        # Async RPCs issued before this one must have completed.
+        self._flush_async_rpcs()
         try:
-            result = service(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = service(*args, **kwargs)
+            finally:
+                if service_profile is not None:
+                    service_profile.time += time.perf_counter() - start
             logger.debug("rpc service: %d %r %r = %r", service_id, args, kwargs, result)
 
             self._write_header(_H2DMsgType.RPC_REPLY)
@@ -571,8 +745,66 @@ class CommKernel:
                 self._write_int32(line)
                 self._write_int32(-1) # column not known
                 self._write_string(function)
+        return service_profile
+
+    def _queue_async_rpc(self, service, args, kwargs, service_profile=None):
+        if self._async_thread is None:
+            self._async_thread = threading.Thread(target=self._run_async_rpcs,
+                                                  name="async RPCs", daemon=True)
+            self._async_thread.start()
+        self._async_queue.put((service, args, kwargs, service_profile))
+
+    def _run_async_rpcs(self):
+        # Async RPCs are run in order, off the thread that reads from the
+        # device, so that a slow one does not stall the kernel. Once one
+        # of them raises an exception, the following ones are skipped until
+        # the exception is reported.
+        while True:
+            item = self._async_queue.get()
+            try:
+                if item is None:
+                    return
+                service, args, kwargs, service_profile = item
+                if self._async_exception is None:
+                    start = time.perf_counter()
+                    try:
+                        service(*args, **kwargs)
+                    except BaseException as exn:
+                        logger.debug("rpc service: %r %r %r ! %r (async)",
+                                     service, args, kwargs, exn)
+                        self._async_exception = exn
+                    if service_profile is not None:
+                        service_profile.time += time.perf_counter() - start
+            finally:
+                self._async_queue.task_done()
+
+    def _wait_async_rpcs(self):
+        if self._async_thread is not None:
+            self._async_queue.join()
+
+    def _flush_async_rpcs(self):
+        """Waits for the queued async RPCs to complete, and raises the
+        exception raised by the first one that failed, if any."""
+        self._wait_async_rpcs()
+        exn, self._async_exception = self._async_exception, None
+        if exn is not None:
+            raise exn
+
+    def _drain_async_rpcs(self, profile=None):
+        """Flushes the async RPCs once the kernel has stopped, adding the
+        time spent waiting for them to ``profile``."""
+        if profile is None:
+            self._flush_async_rpcs()
+            return
+
+        start = time.perf_counter()
+        try:
+            self._flush_async_rpcs()
+        finally:
+            profile.async_drain_time += time.perf_counter() - start
 
-    def _serve_exception(self, embedding_map, symbolizer, demangler):
+    def _serve_exception(self, embedding_map, symbolizer, demangler,
+                         profile=None):
         name      = self._read_string()
         message   = self._read_string()
         params    = [self._read_int64() for _ in range(3)]
@@ -595,19 +827,37 @@ class CommKernel:
 
         python_exn = python_exn_type(message.format(*params))
         python_exn.artiq_core_exception = core_exn
+        self._drain_async_rpcs(profile)
         raise python_exn
 
-    def serve(self, embedding_map, symbolizer, demangler):
-        while True:
-            self._read_header()
-            if self._read_type == _D2HMsgType.RPC_REQUEST:
-                self._serve_rpc(embedding_map)
-            elif self._read_type == _D2HMsgType.KERNEL_EXCEPTION:
-                self._serve_exception(embedding_map, symbolizer, demangler)
-            elif self._read_type == _D2HMsgType.WATCHDOG_EXPIRED:
-                raise exceptions.WatchdogExpired
-            elif self._read_type == _D2HMsgType.CLOCK_FAILURE:
-                raise exceptions.ClockFailure
-            else:
-                self._read_expect(_D2HMsgType.KERNEL_FINISHED)
-                return
+    def serve(self, embedding_map, symbolizer, demangler, profile=None):
+        """Serves the RPCs of the running kernel until it finishes.
+
+        If ``profile`` is a :class:`KernelProfile`, the time spent serving
+        RPCs and waiting for the async RPCs after the kernel has stopped, and
+        the statistics of each RPC service, are added to it."""
+        try:
+            while True:
+                self._read_header()
+                if self._read_type == _D2HMsgType.RPC_REQUEST:
+                    self._serve_rpc(embedding_map, profile)
+                elif self._read_type == _D2HMsgType.KERNEL_EXCEPTION:
+                    self._serve_exception(embedding_map, symbolizer, demangler,
+                                          profile)
+                elif self._read_type == _D2HMsgType.WATCHDOG_EXPIRED:
+                    self._drain_async_rpcs(profile)
+                    raise exceptions.WatchdogExpired
+                elif self._read_type == _D2HMsgType.CLOCK_FAILURE:
+                    self._drain_async_rpcs(profile)
+                    raise exceptions.ClockFailure
+                else:
+                    self._read_expect(_D2HMsgType.KERNEL_FINISHED)
+                    self._drain_async_rpcs(profile)
+                    return
+        finally:
+            # Do not let the async RPCs of this kernel run after serve()
+            # returns, even if it fails for another reason.
+            self._wait_async_rpcs()
+            if self._async_exception is not None:
+                logger.error("async RPC failed", exc_info=self._async_exception)
+                self._async_exception = None
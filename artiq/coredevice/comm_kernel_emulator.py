@@ -0,0 +1,449 @@
+"""
+Stand-in for the core device that implements the session protocol of the
+runtime over TCP, to test and benchmark the host side of kernel execution
+(:class:`artiq.coredevice.comm_kernel.CommKernel` and
+:class:`artiq.coredevice.core.Core`) without hardware.
+
+The emulator does not execute kernels. Loaded kernel libraries are
+accepted and recorded, and running a kernel calls a Python function, the
+*script*, with a :class:`KernelSession` through which it performs RPCs
+and raises exceptions as the kernel would::
+
+    def script(session):
+        x = session.rpc(1, [(b"i", 42)], return_tags=b"f")
+        session.rpc(2, [(b"f", x*2)], asynchronous=True)
+
+    with CommKernelEmulator(script) as emulator:
+        comm = CommKernel("127.0.0.1", emulator.port)
+        comm.load(b"...")
+        comm.run()
+        comm.serve(embedding_map, symbolizer, demangler)
+
+RPC arguments are given as ``(tags, value)`` pairs, where ``tags`` are the
+RPC tags of the type of the value (see ``llvm_ir_generator.py:_rpc_tag``),
+e.g. ``b"li"`` for a list of 32-bit integers.
+"""
+
+import struct
+import socket
+import logging
+import threading
+from fractions import Fraction
+
+import numpy
+
+from artiq.coredevice.comm_kernel import _H2DMsgType, _D2HMsgType
+from artiq import __version__ as software_version
+
+
+logger = logging.getLogger(__name__)
+
+
+_scalar_formats = {"b": "B", "i": ">l", "I": ">q", "f": ">d"}
+_scalar_dtypes = {"b": "u1", "i": ">i4", "I": ">i8", "f": ">f8"}
+
+
+def _tag_end(tags, start):
+    tag = chr(tags[start])
+    end = start + 1
+    if tag == "t":
+        arity = tags[end]
+        end += 1
+        for _ in range(arity):
+            end = _tag_end(tags, end)
+    elif tag in "lar":
+        end = _tag_end(tags, end)
+    return end
+
+
+def _pack_bytes(value):
+    return struct.pack(">l", len(value)) + value
+
+
+def encode_rpc_value(tags, value):
+    """Encodes ``value``, of the type described by the RPC tags ``tags``,
+    the way the core device sends it to the host."""
+    tags = bytes(tags)
+    tag = chr(tags[0])
+    if tag in _scalar_formats:
+        return tags[:1] + struct.pack(_scalar_formats[tag], value)
+    elif tag == "n":
+        return b"n"
+    elif tag == "F":
+        return b"F" + struct.pack(">qq", value.numerator, value.denominator)
+    elif tag == "s":
+        return b"s" + _pack_bytes(value.encode("utf-8"))
+    elif tag in "BA":
+        return tags[:1] + _pack_bytes(bytes(value))
+    elif tag == "t":
+        data = [tags[:2]]
+        start = 2
+        for elt in value:
+            end = _tag_end(tags, start)
+            data.append(encode_rpc_value(tags[start:end], elt))
+            start = end
+        return b"".join(data)
+    elif tag in "la":
+        elt_tags = tags[1:_tag_end(tags, 1)]
+        header = tags[:1] + struct.pack(">l", len(value))
+        if chr(elt_tags[0]) in _scalar_dtypes:
+            # Every element is preceded by its tag.
+            elements = numpy.empty(len(value), [
+                ("tag", "u1"), ("value", _scalar_dtypes[chr(elt_tags[0])])])
+            elements["tag"] = elt_tags[0]
+            elements["value"] = value
+            return header + elements.tobytes()
+        else:
+            return header + b"".join(encode_rpc_value(elt_tags, elt)
+                                     for elt in value)
+    elif tag == "r":
+        elt_tags = tags[1:_tag_end(tags, 1)]
+        return tags[:1] + b"".join(encode_rpc_value(elt_tags, elt)
+                                   for elt in (value.start, value.stop, value.step))
+    elif tag == "O":
+        return b"O" + struct.pack(">l", value)
+    else:
+        raise ValueError("Unknown RPC value tag: {}".format(repr(tag)))
+
+
+def decode_rpc_value(tags, read):
+    """Decodes a value of the type described by the RPC tags ``tags``, sent
+    by the host to the core device, using ``read(length)`` to read it."""
+    tags = bytes(tags)
+    tag = chr(tags[0])
+    if tag in _scalar_formats:
+        (value, ) = struct.unpack(_scalar_formats[tag],
+                                  read(struct.calcsize(_scalar_formats[tag])))
+        return bool(value) if tag == "b" else value
+    elif tag == "n":
+        return None
+    elif tag == "F":
+        return Fraction(*struct.unpack(">qq", read(16)))
+    elif tag in "sBA":
+        (length, ) = struct.unpack(">l", read(4))
+        value = read(length)
+        if tag == "s":
+            return value.decode("utf-8")
+        elif tag == "A":
+            return bytearray(value)
+        else:
+            return value
+    elif tag == "t":
+        value = []
+        start = 2
+        for _ in range(tags[1]):
+            end = _tag_end(tags, start)
+            value.append(decode_rpc_value(tags[start:end], read))
+            start = end
+        return tuple(value)
+    elif tag in "la":
+        elt_tags = tags[1:_tag_end(tags, 1)]
+        (length, ) = struct.unpack(">l", read(4))
+        if chr(elt_tags[0]) in _scalar_dtypes:
+            dtype = numpy.dtype(_scalar_dtypes[chr(elt_tags[0])])
+            elements = numpy.frombuffer(read(length * dtype.itemsize), dtype)
+            if elt_tags == b"b":
+                elements = elements.astype(bool)
+            else:
+                elements = elements.astype(dtype.newbyteorder("="))
+            return elements.tolist() if tag == "l" else elements
+        else:
+            elements = [decode_rpc_value(elt_tags, read) for _ in range(length)]
+            return elements if tag == "l" else numpy.array(elements)
+    elif tag == "r":
+        elt_tags = tags[1:_tag_end(tags, 1)]
+        return range(*(decode_rpc_value(elt_tags, read) for _ in range(3)))
+    else:
+        raise ValueError("Unknown RPC value tag: {}".format(repr(tag)))
+
+
+class KernelException(Exception):
+    """An exception raised by an emulated kernel.
+
+    If the script does not catch it, it is reported to the host as the
+    exception that terminated the kernel. :meth:`KernelSession.rpc` raises
+    it when the host reports that the RPC raised an exception.
+
+    :param name: name of the exception, ``"0:"`` followed by the name of
+        an exception of :mod:`artiq.coredevice.exceptions`, or the key of
+        the exception class in the embedding map of the kernel followed by
+        ``":"`` and the qualified name of the class.
+    :param message: message of the exception, formatted with ``params``.
+    :param params: three 64-bit integer parameters of the message.
+    :param backtrace: return addresses of the backtrace, symbolized by the
+        host.
+    """
+    def __init__(self, name, message, params=(0, 0, 0), file="<emulated>",
+                 line=0, column=-1, function="<emulated>", backtrace=()):
+        Exception.__init__(self, name, message)
+        self.name = name
+        self.message = message
+        self.params = list(params)
+        self.file = file
+        self.line = line
+        self.column = column
+        self.function = function
+        self.backtrace = list(backtrace)
+
+
+class _KernelTerminated(Exception):
+    pass
+
+
+class KernelSession:
+    """The session of a kernel run by the emulator, passed to the script.
+
+    :ivar library: the kernel library loaded by the host.
+    """
+    def __init__(self, emulator, connection, reader):
+        self.emulator = emulator
+        self.library = None
+        self._connection = connection
+        self._reader = reader
+
+    def _read(self, length):
+        data = self._reader.read(length)
+        if len(data) < length:
+            raise ConnectionResetError("Connection closed")
+        return data
+
+    def _read_header(self):
+        sync = self._reader.read(4)
+        if not sync:
+            return None
+        while sync != b"\x5a\x5a\x5a\x5a":
+            sync = sync[1:] + self._read(1)
+        return _H2DMsgType(self._read(1)[0])
+
+    def _read_bytes(self):
+        (length, ) = struct.unpack(">l", self._read(4))
+        return self._read(length)
+
+    def _read_string(self):
+        return self._read_bytes().decode("utf-8")
+
+    def _write(self, ty, *chunks):
+        self._connection.sendall(
+            b"".join((struct.pack(">lB", 0x5a5a5a5a, ty.value), ) + chunks))
+
+    def rpc(self, service, args=(), kwargs={}, return_tags=b"n",
+            asynchronous=False):
+        """Calls the RPC service ``service`` with the arguments ``args``,
+        a list of ``(tags, value)`` pairs, and the keyword arguments
+        ``kwargs``, a dictionary of ``(tags, value)`` pairs.
+
+        Unless ``asynchronous`` is true, waits for the reply of the host
+        and returns the return value, of the type described by the RPC
+        tags ``return_tags``."""
+        data = [struct.pack(">Bl", asynchronous, service)]
+        data += [encode_rpc_value(tags, value) for tags, value in args]
+        data += [b"k" + _pack_bytes(name.encode("utf-8")) +
+                 encode_rpc_value(tags, value)
+                 for name, (tags, value) in kwargs.items()]
+        data += [b"\x00", _pack_bytes(bytes(return_tags))]
+        self._write(_D2HMsgType.RPC_REQUEST, *data)
+        if asynchronous:
+            return None
+
+        ty = self._read_header()
+        if ty == _H2DMsgType.RPC_REPLY:
+            tags = self._read_bytes()
+            if tags != bytes(return_tags):
+                raise IOError("RPC reply has tags {} (expected {})"
+                              .format(repr(tags), repr(bytes(return_tags))))
+            return decode_rpc_value(tags, self._read)
+        elif ty == _H2DMsgType.RPC_EXCEPTION:
+            name = self._read_string()
+            message = self._read_string()
+            params = struct.unpack(">qqq", self._read(24))
+            file = self._read_string()
+            line, column = struct.unpack(">ll", self._read(8))
+            function = self._read_string()
+            raise KernelException(name, message, params,
+                                  file, line, column, function)
+        elif ty is None:
+            raise ConnectionResetError("Connection closed")
+        else:
+            raise IOError("Unexpected message during RPC: {}".format(ty))
+
+    def watchdog_expired(self):
+        """Terminates the kernel as if a watchdog expired."""
+        self._write(_D2HMsgType.WATCHDOG_EXPIRED)
+        raise _KernelTerminated
+
+    def clock_failure(self):
+        """Terminates the kernel as if the RTIO clock failed."""
+        self._write(_D2HMsgType.CLOCK_FAILURE)
+        raise _KernelTerminated
+
+    def _run(self, script):
+        try:
+            script(self)
+        except KernelException as exn:
+            self._write(_D2HMsgType.KERNEL_EXCEPTION,
+                        _pack_bytes(exn.name.encode("utf-8")),
+                        _pack_bytes(exn.message.encode("utf-8")),
+                        struct.pack(">qqq", *exn.params),
+                        _pack_bytes(exn.file.encode("utf-8")),
+                        struct.pack(">ll", exn.line, exn.column),
+                        _pack_bytes(exn.function.encode("utf-8")),
+                        struct.pack(">l{}L".format(len(exn.backtrace)),
+                                    len(exn.backtrace), *exn.backtrace))
+        except _KernelTerminated:
+            pass
+        else:
+            self._write(_D2HMsgType.KERNEL_FINISHED)
+
+
+class CommKernelEmulator:
+    """Emulates the session protocol of a core device on a TCP port.
+
+    Host connections are served one at a time, in a background thread
+    started by :meth:`start` (or by entering the emulator as a context
+    manager).
+
+    :param script: function called with a :class:`KernelSession` each time
+        the host runs a kernel; it may also be set later through the
+        ``script`` attribute.
+    :param host: address to listen on.
+    :param port: port to listen on; by default, a free port is chosen, and
+        is available in the ``port`` attribute.
+    :param ident: identifier string of the emulated gateware.
+
+    :ivar libraries: kernel libraries loaded by the host, in order.
+    :ivar flash: contents of the emulated flash storage.
+    :ivar kernels_run: number of kernels run.
+    """
+    def __init__(self, script=None, host="127.0.0.1", port=0,
+                 ident=software_version):
+        self.script = script
+        self.ident = ident
+        self.libraries = []
+        self.flash = {}
+        self.kernels_run = 0
+        self.finished_cleanly = True
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen(1)
+        # Poll, so that stop() does not depend on platform-specific
+        # behavior of closing a socket blocked in accept().
+        self.listener.settimeout(0.1)
+        self.port = self.listener.getsockname()[1]
+
+        self._stopped = threading.Event()
+        self._connection = None
+        self._thread = None
+
+    def load(self, library):
+        """Loads a kernel library sent by the host. Returns ``None`` if it
+        is accepted, or the reason of the failure otherwise. The default
+        implementation accepts and records every library."""
+        self.libraries.append(library)
+        return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.listener.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                connection, address = self.listener.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logger.debug("connection from %s", address)
+            self._connection = connection
+            try:
+                self._serve_session(connection)
+            except ConnectionError:
+                logger.debug("connection closed")
+            except Exception:
+                logger.error("session error", exc_info=True)
+            finally:
+                self._connection = None
+                connection.close()
+
+    def _serve_session(self, connection):
+        # The socket is only released once its file object is closed too.
+        with connection.makefile("rb") as reader:
+            self._serve_messages(connection, reader)
+
+    def _serve_messages(self, connection, reader):
+        session = KernelSession(self, connection, reader)
+
+        magic = reader.read(len(b"ARTIQ coredev\n"))
+        if magic != b"ARTIQ coredev\n":
+            raise IOError("Incorrect magic: {}".format(repr(magic)))
+
+        while True:
+            ty = session._read_header()
+            if ty is None:
+                return
+            logger.debug("received message: type=%r", ty)
+
+            if ty == _H2DMsgType.SYSTEM_INFO_REQUEST:
+                session._write(_D2HMsgType.SYSTEM_INFO_REPLY, b"AROR",
+                               _pack_bytes(self.ident.encode("utf-8")),
+                               struct.pack("B", self.finished_cleanly))
+                self.finished_cleanly = True
+            elif ty == _H2DMsgType.SWITCH_CLOCK:
+                session._read(1)
+                session._write(_D2HMsgType.CLOCK_SWITCH_COMPLETED)
+            elif ty == _H2DMsgType.LOAD_KERNEL:
+                library = session._read_bytes()
+                error = self.load(library)
+                if error is None:
+                    session.library = library
+                    session._write(_D2HMsgType.LOAD_COMPLETED)
+                else:
+                    session.library = None
+                    session._write(_D2HMsgType.LOAD_FAILED,
+                                   _pack_bytes(error.encode("utf-8")))
+            elif ty == _H2DMsgType.RUN_KERNEL:
+                if session.library is None or self.script is None:
+                    session._write(_D2HMsgType.KERNEL_STARTUP_FAILED)
+                    continue
+                self.finished_cleanly = False
+                session._run(self.script)
+                self.finished_cleanly = True
+                self.kernels_run += 1
+            elif ty == _H2DMsgType.FLASH_READ_REQUEST:
+                key = session._read_string()
+                session._write(_D2HMsgType.FLASH_READ_REPLY,
+                               _pack_bytes(self.flash.get(key, b"")))
+            elif ty == _H2DMsgType.FLASH_WRITE_REQUEST:
+                key = session._read_string()
+                self.flash[key] = session._read_bytes()
+                session._write(_D2HMsgType.FLASH_OK_REPLY)
+            elif ty == _H2DMsgType.FLASH_REMOVE_REQUEST:
+                self.flash.pop(session._read_string(), None)
+                session._write(_D2HMsgType.FLASH_OK_REPLY)
+            elif ty == _H2DMsgType.FLASH_ERASE_REQUEST:
+                self.flash.clear()
+                session._write(_D2HMsgType.FLASH_OK_REPLY)
+            else:
+                raise IOError("Unexpected message: {}".format(ty))
@@ -1,5 +1,9 @@
 import os, sys
+import time
+import logging
 import numpy
+from functools import wraps
+from collections import deque
 
 from pythonparser import diagnostic
 
@@ -11,13 +15,19 @@ from artiq.language.units import *
 
 from artiq.compiler.module import Module
 from artiq.compiler.embedding import Stitcher
-from artiq.compiler.targets import OR1KTarget
+from artiq.compiler.targets import OR1KTarget, opt_levels
+from artiq.compiler.kernel_cache import KernelCache
+from artiq.compiler.statistics import CompilerStatistics
 
 from artiq.coredevice.comm_kernel import CommKernel, CommKernelDummy
+from artiq.coredevice.kernel_profile import KernelProfile
 # Import for side effects (creating the exception classes).
 from artiq.coredevice import exceptions
 
 
+logger = logging.getLogger(__name__)
+
+
 def _render_diagnostic(diagnostic, colored):
     def shorten_path(path):
         return path.replace(artiq_dir, "<artiq>")
@@ -63,6 +73,37 @@ class Core:
     :param ref_multiplier: ratio between the RTIO fine timestamp frequency
         and the RTIO coarse timestamp frequency (e.g. SERDES multiplication
         factor).
+    :param kernel_cache_dir: directory where compiled kernels are cached
+        across runs. Kernels whose generated code is identical to a cached
+        one skip optimization, code generation and linking. ``None``
+        disables the cache.
+    :param kernel_cache_size: maximum size of the kernel cache in bytes.
+        The least recently used kernels are evicted first.
+    :param compiler_statistics_dir: directory where, for each compiled
+        kernel, a JSON report of the time spent in each compiler pass and
+        of the size of the generated code is written. Defaults to the
+        value of the ``ARTIQ_COMPILER_STATS`` environment variable; if
+        neither is set, no statistics are collected.
+    :param opt_level: LLVM optimization level used for kernels: ``"O0"``,
+        ``"O1"``, ``"O2"``, ``"O3"``, ``"Os"`` or ``"Oz"`` to use the
+        standard LLVM pass pipelines, or ``"default"`` for the pipeline
+        tuned for ARTIQ kernels. Individual kernels may override it with
+        one of these names as a flag, e.g. ``@kernel(flags={"O3"})``.
+    :param auto_kernel_invariants: treat the attributes that a kernel never
+        writes to as kernel invariants, in addition to those listed in
+        ``kernel_invariants``. Attributes holding lists, arrays or
+        bytearrays are never promoted. Attribute values are copied to the
+        core device each time a kernel is compiled, and a running kernel
+        does not observe host-side modifications (e.g. from RPCs) either
+        way, so promotion does not change the behavior of the kernel.
+    :param profile: for each kernel run, record the time spent compiling,
+        loading and executing the kernel and serving its RPCs, and
+        statistics of each RPC service, in a
+        :class:`artiq.coredevice.kernel_profile.KernelProfile` appended to
+        the ``profiles`` attribute. May also be changed later through the
+        ``profile`` attribute.
+    :param max_profiles: number of the most recent kernel profiles that are
+        kept in ``profiles``.
     """
 
     kernel_invariants = {
@@ -71,7 +112,10 @@ class Core:
     }
 
     def __init__(self, dmgr, host, ref_period, external_clock=False,
-                 ref_multiplier=8):
+                 ref_multiplier=8, kernel_cache_dir=None,
+                 kernel_cache_size=256*1024*1024, compiler_statistics_dir=None,
+                 opt_level="default", auto_kernel_invariants=False,
+                 profile=False, max_profiles=1000):
         self.ref_period = ref_period
         self.external_clock = external_clock
         self.ref_multiplier = ref_multiplier
@@ -81,6 +125,23 @@ class Core:
         else:
             self.comm = CommKernel(host)
 
+        if kernel_cache_dir is None:
+            self.kernel_cache = None
+        else:
+            self.kernel_cache = KernelCache(kernel_cache_dir,
+                                            kernel_cache_size)
+
+        if compiler_statistics_dir is None:
+            compiler_statistics_dir = os.getenv("ARTIQ_COMPILER_STATS")
+        self.compiler_statistics_dir = compiler_statistics_dir
+
+        if opt_level != "default" and opt_level not in opt_levels:
+            raise ValueError("unknown optimization level {}".format(opt_level))
+        self.opt_level = opt_level
+        self.auto_kernel_invariants = auto_kernel_invariants
+        self.profile = profile
+        self.profiles = deque(maxlen=max_profiles)
+
         self.first_run = True
         self.dmgr = dmgr
         self.core = self
@@ -89,23 +150,69 @@ class Core:
     def close(self):
         self.comm.close()
 
+    def _kernel_opt_level(self, function):
+        levels = function.artiq_embedded.flags & opt_levels.keys()
+        if len(levels) > 1:
+            raise ValueError("kernel {} has conflicting optimization levels {}"
+                             .format(function.__qualname__,
+                                     ", ".join(sorted(levels))))
+        elif levels:
+            level, = levels
+            return level
+        else:
+            return self.opt_level
+
     def compile(self, function, args, kwargs, set_result=None,
                 attribute_writeback=True, print_as_rpc=True):
         try:
             engine = _DiagnosticEngine(all_errors_are_fatal=True)
+            statistics = CompilerStatistics(
+                kernel=function.artiq_embedded.function.__qualname__,
+                enabled=self.compiler_statistics_dir is not None)
 
             stitcher = Stitcher(engine=engine, core=self, dmgr=self.dmgr,
                                 print_as_rpc=print_as_rpc)
-            stitcher.stitch_call(function, args, kwargs, set_result)
-            stitcher.finalize()
+            with statistics.measure("Stitcher.stitch_call"):
+                stitcher.stitch_call(function, args, kwargs, set_result)
+            with statistics.measure("Stitcher.finalize") as pass_:
+                stitcher.finalize()
+            pass_.count(stitcher.typedtree,
+                        sweeps=stitcher.inference_sweeps,
+                        visits=stitcher.inference_visits)
 
             module = Module(stitcher,
                 ref_period=self.ref_period,
-                attribute_writeback=attribute_writeback)
-            target = OR1KTarget()
-
-            library = target.compile_and_link([module])
-            stripped_library = target.strip(library)
+                attribute_writeback=attribute_writeback,
+                auto_invariants=self.auto_kernel_invariants,
+                statistics=statistics)
+            if self.auto_kernel_invariants:
+                logger.debug("%s: promoted %d attributes to kernel invariants, "
+                             "making %d loads invariant",
+                             function.artiq_embedded.function.__qualname__,
+                             module.promoted_invariants, module.invariant_loads)
+            target = OR1KTarget(statistics=statistics,
+                                opt_level=self._kernel_opt_level(function))
+
+            llmodule = target.build_llvm_ir(module)
+            libraries = None
+            if self.kernel_cache is not None:
+                cache_key = self.kernel_cache.key(target, str(llmodule))
+                with statistics.measure("kernel cache") as pass_:
+                    libraries = self.kernel_cache.get(cache_key)
+                pass_.count(hit=int(libraries is not None))
+            if libraries is None:
+                library = target.link([
+                    target.assemble(target.compile_llvm_ir(llmodule))])
+                stripped_library = target.strip(library)
+                if self.kernel_cache is not None:
+                    self.kernel_cache.put(cache_key, library, stripped_library)
+            else:
+                library, stripped_library = libraries
+
+            if statistics.enabled:
+                filename = statistics.write(self.compiler_statistics_dir)
+                logger.debug("compiler statistics for %s written to %s",
+                             statistics.kernel, filename)
 
             return stitcher.embedding_map, stripped_library, \
                    lambda addresses: target.symbolize(library, addresses), \
@@ -113,6 +220,34 @@ class Core:
         except diagnostic.Error as error:
             raise CompileError(error.diagnostic) from error
 
+    def _new_profile(self, function):
+        if self.profile:
+            return KernelProfile(function.artiq_embedded.function.__qualname__)
+        else:
+            return None
+
+    def _run_compiled(self, kernel_library, embedding_map, symbolizer, demangler,
+                      profile=None):
+        if profile is not None:
+            self.profiles.append(profile)
+        start = time.perf_counter()
+        if self.first_run:
+            self.comm.check_system_info()
+            self.comm.switch_clock(self.external_clock)
+            self.first_run = False
+
+        self.comm.load(kernel_library)
+        loaded = time.perf_counter()
+        try:
+            self.comm.run()
+            self.comm.serve(embedding_map, symbolizer, demangler, profile)
+        finally:
+            if profile is not None:
+                profile.load_time = loaded - start
+                profile.device_time = (time.perf_counter() - loaded -
+                                       profile.rpc_time -
+                                       profile.async_drain_time)
+
     def run(self, function, args, kwargs):
         result = None
         @rpc(flags={"async"})
@@ -120,19 +255,57 @@ class Core:
             nonlocal result
             result = new_result
 
+        profile = self._new_profile(function)
+        start = time.perf_counter()
         embedding_map, kernel_library, symbolizer, demangler = \
             self.compile(function, args, kwargs, set_result)
+        if profile is not None:
+            profile.compile_time = time.perf_counter() - start
+        self._run_compiled(kernel_library, embedding_map, symbolizer, demangler,
+                           profile)
+        return result
 
-        if self.first_run:
-            self.comm.check_system_info()
-            self.comm.switch_clock(self.external_clock)
-            self.first_run = False
+    def precompile(self, function, *args, **kwargs):
+        """Precompiles a kernel and returns a callable that executes it on
+        the core device at a later time.
 
-        self.comm.load(kernel_library)
-        self.comm.run()
-        self.comm.serve(embedding_map, symbolizer, demangler)
+        This allows moving the compilation of kernels out of ``run()``, e.g.
+        into ``prepare()``, where it overlaps with the execution of the
+        previous experiment.
 
-        return result
+        Arguments to the kernel are given at compilation time, as additional
+        positional and keyword arguments to this function. The returned
+        callable takes no arguments and may be called several times; its
+        return value is the return value of the kernel, if any.
+
+        Precompiled kernels may use RPCs. Host object attributes used by the
+        kernel have the values they had at precompilation time, and the
+        values modified by the kernel are not written back to the host
+        objects; use RPCs to read or modify up-to-date values.
+        """
+        if not hasattr(function, "artiq_embedded"):
+            raise ValueError("Argument is not a kernel")
+
+        result = None
+        @rpc(flags={"async"})
+        def set_result(new_result):
+            nonlocal result
+            result = new_result
+
+        embedding_map, kernel_library, symbolizer, demangler = \
+            self.compile(function, args, kwargs, set_result,
+                         attribute_writeback=False)
+
+        @wraps(function)
+        def run_precompiled():
+            nonlocal result
+            result = None
+            self._run_compiled(kernel_library, embedding_map,
+                               symbolizer, demangler,
+                               self._new_profile(function))
+            return result
+
+        return run_precompiled
 
     @portable
     def seconds_to_mu(self, seconds):
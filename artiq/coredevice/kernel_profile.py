@@ -0,0 +1,126 @@
+"""
+The :class:`KernelProfile` class records, for a single kernel run, the
+time spent compiling the kernel, loading it, executing it on the core
+device and serving its RPCs on the host, together with per-service RPC
+statistics: number of calls, time spent in the host handler, and bytes
+received from and sent to the core device.
+"""
+
+import json
+from collections import OrderedDict
+
+
+class RPCProfile:
+    """Statistics of the calls of one RPC service, either synchronous or
+    asynchronous.
+
+    :ivar name: name of the service.
+    :ivar asynchronous: whether the calls are asynchronous.
+    :ivar calls: number of calls.
+    :ivar time: total time spent in the host handler, in seconds.
+    :ivar bytes_received: total size of the RPC requests.
+    :ivar bytes_sent: total size of the replies.
+    """
+
+    def __init__(self, name, asynchronous):
+        self.name = name
+        self.asynchronous = asynchronous
+        self.calls = 0
+        self.time = 0.0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def as_dict(self):
+        return OrderedDict([
+            ("name", self.name),
+            ("async", self.asynchronous),
+            ("calls", self.calls),
+            ("time", self.time),
+            ("bytes_received", self.bytes_received),
+            ("bytes_sent", self.bytes_sent),
+        ])
+
+
+def _service_name(service_id, service):
+    if service_id == 0:
+        return "<attribute writeback>"
+    return getattr(service, "__qualname__", None) or repr(service)
+
+
+class KernelProfile:
+    """
+    :param kernel: name of the kernel, included in the report.
+
+    :ivar compile_time: time spent compiling the kernel, in seconds.
+    :ivar load_time: time spent connecting to the core device and loading
+        the kernel.
+    :ivar device_time: time during which the kernel was executed on the
+        core device, excluding :attr:`rpc_time` and :attr:`async_drain_time`.
+    :ivar rpc_time: time during which the host was receiving RPC requests,
+        running synchronous RPCs and sending their replies. Asynchronous
+        RPCs run in the background, and only the time spent receiving them
+        is included.
+    :ivar async_drain_time: time spent waiting for the asynchronous RPCs
+        still running on the host once the kernel had stopped.
+    :ivar services: :class:`RPCProfile` of each service that was called.
+    """
+
+    def __init__(self, kernel=None):
+        self.kernel = kernel
+        self.compile_time = 0.0
+        self.load_time = 0.0
+        self.device_time = 0.0
+        self.rpc_time = 0.0
+        self.async_drain_time = 0.0
+        self._services = OrderedDict()
+
+    def service(self, service_id, service, asynchronous):
+        """Returns the :class:`RPCProfile` of the synchronous or asynchronous
+        calls of the RPC service ``service``, with the ID ``service_id``
+        in the embedding map of the kernel."""
+        key = (service_id, asynchronous)
+        if key not in self._services:
+            self._services[key] = RPCProfile(_service_name(service_id, service),
+                                             asynchronous)
+        return self._services[key]
+
+    @property
+    def services(self):
+        return list(self._services.values())
+
+    def total_time(self):
+        return (self.compile_time + self.load_time +
+                self.device_time + self.rpc_time + self.async_drain_time)
+
+    def as_dict(self):
+        return OrderedDict([
+            ("kernel", self.kernel),
+            ("time", self.total_time()),
+            ("compile_time", self.compile_time),
+            ("load_time", self.load_time),
+            ("device_time", self.device_time),
+            ("rpc_time", self.rpc_time),
+            ("async_drain_time", self.async_drain_time),
+            ("services", [service.as_dict() for service in self.services]),
+        ])
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def __str__(self):
+        lines = ["kernel {}: {:.3f} ms".format(self.kernel, self.total_time()*1e3)]
+        for phase, time in [("compile", self.compile_time),
+                            ("load", self.load_time),
+                            ("device", self.device_time),
+                            ("rpc", self.rpc_time),
+                            ("drain", self.async_drain_time)]:
+            lines.append("  {:<8} {:>10.3f} ms".format(phase, time*1e3))
+        if self._services:
+            lines.append("  {:<40} {:>5} {:>8} {:>10} {:>12} {:>12}".format(
+                "service", "mode", "calls", "time (ms)", "received (B)", "sent (B)"))
+            for service in sorted(self.services, key=lambda s: -s.time):
+                lines.append("  {:<40} {:>5} {:>8} {:>10.3f} {:>12} {:>12}".format(
+                    service.name, "async" if service.asynchronous else "sync",
+                    service.calls, service.time*1e3,
+                    service.bytes_received, service.bytes_sent))
+        return "\n".join(lines)
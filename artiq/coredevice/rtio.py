@@ -14,6 +14,12 @@ def rtio_output_wide(time_mu: TInt64, channel: TInt32, addr: TInt32,
     raise NotImplementedError("syscall not simulated")
 
 
+@syscall(flags={"nowrite"})
+def rtio_output_batch(time_mu: TInt64, channel: TInt32, addr: TList(TInt32),
+                      data: TList(TInt32)) -> TNone:
+    raise NotImplementedError("syscall not simulated")
+
+
 @syscall(flags={"nowrite"})
 def rtio_input_timestamp(timeout_mu: TInt64, channel: TInt32) -> TInt64:
     raise NotImplementedError("syscall not simulated")
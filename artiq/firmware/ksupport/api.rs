@@ -99,6 +99,7 @@ static mut API: &'static [(&'static str, *const ())] = &[
     api!(rtio_log),
     api!(rtio_output = ::rtio::output),
     api!(rtio_output_wide = ::rtio::output_wide),
+    api!(rtio_output_batch = ::rtio::output_batch),
     api!(rtio_input_timestamp = ::rtio::input_timestamp),
     api!(rtio_input_data = ::rtio::input_data),
 
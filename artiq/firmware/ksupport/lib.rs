@@ -261,6 +261,8 @@ extern fn dma_record_start(name: CSlice<u8>) {
                        dma_record_output as *const () as u32).unwrap();
         library.rebind(b"rtio_output_wide",
                        dma_record_output_wide as *const () as u32).unwrap();
+        library.rebind(b"rtio_output_batch",
+                       dma_record_output_batch as *const () as u32).unwrap();
 
         DMA_RECORDER.active = true;
         send(&DmaRecordStart(name));
@@ -280,6 +282,8 @@ extern fn dma_record_stop(duration: i64) {
                        rtio::output as *const () as u32).unwrap();
         library.rebind(b"rtio_output_wide",
                        rtio::output_wide as *const () as u32).unwrap();
+        library.rebind(b"rtio_output_batch",
+                       rtio::output_batch as *const () as u32).unwrap();
 
         DMA_RECORDER.active = false;
         send(&DmaRecordStop {
@@ -292,6 +296,13 @@ extern fn dma_record_output(timestamp: i64, channel: i32, address: i32, word: i3
     dma_record_output_wide(timestamp, channel, address, [word].as_c_slice())
 }
 
+extern fn dma_record_output_batch(timestamp: i64, channel: i32,
+                                  addresses: CSlice<i32>, words: CSlice<i32>) {
+    for (&address, &word) in addresses.as_ref().iter().zip(words.as_ref().iter()) {
+        dma_record_output(timestamp, channel, address, word)
+    }
+}
+
 extern fn dma_record_output_wide(timestamp: i64, channel: i32, address: i32, words: CSlice<i32>) {
     assert!(words.len() <= 16); // enforce the hardware limit
 
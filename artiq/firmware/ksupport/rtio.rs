@@ -81,6 +81,24 @@ mod imp {
         }
     }
 
+    pub extern fn output_batch(timestamp: i64, channel: i32,
+                               addrs: CSlice<i32>, data: CSlice<i32>) {
+        unsafe {
+            csr::rtio::chan_sel_write(channel as _);
+            for i in 0..addrs.len() {
+                // writing timestamp clears o_data
+                csr::rtio::timestamp_write(timestamp as u64);
+                csr::rtio::o_address_write(addrs[i] as _);
+                rtio_o_data_write(0, data[i] as _);
+                csr::rtio::o_we_write(1);
+                let status = csr::rtio::o_status_read();
+                if status != 0 {
+                    process_exceptional_status(timestamp, channel, status);
+                }
+            }
+        }
+    }
+
     pub extern fn input_timestamp(timeout: i64, channel: i32) -> u64 {
         unsafe {
             csr::rtio::chan_sel_write(channel as _);
@@ -177,6 +195,11 @@ mod imp {
         unimplemented!("not(has_rtio)")
     }
 
+    pub extern fn output_batch(_timestamp: i64, _channel: i32,
+                               _addrs: CSlice<i32>, _data: CSlice<i32>) {
+        unimplemented!("not(has_rtio)")
+    }
+
     pub extern fn input_timestamp(_timeout: i64, _channel: i32) -> u64 {
         unimplemented!("not(has_rtio)")
     }
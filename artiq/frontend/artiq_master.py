@@ -11,6 +11,7 @@ from artiq.tools import (simple_network_args, atexit_register_coroutine,
 from artiq.protocols.pc_rpc import Server as RPCServer
 from artiq.protocols.sync_struct import Publisher
 from artiq.protocols.logging import Server as LoggingServer
+from artiq.protocols import pyon
 from artiq.protocols.broadcast import Broadcaster
 from artiq.master.log import log_args, init_log
 from artiq.master.databases import DeviceDB, DatasetDB
@@ -37,6 +38,10 @@ def get_argparser():
                        help="device database file (default: '%(default)s')")
     group.add_argument("--dataset-db", default="dataset_db.pyon",
                        help="dataset file (default: '%(default)s')")
+    group.add_argument("--hdf5-policy", default=None,
+                       help="PYON file containing a list of "
+                            "(key pattern, h5py options) pairs used to "
+                            "store datasets in results files")
 
     group = parser.add_argument_group("repository")
     group.add_argument(
@@ -93,6 +98,10 @@ def main():
     dataset_db = DatasetDB(args.dataset_db)
     dataset_db.start()
     atexit_register_coroutine(dataset_db.stop)
+    if args.hdf5_policy is None:
+        hdf5_policy = None
+    else:
+        hdf5_policy = pyon.load_file(args.hdf5_policy)
     worker_handlers = dict()
 
     if args.git:
@@ -111,8 +120,12 @@ def main():
     worker_handlers.update({
         "get_device_db": device_db.get_device_db,
         "get_device": device_db.get,
+        "get_device_db_snapshot": device_db.get_snapshot,
         "get_dataset": dataset_db.get,
         "update_dataset": dataset_db.update,
+        "watch_datasets": dataset_db.watch,
+        "unwatch_datasets": dataset_db.unwatch,
+        "get_hdf5_policy": lambda: hdf5_policy,
         "scheduler_submit": scheduler.submit,
         "scheduler_delete": scheduler.delete,
         "scheduler_request_termination": scheduler.request_termination,
@@ -16,7 +16,7 @@ from artiq.language.environment import EnvExperiment, ProcessArgumentManager
 from artiq.language.types import TBool
 from artiq.master.databases import DeviceDB, DatasetDB
 from artiq.master.worker_db import DeviceManager, DatasetManager
-from artiq.coredevice.core import CompileError, host_only
+from artiq.coredevice.core import Core, CompileError, host_only
 from artiq.compiler.embedding import EmbeddingMap
 from artiq.compiler.targets import OR1KTarget
 from artiq.compiler import import_cache
@@ -137,6 +137,9 @@ def get_argparser(with_file=True):
     parser.add_argument("-o", "--hdf5", default=None,
                         help="write results to specified HDF5 file"
                              " (default: print them)")
+    parser.add_argument("--profile", default=False, action="store_true",
+                        help="print the time spent compiling, loading and "
+                             "running each kernel, and statistics of its RPCs")
     if with_file:
         parser.add_argument("file", metavar="FILE",
                             help="file containing the experiment to run")
@@ -182,6 +185,11 @@ def _build_experiment(device_mgr, dataset_mgr, args):
     return get_experiment(module, args.experiment)(managers)
 
 
+def _profiled_cores(device_mgr):
+    return [dev for dev in device_mgr.active_devices.values()
+            if isinstance(dev, Core)]
+
+
 def run(with_file=False):
     args = get_argparser(with_file).parse_args()
     init_logger(args)
@@ -194,6 +202,9 @@ def run(with_file=False):
 
     try:
         exp_inst = _build_experiment(device_mgr, dataset_mgr, args)
+        if args.profile:
+            for core in _profiled_cores(device_mgr):
+                core.profile = True
         exp_inst.prepare()
         exp_inst.run()
         exp_inst.analyze()
@@ -204,6 +215,10 @@ def run(with_file=False):
             print(exn.artiq_core_exception, file=sys.stderr)
         raise exn
     finally:
+        if args.profile:
+            for core in _profiled_cores(device_mgr):
+                for profile in core.profiles:
+                    print(profile)
         device_mgr.close_devices()
 
     if args.hdf5 is not None:
@@ -286,7 +286,8 @@ class HasEnvironment:
 
     @rpc(flags={"async"})
     def set_dataset(self, key, value,
-                    broadcast=False, persist=False, save=True):
+                    broadcast=False, persist=False, save=True,
+                    hdf5_options=None, ring=None):
         """Sets the contents and handling modes of a dataset.
 
         Datasets must be scalars (``bool``, ``int``, ``float`` or NumPy scalar)
@@ -298,8 +299,23 @@ class HasEnvironment:
             broadcast.
         :param save: the data is saved into the local storage of the current
             run (archived as a HDF5 file).
+        :param hdf5_options: dictionary of keyword arguments passed to
+            ``h5py.Group.create_dataset`` when the dataset is saved, e.g.
+            ``{"chunks": True, "compression": "gzip", "shuffle": True}``.
+            A ``dtype`` entry such as ``"float32"`` narrows the stored data.
+            Overrides the storage policy of the master. Ignored if ``save``
+            is false.
+        :param ring: if not ``None``, the dataset is a ring buffer holding
+            the last ``ring`` samples (at least one), initialized with
+            ``value`` (e.g. an empty list). New samples are added with
+            ``append_to_dataset``, which only transmits the new sample and
+            the position of the head of the buffer. If ``value`` is empty,
+            the samples have the type of the first one. Reading the dataset
+            gives the samples in chronological order. Dict datasets that are
+            not ring buffers cannot have a ``"__ring__"`` key.
         """
-        self.__dataset_mgr.set(key, value, broadcast, persist, save)
+        self.__dataset_mgr.set(key, value, broadcast, persist, save,
+                               hdf5_options, ring)
 
     @rpc(flags={"async"})
     def mutate_dataset(self, key, index, value):
@@ -315,6 +331,18 @@ class HasEnvironment:
         as ``slice(*sub_tuple)`` (multi-dimensional slicing)."""
         self.__dataset_mgr.mutate(key, index, value)
 
+    @rpc(flags={"async"})
+    def append_to_dataset(self, key, value):
+        """Append a value to a dataset.
+
+        The target dataset must be a list (i.e. support ``append()``) or a
+        ring buffer, and must have previously been set from this experiment.
+
+        If the dataset was created in broadcast mode, only the appended value
+        is transmitted, which makes this cheaper than setting the whole list
+        again for each new point."""
+        self.__dataset_mgr.append_to(key, value)
+
     def get_dataset(self, key, default=NoDefault, archive=True):
         """Returns the contents of a dataset.
 
@@ -330,6 +358,10 @@ class HasEnvironment:
         than one time (and therefore its value has potentially changed) or is
         modified, a warning is emitted. Archival can be turned off by setting
         the ``archive`` argument to ``False``.
+
+        When the experiment is run by the master, datasets read from the
+        master are cached by the worker process, and the master notifies the
+        worker when they are modified. Repeated reads are therefore cheap.
         """
         try:
             return self.__dataset_mgr.get(key, archive)
@@ -21,6 +21,8 @@ import random
 import inspect
 from itertools import product
 
+import numpy
+
 from artiq.language.core import *
 from artiq.language.environment import NoDefault, DefaultMissing
 from artiq.language import units
@@ -61,7 +63,15 @@ class NoScan(ScanObject):
 
 class RangeScan(ScanObject):
     """A scan object that yields a fixed number of evenly spaced values in a
-    range. If ``randomize`` is True the points are randomly ordered."""
+    range. If ``randomize`` is True the points are randomly ordered.
+
+    The values are computed as they are yielded, and only the order of the
+    points of a randomized scan is stored. In kernels, iterate on the
+    indices of the points and use :meth:`point`, e.g. ::
+
+        for i in range(self.scan.npoints):
+            do_something(self.scan.point(i))
+    """
     def __init__(self, start, stop, npoints, randomize=False, seed=None):
         self.start = start
         self.stop = stop
@@ -69,21 +79,39 @@ class RangeScan(ScanObject):
         self.randomize = randomize
         self.seed = seed
 
-        if npoints == 0:
-            self.sequence = []
-        if npoints == 1:
-            self.sequence = [self.start]
+        if npoints <= 1:
+            self.dx = 0.0
         else:
-            dx = (stop - start)/(npoints - 1)
-            self.sequence = [i*dx + start for i in range(npoints)]
+            self.dx = (stop - start)/(npoints - 1)
 
         if randomize:
+            permutation = list(range(npoints))
             rng = random.Random(seed)
-            random.shuffle(self.sequence, rng.random)
+            random.shuffle(permutation, rng.random)
+            self.permutation = numpy.array(permutation, dtype=numpy.int32)
+        else:
+            self.permutation = numpy.array([], dtype=numpy.int32)
+
+    @portable
+    def point(self, i):
+        """Returns the value of the ``i``-th point of the scan, in the order
+        in which the scan yields them."""
+        if self.randomize:
+            i = int(self.permutation[i])
+        return i*self.dx + self.start
+
+    @property
+    def sequence(self):
+        return [self.point(i) for i in range(self.npoints)]
+
+    @portable
+    def _gen(self):
+        for i in range(self.npoints):
+            yield self.point(i)
 
     @portable
     def __iter__(self):
-        return iter(self.sequence)
+        return self._gen()
 
     def __len__(self):
         return self.npoints
@@ -203,6 +231,20 @@ class Scannable:
         return d
 
 
+def _make_axis(values):
+    try:
+        axis = numpy.array(values)
+    except ValueError:  # ragged sequences
+        axis = None
+    if axis is None or axis.ndim != 1:
+        # Values that are themselves sequences (e.g. the list of a NoScan)
+        # are kept whole in an object array.
+        axis = numpy.empty(len(values), object)
+        for i, value in enumerate(values):
+            axis[i] = value
+    return axis
+
+
 class MultiScanManager:
     """
     Makes an iterator that returns elements from the first scan object until
@@ -214,17 +256,25 @@ class MultiScanManager:
     Íteration produces scan points that have attributes that correspond
     to the names of the scan objects, and have the last value yielded by
     that scan object.
+
+    The points form a grid whose shape is given by the ``shape`` attribute,
+    the values of each scan object being in the ``axes`` list of arrays.
+    Points are numbered in the order of iteration, and the point with a given
+    index can be obtained with ``manager[index]``. To process many points at
+    once, :meth:`points` and :meth:`chunks` return them as NumPy structured
+    arrays with one field per scan object.
     """
     def __init__(self, *args):
         self.names = [a[0] for a in args]
         self.scan_objects = [a[1] for a in args]
+        self._values = [list(scan_object) for scan_object in self.scan_objects]
+        self.axes = [_make_axis(values) for values in self._values]
+        self.shape = tuple(len(values) for values in self._values)
 
         class ScanPoint:
             def __init__(self, **kwargs):
-                self.attr = set()
-                for k, v in kwargs.items():
-                    setattr(self, k, v)
-                    self.attr.add(k)
+                self.attr = set(kwargs)
+                self.__dict__.update(kwargs)
 
             def __repr__(self):
                 return ("<ScanPoint " +
@@ -234,10 +284,49 @@ class MultiScanManager:
 
         self.scan_point_cls = ScanPoint
 
+    def __len__(self):
+        length = 1
+        for n in self.shape:
+            length *= n
+        return length
+
+    def __getitem__(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("scan point index out of range")
+        indices = numpy.unravel_index(index, self.shape)
+        d = dict()
+        for name, values, i in zip(self.names, self._values, indices):
+            d[name] = values[i]
+        return self.scan_point_cls(**d)
+
+    def points(self, start=0, stop=None):
+        """Returns the points with indices from ``start`` (inclusive) to
+        ``stop`` (exclusive, defaults to the number of points) as a
+        structured array."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        dtype = numpy.dtype([(name, axis.dtype)
+                             for name, axis in zip(self.names, self.axes)])
+        result = numpy.empty(max(stop - start, 0), dtype)
+        if len(result):
+            indices = numpy.unravel_index(numpy.arange(start, stop), self.shape)
+            for name, axis, axis_indices in zip(self.names, self.axes, indices):
+                result[name] = axis[axis_indices]
+        return result
+
+    def chunks(self, size):
+        """Iterates on the points by chunks of up to ``size`` points,
+        each returned as by :meth:`points`."""
+        for start in range(0, len(self), size):
+            yield self.points(start, start + size)
+
     def _gen(self):
-        for values in product(*self.scan_objects):
-            d = {k: v for k, v in zip(self.names, values)}
-            yield self.scan_point_cls(**d)
+        scan_point_cls = self.scan_point_cls
+        names = self.names
+        for values in product(*self._values):
+            yield scan_point_cls(**dict(zip(names, values)))
 
     def __iter__(self):
         return self._gen()
@@ -16,20 +16,33 @@ class DeviceDB:
     def __init__(self, backing_file):
         self.backing_file = backing_file
         self.data = Notifier(device_db_from_file(self.backing_file))
+        self.version = 0
 
     def scan(self):
         new_data = device_db_from_file(self.backing_file)
 
+        changed = False
         for k in list(self.data.read.keys()):
             if k not in new_data:
                 del self.data[k]
+                changed = True
         for k in new_data.keys():
             if k not in self.data.read or self.data.read[k] != new_data[k]:
                 self.data[k] = new_data[k]
+                changed = True
+        if changed:
+            self.version += 1
 
     def get_device_db(self):
         return self.data.read
 
+    def get_snapshot(self, version):
+        """Returns ``(version, contents)`` of the device database, or
+        ``None`` if ``version`` is already the current version."""
+        if version == self.version:
+            return None
+        return self.version, self.data.read
+
     def get(self, key):
         return self.data.read[key]
 
@@ -44,6 +57,7 @@ class DatasetDB(TaskObject):
         except FileNotFoundError:
             file_data = dict()
         self.data = Notifier({k: (True, v) for k, v in file_data.items()})
+        self._watchers = set()
 
     def save(self):
         data = {k: v[1] for k, v in self.data.read.items() if v[0]}
@@ -57,11 +71,27 @@ class DatasetDB(TaskObject):
         finally:
             self.save()
 
+    def watch(self, cb):
+        """Calls ``cb`` with the key of each dataset that changes, after the
+        change has been made."""
+        self._watchers.add(cb)
+
+    def unwatch(self, cb):
+        self._watchers.discard(cb)
+
+    def _changed(self, key):
+        for cb in list(self._watchers):
+            cb(key)
+
     def get(self, key):
         return self.data.read[key][1]
 
     def update(self, mod):
         process_mod(self.data, mod)
+        if mod["path"]:
+            self._changed(mod["path"][0])
+        else:
+            self._changed(mod["key"])
 
     # convenience functions (update() can be used instead)
     def set(self, key, value, persist=None):
@@ -71,7 +101,9 @@ class DatasetDB(TaskObject):
             else:
                 persist = False
         self.data[key] = (persist, value)
+        self._changed(key)
 
     def delete(self, key):
         del self.data[key]
+        self._changed(key)
     #
@@ -283,9 +283,16 @@ class RunStage(TaskObject):
 
 
 class AnalyzeStage(TaskObject):
+    # Maximum number of runs whose results are being written at the same
+    # time. Each of them keeps its worker process alive. A write that hangs
+    # is ended by the timeout of Worker.write_results, which frees its slot.
+    max_writers = 4
+
     def __init__(self, pool, delete_cb):
         self.pool = pool
         self.delete_cb = delete_cb
+        self._writers = set()
+        self._writer_slots = asyncio.Semaphore(self.max_writers)
 
     def _get_run(self):
         run_runs = filter(lambda r: r.status == RunStatus.run_done,
@@ -310,12 +317,36 @@ class AnalyzeStage(TaskObject):
                 logger.error("got worker exception in analyze stage of RID %d."
                              " Results will still be saved.", run.rid)
                 log_worker_exception()
-            try:
-                await run.write_results()
-            except:
-                logger.error("failed to write results of RID %d.", run.rid)
-                log_worker_exception()
-            self.delete_cb(run.rid)
+            # Results are written by the worker of each run, so writing
+            # them in the background lets the next run be analyzed while
+            # the (possibly slow) results storage is busy.
+            await self._writer_slots.acquire()
+            writer = asyncio.ensure_future(self._write_results(run))
+            self._writers.add(writer)
+            writer.add_done_callback(self._writers.discard)
+
+    async def _write_results(self, run):
+        try:
+            await run.write_results()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.error("failed to write results of RID %d.", run.rid,
+                         exc_info=True)
+        finally:
+            self._writer_slots.release()
+        self.delete_cb(run.rid)
+
+    async def join_writers(self):
+        """Waits for the results being written. Each write completes or
+        times out on its own, see :meth:`Worker.write_results`."""
+        writers = list(self._writers)
+        if writers:
+            await asyncio.wait(writers)
+
+    async def stop(self):
+        await TaskObject.stop(self)
+        await self.join_writers()
 
 
 class Pipeline:
@@ -330,6 +361,9 @@ class Pipeline:
         self._run.start()
         self._analyze.start()
 
+    async def join_writers(self):
+        await self._analyze.join_writers()
+
     async def stop(self):
         # NB: restart of a stopped pipeline is not supported
         await self._analyze.stop()
@@ -397,6 +431,10 @@ class Scheduler:
     async def stop(self):
         # NB: restart of a stopped scheduler is not supported
         self._terminated = True  # prevent further runs from being created
+        # deleting the runs closes their workers, let them finish writing
+        # their results first
+        for pipeline in list(self._pipelines.values()):
+            await pipeline.join_writers()
         for pipeline in self._pipelines.values():
             for rid in pipeline.pool.runs.keys():
                 self._deleter.delete(rid)
@@ -50,6 +50,13 @@ class Worker:
         self.ipc = None
         self.watchdogs = dict()  # wid -> expiration (using time.monotonic)
 
+        # The worker may keep a cache of the master datasets it has read if
+        # we can tell it when they change. This requires the worker to poll
+        # its pipe, which is not supported on Windows.
+        self.dataset_cache = ("watch_datasets" in handlers
+                              and os.name != "nt")
+        self.cached_datasets = set()
+
         self.io_lock = asyncio.Lock()
         self.closed = asyncio.Event()
 
@@ -96,9 +103,22 @@ class Worker:
             asyncio.ensure_future(
                 LogParser(self._get_log_source).stream_task(
                     self.ipc.process.stderr))
+            if self.dataset_cache:
+                self.handlers["watch_datasets"](self._dataset_changed)
         finally:
             self.io_lock.release()
 
+    def _dataset_changed(self, key):
+        if key not in self.cached_datasets:
+            return
+        self.cached_datasets.remove(key)
+        if self.closed.is_set() or self.ipc.process.returncode is not None:
+            return
+        # Written without taking io_lock: the line is queued atomically and
+        # the worker processes invalidations wherever it reads the pipe.
+        line = pyon.encode({"action": "invalidate_dataset", "key": key})
+        self.ipc.write((line + "\n").encode())
+
     async def close(self, term_timeout=2.0):
         """Interrupts any I/O with the worker process and terminates the
         worker process.
@@ -106,6 +126,8 @@ class Worker:
         This method should always be called by the user to clean up, even if
         build() or examine() raises an exception."""
         self.closed.set()
+        if self.dataset_cache:
+            self.handlers["unwatch_datasets"](self._dataset_changed)
         await self.io_lock.acquire()
         try:
             if self.ipc is None:
@@ -213,11 +235,16 @@ class Worker:
                 func = self.delete_watchdog
             elif action == "register_experiment":
                 func = self.register_experiment
+            elif action == "get_hdf5_policy":
+                # the HDF5 storage policy is optional
+                func = self.handlers.get(action, lambda: None)
             else:
                 func = self.handlers[action]
             try:
                 data = func(*obj["args"], **obj["kwargs"])
                 reply = {"status": "ok", "data": data}
+                if action == "get_dataset" and self.dataset_cache:
+                    self.cached_datasets.add(obj["args"][0])
             except:
                 reply = {
                     "status": "failed",
@@ -258,7 +285,8 @@ class Worker:
              "pipeline_name": pipeline_name,
              "wd": wd,
              "expid": expid,
-             "priority": priority},
+             "priority": priority,
+             "dataset_cache": self.dataset_cache},
             timeout)
 
     async def prepare(self):
@@ -283,7 +311,7 @@ class Worker:
     async def analyze(self):
         await self._worker_action({"action": "analyze"})
 
-    async def write_results(self, timeout=15.0):
+    async def write_results(self, timeout=60.0):
         await self._worker_action({"action": "write_results"},
                                   timeout)
 
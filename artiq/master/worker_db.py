@@ -1,13 +1,18 @@
 from operator import setitem
 from collections import OrderedDict
+from fnmatch import fnmatchcase
 import importlib
 import logging
 import os
 import tempfile
 import re
 
+import numpy
+
 from artiq.protocols.sync_struct import Notifier
 from artiq.protocols.pc_rpc import AutoTarget, Client, BestEffortClient
+from artiq.tools import (RING_DATASET_KEY, make_ring_dataset,
+                         make_ring_buffer, is_ring_dataset, ring_dataset_view)
 
 
 logger = logging.getLogger(__name__)
@@ -177,21 +182,53 @@ class DeviceManager:
         self.active_devices.clear()
 
 
+def _match_hdf5_policy(policy, key, value):
+    """Returns the HDF5 storage options of the first ``(pattern, options)``
+    entry of ``policy`` whose pattern matches ``key``.
+
+    Scalars cannot be chunked or filtered, and are always stored with the
+    default options."""
+    if policy is None or (numpy.ndim(value) == 0
+                          and not is_ring_dataset(value)):
+        return None
+    for pattern, options in policy:
+        if fnmatchcase(key, pattern):
+            return options
+    return None
+
+
+def _write_hdf5_dataset(group, key, value, options):
+    if is_ring_dataset(value):
+        value = ring_dataset_view(value)
+    if options:
+        group.create_dataset(key, data=value, **options)
+    else:
+        group[key] = value
+
+
 class DatasetManager:
     def __init__(self, ddb):
         self.broadcast = Notifier(dict())
         self.local = dict()
         self.archive = dict()
+        self.hdf5_options = dict()
 
         self.ddb = ddb
         self.broadcast.publish = ddb.update
 
-    def set(self, key, value, broadcast=False, persist=False, save=True):
+    def set(self, key, value, broadcast=False, persist=False, save=True,
+            hdf5_options=None, ring=None):
         if key in self.archive:
             logger.warning("Modifying dataset '%s' which is in archive, "
                            "archive will remain untouched",
                            key, stack_info=True)
 
+        if ring is not None:
+            value = make_ring_dataset(value, ring)
+        elif is_ring_dataset(value):
+            raise ValueError("dict datasets cannot have a '{}' key"
+                             .format(RING_DATASET_KEY))
+
         if persist:
             broadcast = True
         if broadcast:
@@ -202,8 +239,12 @@ class DatasetManager:
             self.local[key] = value
         elif key in self.local:
             del self.local[key]
+        if save and hdf5_options is not None:
+            self.hdf5_options[key] = hdf5_options
+        elif key in self.hdf5_options:
+            del self.hdf5_options[key]
 
-    def mutate(self, key, index, value):
+    def _get_mutation_target(self, key):
         target = None
         if key in self.local:
             target = self.local[key]
@@ -213,7 +254,10 @@ class DatasetManager:
             target = self.broadcast[key][1]
         if target is None:
             raise KeyError("Cannot mutate non-existing dataset")
+        return target
 
+    def mutate(self, key, index, value):
+        target = self._get_mutation_target(key)
         if isinstance(index, tuple):
             if isinstance(index[0], tuple):
                 index = tuple(slice(*e) for e in index)
@@ -221,9 +265,29 @@ class DatasetManager:
                 index = slice(*index)
         setitem(target, index, value)
 
+    def append_to(self, key, value):
+        target = self._get_mutation_target(key)
+        if key in self.local:
+            current = self.local[key]
+        else:
+            current = self.broadcast.read[key][1]
+        if is_ring_dataset(current):
+            # write the sample before moving the head, so that subscribers
+            # never see the new sample as the oldest one
+            size = current["size"]
+            head = current["head"]
+            if current[RING_DATASET_KEY] is None:
+                target[RING_DATASET_KEY] = make_ring_buffer(size, value)
+            target[RING_DATASET_KEY][head] = value
+            target["head"] = (head + 1) % size
+            if current["length"] < size:
+                target["length"] = current["length"] + 1
+        else:
+            target.append(value)
+
     def get(self, key, archive=False):
         if key in self.local:
-            return self.local[key]
+            data = self.local[key]
         else:
             data = self.ddb.get(key)
             if archive:
@@ -231,12 +295,24 @@ class DatasetManager:
                     logger.warning("Dataset '%s' is already in archive, "
                                    "overwriting", key, stack_info=True)
                 self.archive[key] = data
-            return data
+        if is_ring_dataset(data):
+            data = ring_dataset_view(data)
+        return data
+
+    def write_hdf5(self, f, policy=None):
+        """Writes the local and archived datasets into the HDF5 file ``f``.
 
-    def write_hdf5(self, f):
+        Storage options given to ``set`` take precedence over ``policy``,
+        a list of ``(pattern, options)`` pairs where ``pattern`` is matched
+        against the dataset key using ``fnmatch`` rules. Options are passed
+        to ``h5py.Group.create_dataset``."""
         datasets_group = f.create_group("datasets")
         for k, v in self.local.items():
-            datasets_group[k] = v
+            options = self.hdf5_options.get(k)
+            if options is None:
+                options = _match_hdf5_policy(policy, k, v)
+            _write_hdf5_dataset(datasets_group, k, v, options)
         archive_group = f.create_group("archive")
         for k, v in self.archive.items():
-            archive_group[k] = v
+            _write_hdf5_dataset(archive_group, k, v,
+                                _match_hdf5_policy(policy, k, v))
@@ -4,6 +4,7 @@ import os
 import logging
 import traceback
 from collections import OrderedDict
+from copy import deepcopy
 
 import h5py
 
@@ -22,11 +23,40 @@ from artiq import __version__ as artiq_version
 
 
 ipc = None
+# Master datasets read by this worker (key -> value), when the master
+# notifies us of their modifications. None if the cache is disabled.
+dataset_cache = None
+
+
+def _process_notification(obj):
+    if obj.get("action") == "invalidate_dataset":
+        if dataset_cache is not None:
+            dataset_cache.pop(obj["key"], None)
+        return True
+    else:
+        return False
 
 
 def get_object():
-    line = ipc.readline().decode()
-    return pyon.decode(line)
+    while True:
+        line = ipc.readline().decode()
+        obj = pyon.decode(line)
+        if not _process_notification(obj):
+            return obj
+
+
+def process_notifications():
+    # Only read the lines that are already in the pipe: the master sends
+    # nothing but notifications while the worker is not waiting for a reply.
+    while ipc.poll():
+        line = ipc.readline().decode()
+        obj = pyon.decode(line)
+        if _process_notification(obj):
+            continue
+        if obj["action"] == "terminate":
+            sys.exit()
+        else:
+            raise ValueError
 
 
 def put_object(obj):
@@ -52,14 +82,75 @@ def make_parent_action(action):
 
 
 class ParentDeviceDB:
-    get_device_db = make_parent_action("get_device_db")
-    get = make_parent_action("get_device")
+    """Resolves devices from a snapshot of the master device database.
+
+    The snapshot is fetched on first use after each build or examine
+    action, and only transferred again when the master reports a new
+    version of the database. Experiments therefore see the device database
+    as it was when they were built."""
+    _get_snapshot = make_parent_action("get_device_db_snapshot")
+    _get = make_parent_action("get_device")
+
+    version = None
+    data = None
+    checked = False
+
+    @classmethod
+    def invalidate(cls):
+        cls.checked = False
+
+    @classmethod
+    def _check(cls):
+        if not cls.checked:
+            snapshot = cls._get_snapshot(cls.version)
+            if snapshot is not None:
+                cls.version, cls.data = snapshot
+            cls.checked = True
+
+    @classmethod
+    def get_device_db(cls):
+        cls._check()
+        if cls.data is None:
+            return {}
+        return cls.data
+
+    @classmethod
+    def get(cls, key):
+        cls._check()
+        if cls.data is not None and key in cls.data:
+            return cls.data[key]
+        # the parent may resolve devices that are not in the snapshot
+        # (e.g. dummy devices of the browser), or raise KeyError
+        return cls._get(key)
 
 
 class ParentDatasetDB:
-    get = make_parent_action("get_dataset")
+    _get = make_parent_action("get_dataset")
     update = make_parent_action("update_dataset")
 
+    @staticmethod
+    def get(key):
+        """Reads a master dataset.
+
+        If enabled, values are cached and the master invalidates the keys
+        that change. A cached value is returned only after the invalidations
+        already sent by the master have been processed, so a read may miss
+        a concurrent write by another client by at most the pipe latency.
+        Writes by this worker are acknowledged by the master, and therefore
+        always visible to subsequent reads."""
+        if dataset_cache is None:
+            return ParentDatasetDB._get(key)
+        process_notifications()
+        try:
+            value = dataset_cache[key]
+        except KeyError:
+            value = ParentDatasetDB._get(key)
+            dataset_cache[key] = value
+        # callers may mutate the returned value (e.g. NumPy arrays)
+        return deepcopy(value)
+
+    get_hdf5_policy = make_parent_action("get_hdf5_policy")
+
 
 class Watchdog:
     _create = make_parent_action("create_watchdog")
@@ -134,7 +225,7 @@ register_experiment = make_parent_action("register_experiment")
 
 
 class ExamineDeviceMgr:
-    get_device_db = make_parent_action("get_device_db")
+    get_device_db = ParentDeviceDB.get_device_db
 
     @staticmethod
     def get(name):
@@ -217,7 +308,7 @@ def put_exception_report():
 
 
 def main():
-    global ipc
+    global ipc, dataset_cache
 
     multiline_log_config(level=int(sys.argv[2]))
     ipc = pipe_ipc.ChildComm(sys.argv[1])
@@ -245,6 +336,9 @@ def main():
                 start_time = time.time()
                 rid = obj["rid"]
                 expid = obj["expid"]
+                if obj["dataset_cache"]:
+                    dataset_cache = dict()
+                ParentDeviceDB.invalidate()
                 if obj["wd"] is not None:
                     # Using repository
                     experiment_file = os.path.join(obj["wd"], expid["file"])
@@ -283,8 +377,9 @@ def main():
                     put_object({"action": "completed"})
             elif action == "write_results":
                 filename = "{:09}-{}.h5".format(rid, exp.__name__)
+                hdf5_policy = ParentDatasetDB.get_hdf5_policy()
                 with h5py.File(filename, "w") as f:
-                    dataset_mgr.write_hdf5(f)
+                    dataset_mgr.write_hdf5(f, hdf5_policy)
                     f["artiq_version"] = artiq_version
                     f["rid"] = rid
                     f["start_time"] = start_time
@@ -292,6 +387,7 @@ def main():
                     f["expid"] = pyon.encode(expid)
                 put_object({"action": "completed"})
             elif action == "examine":
+                ParentDeviceDB.invalidate()
                 examine(ExamineDeviceMgr, ExamineDatasetMgr, obj["file"])
                 put_object({"action": "completed"})
             elif action == "terminate":
@@ -1,5 +1,6 @@
 import os
 import asyncio
+import select
 from asyncio.streams import FlowControlMixin
 
 
@@ -86,6 +87,10 @@ if os.name != "nt":
         def readline(self):
             return self.rf.readline()
 
+        def poll(self):
+            """Returns ``True`` if data can be read without blocking."""
+            return bool(select.select([self.rf], [], [], 0)[0])
+
         def write(self, data):
             return self.wf.write(data)
 
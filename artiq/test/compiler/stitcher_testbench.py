@@ -0,0 +1,55 @@
+"""
+Experiments and helpers to embed kernels with the :class:`Stitcher` in the
+compiler unit tests, without a device database.
+"""
+
+from artiq.language.core import kernel
+from artiq.language.units import us
+from artiq.coredevice.core import Core
+from artiq.coredevice.ttl import TTLOut, TTLInOut
+from artiq.coredevice.spi import SPIMaster
+from artiq.compiler.embedding import Stitcher
+
+
+class DeviceManager:
+    def get(self, name):
+        return self.core
+
+
+class MultiDevice:
+    def __init__(self, dmgr):
+        self.core = dmgr.core
+        self.ttl_outs = [TTLOut(dmgr, i) for i in range(4)]
+        self.ttl_ins = [TTLInOut(dmgr, 4 + i) for i in range(4)]
+        self.spis = [SPIMaster(dmgr, 8 + i) for i in range(2)]
+
+    @kernel
+    def run(self):
+        self.core.reset()
+        for ttl_in in self.ttl_ins:
+            ttl_in.input()
+            ttl_in.gate_rising(10*us)
+        for ttl_out in self.ttl_outs:
+            ttl_out.pulse(1*us)
+        for spi in self.spis:
+            spi.set_config_mu(0, 4, 4)
+            spi.set_xfer(1, 32, 0)
+            spi.write(0x12345678)
+        for ttl_in in self.ttl_ins:
+            ttl_in.count()
+
+
+def create(cls):
+    """Instantiates the experiment class ``cls``, whose constructor takes
+    a device manager providing a core device."""
+    dmgr = DeviceManager()
+    dmgr.core = Core(dmgr, host=None, ref_period=1e-9)
+    return cls(dmgr)
+
+
+def stitch(exp):
+    """Embeds the ``run`` kernel of the experiment ``exp``."""
+    stitcher = Stitcher(core=exp.core, dmgr=exp.core.dmgr)
+    stitcher.stitch_call(exp.__class__.run, (exp,), {})
+    stitcher.finalize()
+    return stitcher
@@ -0,0 +1,44 @@
+import unittest
+
+from artiq.language.core import kernel
+from artiq.compiler.module import Module
+from artiq.test.compiler.stitcher_testbench import create, stitch
+
+
+class _Promotion:
+    kernel_invariants = {"core"}
+
+    def __init__(self, dmgr):
+        self.core = dmgr.core
+        self.threshold = 10
+        self.counter = 0
+        self.data = [0, 0]
+
+    @kernel
+    def run(self):
+        if self.counter < self.threshold:
+            self.counter += self.threshold
+        self.data[0] = self.threshold
+
+
+def _self_type(module):
+    for function in module.artiq_ir:
+        if function.name.endswith("_Promotion.runzz"):
+            return function.arguments[1].type.find()
+
+
+class TestInvariantPromotion(unittest.TestCase):
+    def test_promote(self):
+        module = Module(stitch(create(_Promotion)), auto_invariants=True)
+        # counter is written to and data is mutable; neither is promoted.
+        self.assertEqual(module.promoted_invariants, 1)
+        self.assertEqual(module.invariant_loads, 3)
+        self.assertEqual(_self_type(module).constant_attributes,
+                         {"core", "threshold"})
+        # The kernel_invariants of the host class are left untouched.
+        self.assertEqual(_Promotion.kernel_invariants, {"core"})
+
+    def test_disabled(self):
+        module = Module(stitch(create(_Promotion)))
+        self.assertEqual(module.promoted_invariants, 0)
+        self.assertEqual(_self_type(module).constant_attributes, {"core"})
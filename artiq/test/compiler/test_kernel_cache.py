@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from artiq.compiler.kernel_cache import KernelCache
+
+
+class DummyTarget:
+    triple = "or1k-linux"
+    data_layout = "E-m:e-p:32:32-i64:32-f64:32-v64:32-v128:32-a:0:32-n32"
+    features = ["mul", "div", "ffl1", "cmov", "addc"]
+    opt_level = "default"
+
+
+class TestKernelCache(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.directory = tmpdir.name
+        self.target = DummyTarget()
+
+    def test_key(self):
+        cache = KernelCache(self.directory)
+        key = cache.key(self.target, "define void @f() {}")
+        self.assertEqual(key, cache.key(self.target, "define void @f() {}"))
+        self.assertNotEqual(key, cache.key(self.target, "define void @g() {}"))
+
+        other_target = DummyTarget()
+        other_target.features = ["mul"]
+        self.assertNotEqual(key, cache.key(other_target, "define void @f() {}"))
+
+        other_target = DummyTarget()
+        other_target.opt_level = "O3"
+        self.assertNotEqual(key, cache.key(other_target, "define void @f() {}"))
+
+    def test_hit_miss(self):
+        cache = KernelCache(self.directory)
+        key = cache.key(self.target, "define void @f() {}")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, b"\x7fELF library", b"\x7fELF")
+        self.assertEqual(cache.get(key), (b"\x7fELF library", b"\x7fELF"))
+
+        # a new instance sees the entries of previous ones
+        cache = KernelCache(self.directory)
+        self.assertEqual(cache.get(key), (b"\x7fELF library", b"\x7fELF"))
+
+    def test_eviction(self):
+        cache = KernelCache(self.directory, max_size=250)
+        keys = [cache.key(self.target, str(i)) for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            cache.put(key, bytes(100), bytes(0))
+            os.utime(cache._filename(key), (i, i))
+        # refresh the first entry, so that the second one is evicted
+        self.assertIsNotNone(cache.get(keys[0]))
+        cache.put(keys[2], bytes(100), bytes(0))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def test_corrupted(self):
+        cache = KernelCache(self.directory)
+        key = cache.key(self.target, "define void @f() {}")
+        with open(cache._filename(key), "wb") as f:
+            f.write(b"\x00\x00\x01\x00 truncated")
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(cache._filename(key)))
@@ -0,0 +1,39 @@
+import unittest
+
+from artiq.compiler.statistics import CompilerStatistics
+from artiq.compiler.testbench import perf_suite
+
+
+def _statistics(times):
+    statistics = CompilerStatistics()
+    for name, time in times:
+        with statistics.measure(name):
+            pass
+        statistics.passes[-1].time = time
+    return statistics
+
+
+class TestPerfSuite(unittest.TestCase):
+    def test_summarize(self):
+        result = perf_suite.summarize([
+            _statistics([("Inferencer", 0.02), ("ld", 0.01)]),
+            _statistics([("Inferencer", 0.01), ("ld", 0.03)]),
+        ])
+        self.assertAlmostEqual(result["time"], 0.03)
+        self.assertEqual([(pass_["name"], pass_["time"])
+                          for pass_ in result["passes"]],
+                         [("Inferencer", 0.01), ("ld", 0.01)])
+
+    def test_compare(self):
+        baseline = {"a.py": {"native": perf_suite.summarize([_statistics(
+            [("Inferencer", 0.010), ("ld", 0.020), ("strip", 0.0001)])])}}
+        results = {"a.py": {"native": perf_suite.summarize([_statistics(
+            [("Inferencer", 0.011), ("ld", 0.030), ("strip", 0.001)])])},
+                   "b.py": {"native": perf_suite.summarize([_statistics(
+            [("Inferencer", 1.0)])])}}
+        regressions = perf_suite.compare(baseline, results, threshold=0.2)
+        self.assertEqual([(case, target, name)
+                          for case, target, name, _, _ in regressions],
+                         [("a.py", "native", None), ("a.py", "native", "ld")])
+        self.assertEqual(perf_suite.compare(baseline, results, threshold=0.6),
+                         [])
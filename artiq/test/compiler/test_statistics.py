@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import unittest
+
+from artiq.compiler.module import Module
+from artiq.compiler.statistics import CompilerStatistics
+from artiq.compiler.targets import NativeTarget
+from artiq.test.compiler.stitcher_testbench import create, stitch, MultiDevice
+
+
+class TestCompilerStatistics(unittest.TestCase):
+    def test_passes(self):
+        statistics = CompilerStatistics(kernel="MultiDevice.run")
+        module = Module(stitch(create(MultiDevice)), ref_period=1e-9,
+                        statistics=statistics)
+        target = NativeTarget(statistics=statistics)
+        target.build_llvm_ir(module)
+
+        passes = {pass_["name"]: pass_
+                  for pass_ in statistics.as_dict()["passes"]}
+        for name in ["Inferencer", "IODelayEstimator", "ARTIQIRGenerator",
+                     "Interleaver", "LLVMIRGenerator"]:
+            self.assertIn(name, passes)
+            self.assertGreaterEqual(passes[name]["time"], 0)
+        self.assertGreater(passes["Inferencer"]["nodes"], 0)
+        self.assertGreaterEqual(passes["IODelayEstimator"]["iterations"], 1)
+        self.assertGreater(passes["ARTIQIRGenerator"]["instructions"], 0)
+        self.assertGreater(passes["LLVMIRGenerator"]["functions"], 0)
+        self.assertGreater(passes["LLVMIRGenerator"]["loads"], 0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = statistics.write(tmpdir)
+            self.assertEqual(os.path.dirname(filename), tmpdir)
+            with open(filename) as f:
+                report = json.load(f)
+        self.assertEqual(report["kernel"], "MultiDevice.run")
+        self.assertEqual([pass_["name"] for pass_ in report["passes"]],
+                         [pass_.name for pass_ in statistics.passes])
+
+    def test_disabled(self):
+        statistics = CompilerStatistics(enabled=False)
+        Module(stitch(create(MultiDevice)), ref_period=1e-9,
+               statistics=statistics)
+        self.assertEqual(statistics.passes, [])
@@ -0,0 +1,53 @@
+import unittest
+
+from artiq.language.core import kernel
+from artiq.compiler import builtins, embedding
+from artiq.compiler.module import Module
+from artiq.compiler.transforms import TypedtreePrinter
+from artiq.test.compiler.stitcher_testbench import create, stitch, MultiDevice
+
+
+class _Experiment:
+    def __init__(self, dmgr):
+        self.core = dmgr.core
+        self.bits = [1, 0, 1, 1]
+
+    @kernel
+    def pack(self, x):
+        return (x << 0 | x << 1 | x << 2 | x << 3 | x << 4 | x << 5 | x << 6 |
+                x << 7 | x << 8 | x << 9 | x << 10 | x << 11 | x << 12 |
+                x << 13 | x << 14 | x << 15 | x << 16 | x << 17 | x << 18 |
+                x << 19 | x << 20 | x << 21 | x << 22 | x << 23 | x << 24 |
+                x << 25 | x << 26 | x << 27 | x << 28 | x << 29 | x << 30)
+
+    @kernel
+    def count(self):
+        n = 0
+        for bit in self.bits:
+            n += self.pack(bit)
+        return n
+
+    @kernel
+    def run(self):
+        return self.count()
+
+
+class TestStitcher(unittest.TestCase):
+    def test_nested_coercions(self):
+        stitcher = stitch(create(_Experiment))
+        Module(stitcher)
+
+        instance_type, _ = stitcher.embedding_map.retrieve_type(_Experiment)
+        self.assertIn("bits", instance_type.attributes)
+        self.assertTrue(builtins.is_listish(instance_type.attributes["bits"],
+                                            builtins.TInt32()))
+
+    def test_parse_cache(self):
+        exp = create(MultiDevice)
+        embedding._parse_cache.clear()
+        printed = TypedtreePrinter().print(stitch(exp).typedtree)
+        self.assertGreater(len(embedding._parse_cache), 0)
+        # the cached parsetrees must not be affected by the first compilation
+        printed_cached = TypedtreePrinter().print(stitch(exp).typedtree)
+        self.assertEqual(printed, printed_cached)
+
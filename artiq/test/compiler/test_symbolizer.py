@@ -0,0 +1,185 @@
+import shutil
+import struct
+import subprocess
+import unittest
+
+from artiq.compiler.symbolizer import *
+from artiq.compiler.targets import OR1KTarget
+
+
+def _library(sections):
+    """Builds an OpenRISC shared library that only has the sections
+    ``sections``, a list of ``(name, address, data)``, and no program
+    headers or symbols."""
+    shstrtab = b"\x00"
+    headers = [[0] * 10]
+    for name, address, content in sections:
+        flags = 6 if address else 0         # SHF_ALLOC | SHF_EXECINSTR
+        headers.append([len(shstrtab), 1, flags, address, 0, len(content),
+                        0, 0, 4, 0])        # SHT_PROGBITS
+        shstrtab += name.encode() + b"\x00"
+    headers.append([len(shstrtab), 3, 0, 0, 0, 0, 0, 0, 1, 0]) # SHT_STRTAB
+    shstrtab += b".shstrtab\x00"
+
+    data = bytearray(52)
+    contents = [content for _, _, content in sections] + [shstrtab]
+    for header, content in zip(headers[1:], contents):
+        data += bytes(-len(data) % 4)
+        header[4], header[5] = len(data), len(content)
+        data += content
+    data += bytes(-len(data) % 4)
+    shoff = len(data)
+    for header in headers:
+        data += struct.pack(">IIIIIIIIII", *header)
+    struct.pack_into(">16sHHIIIIIHHHHHH", data, 0,
+                     b"\x7fELF\x01\x02\x01\x00" + bytes(8),
+                     3, 92,                 # ET_DYN, EM_OPENRISC
+                     1, 0, 0, shoff, 0, 52, 0, 0, 40, len(headers),
+                     len(headers) - 1)
+    return bytes(data)
+
+
+# __modinit__ spans 0x00-0x20 and calls _Z6helperzz, inlined at 0x08-0x10,
+# from line 5; the code at 0x18 is synthesized. Addresses are relative to
+# _base, where the code is loaded.
+_base = 0x1000
+_text = struct.pack(">8I", *[0x15000000] * 8)
+
+_debug_abbrev = bytes([
+    1, 0x11, 1,                     # DW_TAG_compile_unit, children
+        0x03, 0x08,                 # DW_AT_name, DW_FORM_string
+        0x1b, 0x08,                 # DW_AT_comp_dir, DW_FORM_string
+        0x10, 0x17,                 # DW_AT_stmt_list, DW_FORM_sec_offset
+        0x11, 0x01,                 # DW_AT_low_pc, DW_FORM_addr
+        0x12, 0x06,                 # DW_AT_high_pc, DW_FORM_data4
+        0, 0,
+    2, 0x2e, 0,                     # DW_TAG_subprogram, no children
+        0x6e, 0x0e,                 # DW_AT_linkage_name, DW_FORM_strp
+        0x03, 0x08,                 # DW_AT_name, DW_FORM_string
+        0x20, 0x0b,                 # DW_AT_inline, DW_FORM_data1
+        0, 0,
+    3, 0x2e, 1,                     # DW_TAG_subprogram, children
+        0x03, 0x08,                 # DW_AT_name, DW_FORM_string
+        0x11, 0x01,                 # DW_AT_low_pc, DW_FORM_addr
+        0x12, 0x06,                 # DW_AT_high_pc, DW_FORM_data4
+        0, 0,
+    4, 0x1d, 0,                     # DW_TAG_inlined_subroutine, no children
+        0x31, 0x13,                 # DW_AT_abstract_origin, DW_FORM_ref4
+        0x11, 0x01,                 # DW_AT_low_pc, DW_FORM_addr
+        0x12, 0x0b,                 # DW_AT_high_pc, DW_FORM_data1
+        0x58, 0x0b,                 # DW_AT_call_file, DW_FORM_data1
+        0x59, 0x0b,                 # DW_AT_call_line, DW_FORM_data1
+        0, 0,
+    0,
+])
+
+_debug_str = b"_Z6helperzz\x00"
+
+_unit = bytes([1]) + b"kernel.py\x00" + b"/src\x00" + struct.pack(">III", 0, _base, 0x20)
+_helper_offset = 11 + len(_unit)
+_unit += bytes([2]) + struct.pack(">I", 0) + b"helper\x00" + bytes([1])
+_modinit_offset = 11 + len(_unit)
+_unit += \
+    bytes([3]) + b"__modinit__\x00" + struct.pack(">II", _base, 0x20) + \
+        bytes([4]) + struct.pack(">II", _helper_offset, _base + 0x08) + bytes([8, 1, 5]) + \
+    bytes([0]) + \
+    bytes([0])
+_debug_info = struct.pack(">IHIB", 7 + len(_unit), 4, 0, 4) + _unit
+
+_line_header = \
+    bytes([1, 1, 1, 0xfb, 14, 13]) + bytes([0, 1, 1, 1, 1, 0, 0, 0, 1, 0, 0, 1]) + \
+    b"artiq\x00" + b"/usr/lib\x00" + b"\x00" + \
+    b"kernel.py\x00" + bytes([0, 0, 0]) + \
+    b"lib.py\x00" + bytes([1, 0, 0]) + \
+    b"<synthesized>\x00" + bytes([0, 0, 0]) + \
+    b"\x00"
+_line_program = (
+    bytes([0, 5, 2]) + struct.pack(">I", _base) + # set address 0x00
+    bytes([3, 3, 1]) +                          # line 4; copy
+    bytes([2, 8, 4, 2, 3, 6, 1]) +              # 0x08; lib.py; line 10; copy
+    bytes([2, 8, 4, 1, 3, 0x7c, 1]) +           # 0x10; kernel.py; line 6; copy
+    bytes([2, 8, 4, 3, 1]) +                    # 0x18; <synthesized>; copy
+    bytes([2, 8, 0, 1, 1])                      # 0x20; end of sequence
+)
+_debug_line = struct.pack(">IHI", 6 + len(_line_header) + len(_line_program), 4,
+                          len(_line_header)) + \
+              _line_header + _line_program
+
+_sections = [
+    (".text", _base, _text),
+    (".debug_abbrev", 0, _debug_abbrev),
+    (".debug_info", 0, _debug_info),
+    (".debug_line", 0, _debug_line),
+    (".debug_str", 0, _debug_str),
+]
+
+
+class TestDemangle(unittest.TestCase):
+    names = {
+        "_Z3foozz": "foo(..., ...)",
+        "_Z3fooI3barEzz": "... foo<bar>(...)",
+        "_Z3fooI3bar3bazEzz": "... foo<bar, baz>(...)",
+        "_Z10run_kernelzz": "run_kernel(..., ...)",
+        "_Z3foov": "foo()",
+        "_Z3foo": "foo",
+        "__modinit__": "__modinit__",
+        "_Z10foo": "_Z10foo",
+        "_Z3fooI3barzz": "_Z3fooI3barzz",
+    }
+
+    def test_demangle(self):
+        for name, demangled in self.names.items():
+            self.assertEqual(demangle(name), demangled)
+
+    @unittest.skipUnless(shutil.which("c++filt"), "c++filt not available")
+    def test_cxxfilt(self):
+        names = list(self.names)
+        output = subprocess.check_output(["c++filt"] + names)
+        self.assertEqual(output.decode().rstrip("\n").split("\n"),
+                         [demangle(name) for name in names])
+
+
+class TestSymbolizer(unittest.TestCase):
+    def setUp(self):
+        self.library, self.text = _library(_sections), _base
+        self.symbolizer = Symbolizer(self.library)
+
+    def test_lookup(self):
+        self.assertEqual(self.symbolizer.lookup(self.text + 0x04),
+                         [("/src/kernel.py", 4, "__modinit__")])
+        self.assertEqual(self.symbolizer.lookup(self.text + 0x0c),
+                         [("/src/artiq/lib.py", 10, "helper(..., ...)"),
+                          ("/src/kernel.py", 5, "__modinit__")])
+        self.assertEqual(self.symbolizer.lookup(self.text + 0x10),
+                         [("/src/kernel.py", 6, "__modinit__")])
+        self.assertEqual(self.symbolizer.lookup(self.text + 0x20),
+                         [("??", 0, "??")])
+
+    def test_symbolize(self):
+        # Return addresses point after the call, and inlined frames share
+        # the address of the call.
+        address = self.text + 0x0c
+        self.assertEqual(self.symbolizer.symbolize([address + 1, self.text + 0x1c]),
+                         [("/src/artiq/lib.py", 10, -1, "helper(..., ...)", address + 1),
+                          ("/src/kernel.py", 5, -1, "__modinit__", address + 1)])
+
+    def test_target(self):
+        target = OR1KTarget()
+        self.assertEqual(target.symbolize(self.library, [self.text + 0x11]),
+                         [("/src/kernel.py", 6, -1, "__modinit__", self.text + 0x11)])
+        self.assertIs(target._symbolizer(self.library),
+                      target._symbolizer(self.library))
+        self.assertEqual(target.demangle(["_Z3foozz"]), ["foo(..., ...)"])
+
+    def test_no_debug_info(self):
+        self.assertEqual(Symbolizer(_library(_sections[:1])).lookup(self.text),
+                         [("??", 0, "??")])
+
+    def test_unsupported(self):
+        with self.assertRaises(SymbolizerError):
+            Symbolizer(b"\x00" * 64)
+        data = bytearray(self.library)
+        offset = data.index(_debug_info[:11])
+        struct.pack_into(">H", data, offset + 4, 5)
+        with self.assertRaises(SymbolizerError):
+            Symbolizer(bytes(data))
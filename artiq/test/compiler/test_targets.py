@@ -0,0 +1,56 @@
+import unittest
+
+from llvmlite_artiq import binding as llvm
+
+from artiq.language.core import kernel
+from artiq.coredevice.core import Core
+from artiq.compiler.targets import NativeTarget, opt_levels
+
+
+_llvm_ir = """
+define i32 @f(i32 %x) {
+entry:
+  %a = alloca i32
+  store i32 %x, i32* %a
+  %b = load i32, i32* %a
+  %c = add i32 %b, 1
+  ret i32 %c
+}
+"""
+
+
+class _Kernels:
+    @kernel
+    def plain(self):
+        pass
+
+    @kernel(flags={"O3"})
+    def aggressive(self):
+        pass
+
+    @kernel(flags={"O1", "Os"})
+    def conflicting(self):
+        pass
+
+
+class TestOptLevel(unittest.TestCase):
+    def test_optimize(self):
+        for opt_level in ["default"] + sorted(opt_levels):
+            llmodule = llvm.parse_assembly(_llvm_ir)
+            NativeTarget(opt_level=opt_level).optimize(llmodule)
+            llmodule.verify()
+            # every level but O0 promotes the alloca to a register
+            self.assertEqual("alloca" in str(llmodule), opt_level == "O0")
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            NativeTarget(opt_level="O4")
+        with self.assertRaises(ValueError):
+            Core(None, host=None, ref_period=1e-9, opt_level="O4")
+
+    def test_kernel_flags(self):
+        core = Core(None, host=None, ref_period=1e-9, opt_level="O1")
+        self.assertEqual(core._kernel_opt_level(_Kernels.plain), "O1")
+        self.assertEqual(core._kernel_opt_level(_Kernels.aggressive), "O3")
+        with self.assertRaises(ValueError):
+            core._kernel_opt_level(_Kernels.conflicting)
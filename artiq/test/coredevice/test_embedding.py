@@ -290,3 +290,50 @@ class LargePayloadTest(ExperimentCase):
     def test_1MB(self):
         exp = self.create(_Payload1MB)
         exp.run()
+
+
+class _Precompile(EnvExperiment):
+    def build(self):
+        self.setattr_device("core")
+        self.x = 1
+
+    @kernel
+    def compute(self, y):
+        return self.x + y
+
+    def run(self):
+        return self.core.precompile(self.compute, 2)
+
+
+class PrecompileTest(ExperimentCase):
+    def test_precompile(self):
+        exp = self.create(_Precompile)
+        precompiled = exp.run()
+        exp.x = 3
+        self.assertEqual(precompiled(), 3)
+        self.assertEqual(precompiled(), 3)
+
+
+class _RangeScan(EnvExperiment):
+    def build(self):
+        self.setattr_device("core")
+        self.linear = RangeScan(0.0, 2.5, 11)
+        self.shuffled = RangeScan(0.0, 2.5, 11, randomize=True, seed=1)
+        self.values = []
+
+    def record(self, value):
+        self.values.append(value)
+
+    @kernel
+    def run(self):
+        for i in range(self.linear.npoints):
+            self.record(self.linear.point(i))
+        for i in range(self.shuffled.npoints):
+            self.record(self.shuffled.point(i))
+
+
+class RangeScanTest(ExperimentCase):
+    def test_point(self):
+        exp = self.create(_RangeScan)
+        exp.run()
+        self.assertEqual(exp.values, list(exp.linear) + list(exp.shuffled))
@@ -2,7 +2,13 @@ import os
 import time
 import unittest
 
+import numpy
+
 from artiq.experiment import *
+from artiq.compiler.embedding import EmbeddingMap
+from artiq.coredevice.core import Core
+from artiq.coredevice.comm_kernel import CommKernel
+from artiq.coredevice.comm_kernel_emulator import CommKernelEmulator
 from artiq.test.hardware_testbench import ExperimentCase
 
 
@@ -55,6 +61,172 @@ class TransferTest(ExperimentCase):
         self.assertGreater(device_to_host_rate, 2e6)
 
 
+class _LocalCase(unittest.TestCase):
+    # Runs the host side of kernels against a CommKernelEmulator.
+    def setUp(self):
+        self.emulator = CommKernelEmulator()
+        self.emulator.start()
+        self.core = Core(None, host=None, ref_period=1e-9)
+        self.core.comm = CommKernel("127.0.0.1", self.emulator.port)
+        self.embedding_map = EmbeddingMap()
+
+    def tearDown(self):
+        self.core.close()
+        self.emulator.stop()
+
+    def run_kernel(self, script, *services):
+        self.emulator.script = script
+        for service in services:
+            self.embedding_map.store_object(service)
+        t0 = time.monotonic()
+        self.core._run_compiled(b"kernel", self.embedding_map,
+                                lambda addresses: [], lambda symbols: symbols)
+        t1 = time.monotonic()
+        return t1 - t0
+
+
+@unittest.skipUnless(artiq_low_latency,
+                     "timings are dependent on CPU load")
+class LocalTransferTest(_LocalCase):
+    # The host side of TransferTest.
+    data = b"\x00"*(10**6)
+
+    def test_host_to_device(self):
+        elapsed = self.run_kernel(
+            lambda session: session.rpc(1, return_tags=b"B"),
+            lambda: self.data)
+        host_to_device_rate = len(self.data)/elapsed
+        self.assertGreater(host_to_device_rate, 2e6)
+
+    def test_device_to_host(self):
+        received = []
+        elapsed = self.run_kernel(
+            lambda session: session.rpc(1, [(b"B", self.data)], asynchronous=True),
+            received.append)
+        device_to_host_rate = len(self.data)/elapsed
+        self.assertEqual(received, [self.data])
+        self.assertGreater(device_to_host_rate, 2e6)
+
+    def test_list_transfer(self):
+        int_list = list(range(10**5))
+        for name, script in [
+                    ("int_list_host_to_device",
+                     lambda session: session.rpc(1, return_tags=b"li")),
+                    ("int_list_device_to_host",
+                     lambda session: session.rpc(2, [(b"li", int_list)],
+                                                 asynchronous=True))]:
+            with self.subTest(name=name):
+                rate = len(int_list)/self.run_kernel(
+                    script, lambda: int_list, lambda data: None)
+                self.assertGreater(rate, 1e5)
+
+    def test_rpc_rate(self):
+        count = 10000
+        def script(session):
+            for _ in range(count):
+                session.rpc(1, return_tags=b"i")
+        rpc_rate = count/self.run_kernel(script, lambda: 42)
+        self.assertGreater(rpc_rate, 1e3)
+
+
+class _UserError(Exception):
+    pass
+
+
+@unittest.skipUnless(artiq_low_latency,
+                     "timings are dependent on CPU load")
+class LocalKernelOverheadTest(_LocalCase):
+    # The host side of KernelOverheadTest, and of kernels raising exceptions.
+    def test_kernel_overhead(self):
+        n = 100
+        self.run_kernel(lambda session: None)
+        kernel_overhead = sum(self.run_kernel(lambda session: None)
+                              for _ in range(n))/n
+        self.assertLess(kernel_overhead, 0.05)
+
+    def test_exception_overhead(self):
+        def service():
+            raise _UserError
+
+        n = 100
+        t0 = time.monotonic()
+        for _ in range(n):
+            with self.assertRaises(_UserError):
+                self.run_kernel(lambda session: session.rpc(1), service)
+        t1 = time.monotonic()
+        exception_overhead = (t1-t0)/n
+        self.assertLess(exception_overhead, 0.05)
+
+
+class _ListTransfer(EnvExperiment):
+    def build(self):
+        self.setattr_device("core")
+        self.int_list = list(range(10**5))
+        self.float_list = [float(i) for i in range(10**5)]
+        self.int_array = numpy.arange(10**5, dtype=numpy.int32)
+
+    @rpc
+    def int_source(self) -> TList(TInt32):
+        return self.int_list
+
+    @rpc
+    def float_source(self) -> TList(TFloat):
+        return self.float_list
+
+    @rpc(flags={"async"})
+    def sink(self, data):
+        pass
+
+    @kernel
+    def int_list_host_to_device(self):
+        t0 = self.core.get_rtio_counter_mu()
+        data = self.int_source()
+        t1 = self.core.get_rtio_counter_mu()
+        return len(data)/self.core.mu_to_seconds(t1-t0)
+
+    @kernel
+    def float_list_host_to_device(self):
+        t0 = self.core.get_rtio_counter_mu()
+        data = self.float_source()
+        t1 = self.core.get_rtio_counter_mu()
+        return len(data)/self.core.mu_to_seconds(t1-t0)
+
+    @kernel
+    def int_list_device_to_host(self):
+        t0 = self.core.get_rtio_counter_mu()
+        self.sink(self.int_list)
+        t1 = self.core.get_rtio_counter_mu()
+        return len(self.int_list)/self.core.mu_to_seconds(t1-t0)
+
+    @kernel
+    def float_list_device_to_host(self):
+        t0 = self.core.get_rtio_counter_mu()
+        self.sink(self.float_list)
+        t1 = self.core.get_rtio_counter_mu()
+        return len(self.float_list)/self.core.mu_to_seconds(t1-t0)
+
+    @kernel
+    def int_array_device_to_host(self):
+        t0 = self.core.get_rtio_counter_mu()
+        self.sink(self.int_array)
+        t1 = self.core.get_rtio_counter_mu()
+        return len(self.int_array)/self.core.mu_to_seconds(t1-t0)
+
+
+class ListTransferTest(ExperimentCase):
+    @unittest.skipUnless(artiq_low_latency,
+                         "timings are dependent on CPU load and network conditions")
+    def test_list_transfer(self):
+        exp = self.create(_ListTransfer)
+        for name in ["int_list_host_to_device", "float_list_host_to_device",
+                     "int_list_device_to_host", "float_list_device_to_host",
+                     "int_array_device_to_host"]:
+            with self.subTest(name=name):
+                rate = getattr(exp, name)()
+                print(name, rate, "elements/s")
+                self.assertGreater(rate, 1e5)
+
+
 class _KernelOverhead(EnvExperiment):
     def build(self):
         self.setattr_device("core")
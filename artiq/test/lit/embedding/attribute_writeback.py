@@ -0,0 +1,40 @@
+# RUN: env ARTIQ_DUMP_UNOPT_LLVM=%t %python -m artiq.compiler.testbench.embedding +compile %s
+# RUN: OutputCheck %s --file-to-check=%t_unopt.ll
+
+from artiq.language.core import *
+from artiq.language.types import *
+
+# Only the attributes that are stored to, or are mutable and loaded, are
+# written back.
+# CHECK-NOT-L: @"A.I.testbench.Writeback.threshold"
+# CHECK-NOT-L: @"A.I.testbench.Writeback.name"
+# CHECK-L: @"Ax.I.testbench.Writeback" = private unnamed_addr constant [4 x %"A"*] [%"A"* @"__objectid__", %"A"* @"A.I.testbench.Writeback.counter", %"A"* @"A.I.testbench.Writeback.data", %"A"* null]
+# CHECK-NOT-L: @"Ax.I.testbench.ReadOnly"
+class Writeback:
+    def __init__(self):
+        self.counter = 0
+        self.threshold = 10
+        self.data = [0, 0]
+        self.name = "abc"
+
+    @kernel
+    def run(self):
+        if self.counter < self.threshold:
+            self.counter += 1
+        self.data[0] = len(self.name)
+
+class ReadOnly:
+    def __init__(self):
+        self.limit = 10
+
+    @kernel
+    def run(self):
+        return self.limit
+
+writeback = Writeback()
+read_only = ReadOnly()
+
+@kernel
+def entrypoint():
+    writeback.run()
+    read_only.run()
@@ -0,0 +1,33 @@
+# RUN: env ARTIQ_DUMP_UNOPT_LLVM=%t %python -m artiq.compiler.testbench.embedding +compile %s
+# RUN: OutputCheck %s --file-to-check=%t_unopt.ll
+
+from artiq.language.core import *
+from artiq.language.types import *
+
+dmgr.get("core").auto_kernel_invariants = True
+
+class Promotion:
+    def __init__(self):
+        self.threshold = 10
+        self.counter = 0
+        self.data = [0, 0]
+
+    # counter is written to and data is mutable; only threshold is promoted.
+    # CHECK-NOT: FLD\.(counter|data)" = load .*!unconditionally\.invariant\.load
+    # CHECK: FLD\.threshold" = load .*!unconditionally\.invariant\.load
+    # CHECK-NOT: FLD\.(counter|data)" = load .*!unconditionally\.invariant\.load
+    # CHECK: FLD\.threshold" = load .*!unconditionally\.invariant\.load
+    # CHECK-NOT: FLD\.(counter|data)" = load .*!unconditionally\.invariant\.load
+    # CHECK: FLD\.threshold" = load .*!unconditionally\.invariant\.load
+    # CHECK-NOT: FLD\.(counter|data)" = load .*!unconditionally\.invariant\.load
+    @kernel
+    def run(self):
+        if self.counter < self.threshold:
+            self.counter += self.threshold
+        self.data[0] = self.threshold
+
+obj = Promotion()
+
+@kernel
+def entrypoint():
+    obj.run()
@@ -0,0 +1,25 @@
+# RUN: %python -m artiq.compiler.testbench.embedding %s
+
+from artiq.language.core import *
+from artiq.language.types import *
+from artiq.language.scan import RangeScan
+
+linear = RangeScan(0.0, 2.5, 11)
+shuffled = RangeScan(0.0, 2.5, 11, randomize=True, seed=1)
+
+# point() is portable; check the values it returns on the host.
+expected = [0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5]
+assert [linear.point(i) for i in range(linear.npoints)] == expected
+shuffled_values = [shuffled.point(i) for i in range(shuffled.npoints)]
+assert shuffled_values != expected
+assert sorted(shuffled_values) == expected
+assert shuffled_values == [expected[i] for i in shuffled.permutation]
+assert shuffled_values == list(shuffled)
+
+@kernel
+def entrypoint():
+    total = 0.0
+    for i in range(linear.npoints):
+        total += linear.point(i)
+    for i in range(shuffled.npoints):
+        total += shuffled.point(i)
@@ -0,0 +1,38 @@
+# RUN: env ARTIQ_DUMP_UNOPT_LLVM=%t %python -m artiq.compiler.testbench.embedding +compile %s
+# RUN: OutputCheck %s --file-to-check=%t_unopt.ll
+
+from artiq.language.core import *
+from artiq.language.types import *
+from artiq.coredevice.rtio import rtio_output
+
+class Device:
+    def __init__(self, channel):
+        self.channel = channel
+
+dev = Device(3)
+
+# The lists and the byval slots of the batch call are allocated once,
+# in the entry block.
+# CHECK-L: alloca i32, i32 3
+# CHECK-L: alloca i32, i32 3
+# CHECK-L: for.body:
+# CHECK-NOT-L: alloca
+# CHECK-NOT-L: call void @"rtio_output"(
+# CHECK: call void @"rtio_output_batch"\(i64 %"BLT\.now_mu", i32 %"val\.UNN\.\d+\.FLD\.channel",
+# CHECK-NOT-L: alloca
+# CHECK-NOT-L: call void @"rtio_output_batch"(
+# CHECK: call void @"rtio_output"\(i64 %"BLT\.now_mu\.\d+", i32 5, i32 1, i32 3\)
+# CHECK-NOT-L: alloca
+# CHECK: call void @"rtio_output"\(i64 %"BLT\.now_mu\.\d+", i32 5, i32 1, i32 3\)
+# CHECK-NOT-L: alloca
+# CHECK-L: declare void @"rtio_output_batch"(i64 %".1", i32 %".2", {i32*, i32}* byval %".3", {i32*, i32}* byval %".4")
+@kernel(flags={"coalesce-rtio"})
+def entrypoint():
+    for i in range(10):
+        rtio_output(now_mu(), dev.channel, 0, i)
+        rtio_output(now_mu(), dev.channel, 1, 2 * i)
+        rtio_output(now_mu(), dev.channel, 2, 7)
+        delay_mu(8)
+        rtio_output(now_mu(), 5, 1, 3)
+        delay_mu(8)
+        rtio_output(now_mu(), 5, 1, 3)
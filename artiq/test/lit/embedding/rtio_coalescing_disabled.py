@@ -0,0 +1,14 @@
+# RUN: env ARTIQ_DUMP_UNOPT_LLVM=%t %python -m artiq.compiler.testbench.embedding +compile %s
+# RUN: OutputCheck %s --file-to-check=%t_unopt.ll
+
+from artiq.language.core import *
+from artiq.language.types import *
+from artiq.coredevice.rtio import rtio_output
+
+# CHECK-L: call void @"rtio_output"(i64 %"BLT.now_mu", i32 3, i32 0, i32 1)
+# CHECK: call void @"rtio_output"\(i64 %"BLT\.now_mu\.\d+", i32 3, i32 1, i32 1\)
+# CHECK-NOT-L: rtio_output_batch
+@kernel
+def entrypoint():
+    rtio_output(now_mu(), 3, 0, 1)
+    rtio_output(now_mu(), 3, 1, 1)
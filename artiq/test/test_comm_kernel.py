@@ -0,0 +1,488 @@
+import io
+import os
+import json
+import struct
+import time
+import threading
+import unittest
+from collections import deque
+
+import numpy
+
+from artiq.compiler.embedding import EmbeddingMap
+from artiq.coredevice import exceptions
+from artiq.coredevice.comm_kernel import (CommKernel, RPCReturnValueError,
+                                          LoadError)
+from artiq.coredevice.comm_kernel_emulator import (CommKernelEmulator,
+                                                   KernelException)
+from artiq.coredevice.core import Core
+from artiq.coredevice.kernel_profile import KernelProfile
+
+
+artiq_low_latency = os.getenv("ARTIQ_LOW_LATENCY")
+
+
+class _LoopbackComm(CommKernel):
+    def __init__(self, data=b""):
+        CommKernel.__init__(self, None)
+        self.rx = io.BytesIO(data)
+        self.tx = bytearray()
+
+    def read(self, length):
+        data = self.rx.read(length)
+        if len(data) < length:
+            raise ConnectionResetError("Connection closed")
+        return data
+
+    def write(self, data):
+        self.tx += data
+
+
+_formats = {"b": "B", "i": ">l", "I": ">q", "f": ">d"}
+
+
+def _device_list(tag, values, container="l"):
+    # The core device precedes every element with its tag.
+    return (container.encode() + struct.pack(">L", len(values)) +
+            b"".join(tag.encode() + struct.pack(_formats[tag], value)
+                     for value in values))
+
+
+def _host_list(tag, values):
+    # The host only sends the length and the values.
+    return (struct.pack(">l", len(values)) +
+            b"".join(struct.pack(_formats[tag], value) for value in values))
+
+
+def _receive(data):
+    comm = _LoopbackComm(data)
+    value = comm._receive_rpc_value(None)
+    assert comm.rx.read() == b""
+    return value
+
+
+def _send(tags, value):
+    comm = _LoopbackComm()
+    comm._send_rpc_value(bytearray(tags), value, value, "test")
+    return bytes(comm.tx)
+
+
+class ReceiveTest(unittest.TestCase):
+    def test_int32_list(self):
+        values = [0, 1, -1, 2**31 - 1, -2**31]
+        result = _receive(_device_list("i", values))
+        self.assertEqual(result, values)
+        self.assertIsInstance(result, list)
+        for elt in result:
+            self.assertIs(type(elt), numpy.int32)
+
+    def test_int64_list(self):
+        values = [0, 2**40, -2**63]
+        result = _receive(_device_list("I", values))
+        self.assertEqual(result, values)
+        for elt in result:
+            self.assertIs(type(elt), numpy.int64)
+
+    def test_float_list(self):
+        values = [0.0, 1.5, -1e300]
+        result = _receive(_device_list("f", values))
+        self.assertEqual(result, values)
+        for elt in result:
+            self.assertIs(type(elt), float)
+
+    def test_bool_list(self):
+        result = _receive(_device_list("b", [1, 0, 1]))
+        self.assertEqual(result, [True, False, True])
+        for elt in result:
+            self.assertIs(type(elt), bool)
+
+    def test_arrays(self):
+        for tag, values, dtype in [("i", [1, -2, 3], numpy.int32),
+                                   ("I", [1, 2**40], numpy.int64),
+                                   ("f", [0.5, -1.0], numpy.float64),
+                                   ("b", [0, 1], numpy.bool_)]:
+            with self.subTest(tag=tag):
+                result = _receive(_device_list(tag, values, "a"))
+                self.assertIsInstance(result, numpy.ndarray)
+                self.assertEqual(result.dtype, dtype)
+                self.assertTrue(result.flags.writeable)
+                numpy.testing.assert_equal(result, values)
+
+    def test_empty(self):
+        self.assertEqual(_receive(b"l\x00\x00\x00\x00"), [])
+        self.assertEqual(len(_receive(b"a\x00\x00\x00\x00")), 0)
+
+    def test_nested(self):
+        data = (b"l" + struct.pack(">L", 2) +
+                _device_list("i", [1, 2]) + _device_list("i", [3]))
+        self.assertEqual(_receive(data), [[1, 2], [3]])
+
+    def test_strings(self):
+        data = (b"l" + struct.pack(">L", 2) +
+                b"s" + struct.pack(">l", 2) + b"ab" +
+                b"s" + struct.pack(">l", 0))
+        self.assertEqual(_receive(data), ["ab", ""])
+
+    def test_inconsistent_tags(self):
+        data = b"l" + struct.pack(">L", 2) + b"i\x00\x00\x00\x01" + b"I\x00\x00\x00\x01"
+        with self.assertRaises(IOError):
+            _receive(data)
+
+    def test_truncated(self):
+        with self.assertRaises(ConnectionResetError):
+            _receive(_device_list("i", [1, 2, 3])[:-1])
+
+
+class SendTest(unittest.TestCase):
+    def test_int32_list(self):
+        values = [0, 1, -1, numpy.int32(5), 2**31 - 2, -2**31 + 1]
+        self.assertEqual(_send(b"li", values), _host_list("i", values))
+
+    def test_int64_list(self):
+        values = [0, numpy.int32(-3), numpy.int64(2**40)]
+        self.assertEqual(_send(b"lI", values), _host_list("I", values))
+
+    def test_float_list(self):
+        values = [0.0, numpy.float64(-1.5), 1e300]
+        self.assertEqual(_send(b"lf", values), _host_list("f", values))
+
+    def test_bool_list(self):
+        values = [True, False, True]
+        self.assertEqual(_send(b"lb", values), _host_list("b", values))
+
+    def test_empty(self):
+        self.assertEqual(_send(b"li", []), _host_list("i", []))
+
+    def test_mixed_types(self):
+        # bool is not one of the types of the fast path, but is an int.
+        values = [1, True, 3]
+        self.assertEqual(_send(b"li", values), _host_list("i", values))
+
+    def test_out_of_range(self):
+        for tags, value in [(b"li", [0, 2**31]),
+                            (b"li", [-2**31]),
+                            (b"lI", [0, 2**63 - 1]),
+                            (b"lI", [2**64]),
+                            (b"ai", numpy.array([2**32])),
+                            (b"aI", numpy.array([2**63], dtype=numpy.uint64))]:
+            with self.subTest(tags=tags, value=value):
+                with self.assertRaises(RPCReturnValueError):
+                    _send(tags, value)
+
+    def test_type_mismatch(self):
+        for tags, value in [(b"li", [1, 2.0]),
+                            (b"lf", [1.0, 2]),
+                            (b"lb", [True, 1]),
+                            (b"li", numpy.array([1, 2])),
+                            (b"ai", numpy.array([[1, 2]]))]:
+            with self.subTest(tags=tags, value=value):
+                with self.assertRaises(RPCReturnValueError):
+                    _send(tags, value)
+
+    def test_arrays(self):
+        for tags, value in [(b"ai", numpy.array([1, -2], dtype=numpy.int32)),
+                            (b"ai", numpy.array([1, -2], dtype=numpy.int64)),
+                            (b"aI", numpy.array([2**40], dtype=numpy.int64)),
+                            (b"af", numpy.linspace(0, 1, 5)),
+                            (b"ab", numpy.array([True, False])),
+                            (b"ai", [1, 2])]:
+            with self.subTest(tags=tags, value=value):
+                self.assertEqual(_send(tags, value),
+                                 _host_list(chr(tags[1]), numpy.asarray(value).tolist()))
+
+    def test_strings(self):
+        self.assertEqual(_send(b"ls", ["ab"]),
+                         struct.pack(">l", 1) + struct.pack(">l", 2) + b"ab")
+
+
+@unittest.skipUnless(artiq_low_latency,
+                     "timings are dependent on CPU load")
+class ThroughputTest(unittest.TestCase):
+    length = 100000
+
+    def _rate(self, fn):
+        t0 = time.monotonic()
+        fn()
+        t1 = time.monotonic()
+        return self.length/(t1 - t0)
+
+    def test_receive(self):
+        for tag, container in [("i", "l"), ("f", "l"), ("i", "a"), ("f", "a")]:
+            data = _device_list(tag, range(self.length), container)
+            rate = self._rate(lambda: _receive(data))
+            print(container, tag, "receive:", rate, "elements/s")
+            self.assertGreater(rate, 1e6)
+
+    def test_send(self):
+        for tags, value in [(b"li", list(range(self.length))),
+                            (b"lf", [float(i) for i in range(self.length)]),
+                            (b"ai", numpy.arange(self.length, dtype=numpy.int32)),
+                            (b"af", numpy.arange(self.length, dtype=numpy.float64))]:
+            rate = self._rate(lambda: _send(tags, value))
+            print(tags.decode(), "send:", rate, "elements/s")
+            self.assertGreater(rate, 1e6)
+
+
+class _UserError(Exception):
+    pass
+
+
+class EmulatorTest(unittest.TestCase):
+    def setUp(self):
+        self.emulator = CommKernelEmulator()
+        self.emulator.start()
+        self.comm = CommKernel("127.0.0.1", self.emulator.port)
+        self.embedding_map = EmbeddingMap()
+
+    def tearDown(self):
+        self.comm.close()
+        self.emulator.stop()
+
+    def run_kernel(self, script, *services):
+        self.emulator.script = script
+        for service in services:
+            self.embedding_map.store_object(service)
+        self.comm.load(b"kernel")
+        self.comm.run()
+        self.comm.serve(self.embedding_map,
+                        lambda addresses: [("<symbolized>", 1, -1, "f", address)
+                                           for address in addresses],
+                        lambda symbols: symbols)
+
+    def test_system_info(self):
+        self.comm.check_system_info()
+        self.comm.switch_clock(False)
+
+    def test_flash_storage(self):
+        self.comm.flash_storage_write("key", b"value")
+        self.assertEqual(self.comm.flash_storage_read("key"), "value")
+        self.comm.flash_storage_remove("key")
+        self.assertEqual(self.comm.flash_storage_read("key"), "")
+        self.comm.flash_storage_write("key", b"value")
+        self.comm.flash_storage_erase()
+        self.assertEqual(self.emulator.flash, {})
+
+    def test_load(self):
+        self.emulator.load = lambda library: "invalid kernel"
+        with self.assertRaisesRegex(LoadError, "invalid kernel"):
+            self.comm.load(b"kernel")
+
+    def test_kernel(self):
+        self.run_kernel(lambda session: None)
+        self.run_kernel(lambda session: None)
+        self.assertEqual(self.emulator.libraries, [b"kernel", b"kernel"])
+        self.assertEqual(self.emulator.kernels_run, 2)
+
+    def test_rpc(self):
+        calls = []
+        def service(*args, **kwargs):
+            calls.append((args, kwargs))
+            return [args[0], 2]
+
+        replies = []
+        def script(session):
+            replies.append(session.rpc(1, [(b"i", 1), (b"s", "a"), (b"lf", [0.5]),
+                                           (b"t\x02bB", (True, b"b"))],
+                                       {"x": (b"I", 2**40)}, return_tags=b"li"))
+            session.rpc(1, [(b"ai", [3, 4])], asynchronous=True)
+        self.run_kernel(script, service)
+
+        (args, kwargs), (array_args, array_kwargs) = calls
+        self.assertEqual((args, kwargs),
+                         ((1, "a", [0.5], (True, b"b")), {"x": 2**40}))
+        self.assertIsInstance(args[0], numpy.int32)
+        numpy.testing.assert_equal(array_args, ([3, 4], ))
+        self.assertEqual(array_kwargs, {})
+        self.assertEqual(replies, [[1, 2]])
+
+    def test_rpc_exception(self):
+        def service():
+            raise _UserError("failed")
+
+        caught = []
+        def script(session):
+            try:
+                session.rpc(1)
+            except KernelException as exn:
+                caught.append(exn)
+                raise
+        with self.assertRaisesRegex(_UserError, "failed") as context:
+            self.run_kernel(script, service)
+        self.assertIn("_UserError", caught[0].name)
+        self.assertEqual(caught[0].message, "failed")
+        self.assertEqual(context.exception.artiq_core_exception.name,
+                         "{}._UserError".format(__name__))
+
+    def test_kernel_exception(self):
+        def script(session):
+            raise KernelException("0:RTIOUnderflow", "at {0}", (42, 0, 0),
+                                  backtrace=[0x100, 0x200])
+        with self.assertRaisesRegex(exceptions.RTIOUnderflow, "at 42") as context:
+            self.run_kernel(script)
+        traceback = context.exception.artiq_core_exception.traceback
+        self.assertEqual([address for *_, address in traceback],
+                         [0x200, 0x100, None])
+        self.comm.check_system_info()
+
+    def test_async_rpc_order(self):
+        calls = []
+        def script(session):
+            for i in range(100):
+                session.rpc(1, [(b"i", i)], asynchronous=True)
+            session.rpc(2, return_tags=b"li")
+            session.rpc(1, [(b"i", 100)], asynchronous=True)
+        self.run_kernel(script, calls.append, lambda: list(calls))
+        self.assertEqual(calls, list(range(101)))
+
+    def test_async_rpc_drain(self):
+        # The script only unblocks the first async RPC once it has sent
+        # more data than fits in the socket buffers, which the host has
+        # to read while that RPC is running.
+        sent = threading.Event()
+        unblocked = []
+        received = []
+        def script(session):
+            session.rpc(1, asynchronous=True)
+            for _ in range(20):
+                session.rpc(2, [(b"B", bytes(10**6))], asynchronous=True)
+            sent.set()
+        def wait():
+            unblocked.append(sent.wait(10.0))
+        self.run_kernel(script, wait, lambda data: received.append(len(data)))
+        self.assertEqual(unblocked, [True])
+        self.assertEqual(received, [10**6]*20)
+
+    def test_async_rpc_exception(self):
+        calls = []
+        def service(value):
+            calls.append(value)
+            if value == 1:
+                raise _UserError("failed")
+        def script(session):
+            for i in range(3):
+                session.rpc(1, [(b"i", i)], asynchronous=True)
+        with self.assertRaisesRegex(_UserError, "failed"):
+            self.run_kernel(script, service)
+        self.assertEqual(calls, [0, 1])
+
+        # The exception is reported once.
+        self.run_kernel(lambda session: None)
+
+    def test_async_rpc_exception_before_rpc(self):
+        def fail():
+            raise _UserError("failed")
+        calls = []
+        def script(session):
+            session.rpc(1, asynchronous=True)
+            session.rpc(2)
+        with self.assertRaisesRegex(_UserError, "failed"):
+            self.run_kernel(script, fail, lambda: calls.append(None))
+        self.assertEqual(calls, [])
+
+    def test_watchdog_expired(self):
+        with self.assertRaises(exceptions.WatchdogExpired):
+            self.run_kernel(lambda session: session.watchdog_expired())
+
+    def test_reconnect(self):
+        self.run_kernel(lambda session: None)
+        self.comm.close()
+        self.run_kernel(lambda session: None)
+        self.assertEqual(self.emulator.kernels_run, 2)
+
+
+class ProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.emulator = CommKernelEmulator()
+        self.emulator.start()
+        self.core = Core(None, host=None, ref_period=1e-9, profile=True)
+        self.core.comm = CommKernel("127.0.0.1", self.emulator.port)
+        self.embedding_map = EmbeddingMap()
+
+    def tearDown(self):
+        self.core.close()
+        self.emulator.stop()
+
+    def run_kernel(self, script, *services):
+        self.emulator.script = script
+        for service in services:
+            self.embedding_map.store_object(service)
+        profile = KernelProfile("kernel")
+        self.core._run_compiled(b"kernel", self.embedding_map,
+                                lambda addresses: [], lambda symbols: symbols,
+                                profile)
+        return profile
+
+    def test_services(self):
+        def square(x):
+            time.sleep(0.01)
+            return x*x
+        def record(x):
+            time.sleep(0.01)
+
+        def script(session):
+            for i in range(3):
+                session.rpc(1, [(b"i", i)], return_tags=b"i")
+                session.rpc(2, [(b"i", i)], asynchronous=True)
+            session.rpc(2, [(b"i", 3)])
+        profile = self.run_kernel(script, square, record)
+
+        self.assertEqual([(service.name, service.asynchronous, service.calls)
+                          for service in profile.services],
+                         [("ProfileTest.test_services.<locals>.square", False, 3),
+                          ("ProfileTest.test_services.<locals>.record", True, 3),
+                          ("ProfileTest.test_services.<locals>.record", False, 1)])
+        square_profile, record_profile, _ = profile.services
+        self.assertGreaterEqual(square_profile.time, 0.03)
+        self.assertGreaterEqual(record_profile.time, 0.03)
+        # header, async flag, service, tagged argument, end of arguments
+        # and return tags; header, return tags and value.
+        self.assertEqual(square_profile.bytes_received, 3*(5 + 1 + 4 + 5 + 1 + 5))
+        self.assertEqual(square_profile.bytes_sent, 3*(5 + 5 + 4))
+        self.assertEqual(record_profile.bytes_sent, 0)
+        self.assertGreaterEqual(profile.rpc_time, 0.04)
+
+    def test_phases(self):
+        profile = self.run_kernel(lambda session: time.sleep(0.05))
+        self.assertEqual(list(self.core.profiles), [profile])
+        self.assertGreaterEqual(profile.device_time, 0.05)
+        self.assertGreater(profile.load_time, 0)
+        self.assertEqual(profile.rpc_time, 0)
+        self.assertLess(profile.async_drain_time, 0.05)
+        self.assertEqual(profile.services, [])
+        self.assertAlmostEqual(profile.total_time(),
+                               profile.load_time + profile.device_time +
+                               profile.async_drain_time)
+
+    def test_async_drain(self):
+        def record():
+            time.sleep(0.1)
+        profile = self.run_kernel(
+            lambda session: session.rpc(1, asynchronous=True), record)
+        self.assertGreaterEqual(profile.async_drain_time, 0.05)
+        self.assertLess(profile.device_time, 0.05)
+        self.assertAlmostEqual(profile.total_time(),
+                               profile.load_time + profile.device_time +
+                               profile.rpc_time + profile.async_drain_time)
+
+    def test_max_profiles(self):
+        core = Core(None, host=None, ref_period=1e-9, max_profiles=2)
+        self.assertEqual(core.profiles.maxlen, 2)
+        self.core.profiles = deque(maxlen=2)
+        profiles = [self.run_kernel(lambda session: None) for _ in range(3)]
+        self.assertEqual(list(self.core.profiles), profiles[1:])
+
+    def test_exception(self):
+        def fail():
+            raise _UserError("failed")
+        with self.assertRaises(_UserError):
+            self.run_kernel(lambda session: session.rpc(1), fail)
+        profile, = self.core.profiles
+        self.assertEqual(profile.services[0].calls, 1)
+        self.assertGreater(profile.device_time, 0)
+
+    def test_report(self):
+        profile = self.run_kernel(lambda session: session.rpc(1), lambda: None)
+        report = str(profile)
+        self.assertTrue(report.startswith("kernel kernel: "))
+        self.assertIn("<lambda>", report)
+        self.assertEqual(json.loads(profile.to_json())["services"][0]["calls"], 1)
@@ -0,0 +1,209 @@
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from artiq.master.databases import DatasetDB
+from artiq.master.worker_db import DatasetManager
+from artiq.protocols import pyon
+from artiq.protocols.sync_struct import process_mod
+from artiq.tools import ring_dataset_view
+
+
+class MockDatasetDB:
+    def __init__(self):
+        self.data = dict()
+        self.mods = []
+
+    def get(self, key):
+        return self.data[key][1]
+
+    def update(self, mod):
+        # serialize like the worker pipe does, as mods may reference
+        # structures that are mutated afterwards
+        self.mods.append(pyon.decode(pyon.encode(mod)))
+
+
+class DatasetDBCase(unittest.TestCase):
+    def test_watch(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ddb = DatasetDB(os.path.join(tmpdir, "dataset_db.pyon"))
+            changed = []
+            def watcher(key):
+                changed.append(key)
+            ddb.watch(watcher)
+            ddb.set("a", [1])
+            ddb.update({"action": "append", "path": ["a", 1], "x": 2})
+            ddb.update({"action": "setitem", "path": [], "key": "b",
+                        "value": (False, 3)})
+            ddb.delete("b")
+            ddb.unwatch(watcher)
+            ddb.set("c", 4)
+        self.assertEqual(changed, ["a", "a", "b", "b"])
+
+
+class AppendCase(unittest.TestCase):
+    def setUp(self):
+        self.ddb = MockDatasetDB()
+        self.dataset_mgr = DatasetManager(self.ddb)
+
+    def test_append_local(self):
+        self.dataset_mgr.set("x", [])
+        self.dataset_mgr.append_to("x", 1)
+        self.dataset_mgr.append_to("x", 2)
+        self.assertEqual(self.dataset_mgr.local["x"], [1, 2])
+        self.assertEqual(self.ddb.mods, [])
+
+    def test_append_broadcast(self):
+        self.dataset_mgr.set("x", [0], broadcast=True)
+        for i in range(1, 4):
+            self.dataset_mgr.append_to("x", i)
+        self.assertEqual(self.dataset_mgr.local["x"], [0, 1, 2, 3])
+        self.assertEqual(self.ddb.mods[-1],
+                         {"action": "append", "path": ["x", 1], "x": 3})
+
+        replica = dict()
+        for mod in self.ddb.mods:
+            process_mod(replica, mod)
+        self.assertEqual(replica, {"x": (False, [0, 1, 2, 3])})
+
+    def test_append_nonexistent(self):
+        with self.assertRaises(KeyError):
+            self.dataset_mgr.append_to("x", 1)
+
+
+class RingCase(unittest.TestCase):
+    def setUp(self):
+        self.ddb = MockDatasetDB()
+        self.dataset_mgr = DatasetManager(self.ddb)
+
+    def test_ring(self):
+        self.dataset_mgr.set("x", [], ring=3)
+        np.testing.assert_equal(self.dataset_mgr.get("x"), [])
+        for i in range(5):
+            self.dataset_mgr.append_to("x", i)
+            np.testing.assert_equal(self.dataset_mgr.get("x"),
+                                    range(max(0, i - 2), i + 1))
+
+    def test_ring_initial(self):
+        self.dataset_mgr.set("x", [1.0, 2.0, 3.0, 4.0], ring=3)
+        np.testing.assert_equal(self.dataset_mgr.get("x"), [2.0, 3.0, 4.0])
+        self.dataset_mgr.append_to("x", 5.0)
+        np.testing.assert_equal(self.dataset_mgr.get("x"), [3.0, 4.0, 5.0])
+
+    def test_ring_broadcast(self):
+        self.dataset_mgr.set("x", [], broadcast=True, ring=4)
+        # the first sample allocates the buffer
+        self.dataset_mgr.append_to("x", 0)
+        for i in range(1, 10):
+            n = len(self.ddb.mods)
+            self.dataset_mgr.append_to("x", i)
+            for mod in self.ddb.mods[n:]:
+                self.assertEqual(mod["action"], "setitem")
+                self.assertNotIsInstance(mod["value"], (list, np.ndarray))
+
+        replica = dict()
+        for mod in self.ddb.mods:
+            process_mod(replica, mod)
+        np.testing.assert_equal(ring_dataset_view(replica["x"][1]),
+                                [6, 7, 8, 9])
+
+    def test_ring_dtype(self):
+        self.dataset_mgr.set("x", [], ring=2)
+        self.dataset_mgr.append_to("x", 1)
+        self.assertEqual(self.dataset_mgr.get("x").dtype, np.int_)
+        self.dataset_mgr.set("y", [], ring=2)
+        self.dataset_mgr.append_to("y", [1.0, 2.0])
+        np.testing.assert_equal(self.dataset_mgr.get("y"), [[1.0, 2.0]])
+
+    def test_ring_size(self):
+        for size in [0, -1]:
+            with self.assertRaises(ValueError):
+                self.dataset_mgr.set("x", [], ring=size)
+        self.dataset_mgr.set("x", [], ring=1)
+        for i in range(3):
+            self.dataset_mgr.append_to("x", i)
+        np.testing.assert_equal(self.dataset_mgr.get("x"), [2])
+
+    def test_plain_dict(self):
+        value = {"ring": [1, 2], "head": 0, "length": 2}
+        self.dataset_mgr.set("x", value)
+        self.assertEqual(self.dataset_mgr.get("x"), value)
+        with self.assertRaises(ValueError):
+            self.dataset_mgr.set("y", {"__ring__": None})
+
+    def test_ring_hdf5(self):
+        self.dataset_mgr.set("x", [0, 1, 2], ring=2)
+        with h5py.File("datasets.h5", "w", "core", backing_store=False) as f:
+            self.dataset_mgr.write_hdf5(f)
+            np.testing.assert_equal(f["datasets"]["x"][()], [1, 2])
+
+
+class HDF5OptionsCase(unittest.TestCase):
+    def setUp(self):
+        self.ddb = MockDatasetDB()
+        self.dataset_mgr = DatasetManager(self.ddb)
+
+    def write(self, policy=None):
+        f = h5py.File("datasets.h5", "w", "core", backing_store=False)
+        self.addCleanup(f.close)
+        self.dataset_mgr.write_hdf5(f, policy)
+        return f
+
+    def test_default(self):
+        self.dataset_mgr.set("counts", np.arange(100))
+        f = self.write()
+        self.assertIsNone(f["datasets"]["counts"].compression)
+        self.assertIsNone(f["datasets"]["counts"].chunks)
+
+    def test_options(self):
+        self.dataset_mgr.set("counts", np.arange(100, dtype=np.float64),
+                             hdf5_options={"compression": "gzip",
+                                           "shuffle": True,
+                                           "dtype": "float32"})
+        f = self.write()
+        counts = f["datasets"]["counts"]
+        self.assertEqual(counts.compression, "gzip")
+        self.assertTrue(counts.shuffle)
+        self.assertEqual(counts.dtype, np.float32)
+        np.testing.assert_equal(counts[()], np.arange(100))
+
+    def test_options_cleared(self):
+        self.dataset_mgr.set("counts", np.arange(100),
+                             hdf5_options={"compression": "gzip"})
+        self.dataset_mgr.set("counts", np.arange(100))
+        f = self.write()
+        self.assertIsNone(f["datasets"]["counts"].compression)
+
+    def test_policy(self):
+        self.dataset_mgr.set("a.counts", np.arange(100))
+        self.dataset_mgr.set("a.scalar", 42)
+        self.dataset_mgr.set("b.counts", np.arange(100),
+                             hdf5_options={"compression": "lzf"})
+        self.dataset_mgr.set("c", np.arange(100))
+        policy = [("*.counts", {"compression": "gzip"})]
+        f = self.write(policy)
+        self.assertEqual(f["datasets"]["a.counts"].compression, "gzip")
+        self.assertEqual(f["datasets"]["a.scalar"][()], 42)
+        self.assertEqual(f["datasets"]["b.counts"].compression, "lzf")
+        self.assertIsNone(f["datasets"]["c"].compression)
+
+    def test_compression(self):
+        counts = np.random.RandomState(0).poisson(
+            3.0, size=(100, 1000)).astype(np.int32)
+        sizes = []
+        for options in [None,
+                        {"compression": "lzf", "shuffle": True},
+                        {"compression": "gzip", "compression_opts": 4,
+                         "shuffle": True}]:
+            self.dataset_mgr.set("counts", counts, hdf5_options=options)
+            with h5py.File("datasets.h5", "w", "core",
+                           backing_store=False) as f:
+                self.dataset_mgr.write_hdf5(f)
+                np.testing.assert_equal(f["datasets"]["counts"][()], counts)
+                sizes.append(f["datasets"]["counts"].id.get_storage_size())
+        self.assertEqual(sizes[0], counts.nbytes)
+        self.assertLess(sizes[1], sizes[0])
+        self.assertLess(sizes[2], sizes[1])
@@ -0,0 +1,107 @@
+import unittest
+
+import numpy
+
+from artiq.language.scan import (RangeScan, ExplicitScan, NoScan,
+                                 MultiScanManager)
+
+
+class RangeScanTest(unittest.TestCase):
+    def test_linear(self):
+        self.assertEqual(list(RangeScan(0.0, 1.0, 5)),
+                         [0.0, 0.25, 0.5, 0.75, 1.0])
+        self.assertEqual(list(RangeScan(1.0, 0.0, 3)), [1.0, 0.5, 0.0])
+        self.assertEqual(list(RangeScan(2.0, 3.0, 1)), [2.0])
+        self.assertEqual(list(RangeScan(2.0, 3.0, 0)), [])
+
+    def test_point(self):
+        scan = RangeScan(-1.0, 1.0, 5)
+        self.assertEqual([scan.point(i) for i in range(len(scan))],
+                         list(scan))
+        self.assertEqual(scan.sequence, list(scan))
+
+    def test_lazy(self):
+        scan = RangeScan(0.0, 1.0, 10**9)
+        self.assertEqual(len(scan), 10**9)
+        self.assertEqual(scan.point(10**9 - 1), 1.0)
+        self.assertEqual(len(scan.permutation), 0)
+
+    def test_randomize(self):
+        scan = RangeScan(0.0, 1.0, 101, randomize=True, seed=42)
+        values = list(scan)
+        self.assertNotEqual(values, sorted(values))
+        self.assertEqual(sorted(values), list(RangeScan(0.0, 1.0, 101)))
+        self.assertEqual(values, list(scan))
+        self.assertEqual(
+            values, list(RangeScan(0.0, 1.0, 101, randomize=True, seed=42)))
+        self.assertEqual(scan.permutation.dtype, numpy.int32)
+        self.assertIsInstance(values[0], float)
+
+    def test_independent_iterators(self):
+        scan = RangeScan(0.0, 1.0, 3, randomize=True, seed=0)
+        pairs = [(x, y) for x in scan for y in scan]
+        self.assertEqual(len(pairs), 9)
+        self.assertEqual(sorted(set(x for x, _ in pairs)), [0.0, 0.5, 1.0])
+
+
+class MultiScanManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = MultiScanManager(
+            ("a", RangeScan(0.0, 1.0, 3, randomize=True, seed=0)),
+            ("b", ExplicitScan([1, 2])),
+            ("c", NoScan(5.0, 2)))
+
+    def test_iterate(self):
+        points = [(point.a, point.b, point.c) for point in self.manager]
+        a = list(self.manager.scan_objects[0])
+        self.assertEqual(points, [(x, y, 5.0) for x in a for y in [1, 2]
+                                  for _ in range(2)])
+        self.assertEqual(len(self.manager), 12)
+        self.assertEqual(self.manager.shape, (3, 2, 2))
+        self.assertEqual(list(self.manager)[0].attr, {"a", "b", "c"})
+
+    def test_getitem(self):
+        points = list(self.manager)
+        for i in range(-len(points), len(points)):
+            self.assertEqual(vars(self.manager[i]), vars(points[i]))
+        with self.assertRaises(IndexError):
+            self.manager[len(points)]
+
+    def test_points(self):
+        points = self.manager.points()
+        self.assertEqual(points.dtype.names, ("a", "b", "c"))
+        self.assertEqual([tuple(point) for point in points],
+                         [(point.a, point.b, point.c) for point in self.manager])
+        numpy.testing.assert_equal(self.manager.points(3, 5), points[3:5])
+        numpy.testing.assert_equal(self.manager.points(-2), points[-2:])
+        self.assertEqual(len(self.manager.points(5, 3)), 0)
+
+    def test_chunks(self):
+        chunks = list(self.manager.chunks(5))
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 2])
+        numpy.testing.assert_equal(numpy.concatenate(chunks),
+                                   self.manager.points())
+
+    def test_empty(self):
+        manager = MultiScanManager(("a", RangeScan(0.0, 1.0, 0)),
+                                   ("b", NoScan(1.0)))
+        self.assertEqual(list(manager), [])
+        self.assertEqual(len(manager.points()), 0)
+        self.assertEqual(list(manager.chunks(10)), [])
+
+    def test_repeated_names(self):
+        manager = MultiScanManager(("a", ExplicitScan([1, 2])),
+                                   ("a", NoScan(3.0)))
+        self.assertEqual([point.a for point in manager], [3.0, 3.0])
+        self.assertEqual(manager[1].a, 3.0)
+        with self.assertRaises(ValueError):
+            manager.points()
+
+    def test_non_scalar(self):
+        manager = MultiScanManager(("a", ExplicitScan([1, 2])),
+                                   ("b", NoScan([1.0, 2.0])),
+                                   ("c", NoScan("abc")))
+        self.assertEqual(manager.axes[1].dtype, object)
+        points = manager.points()
+        self.assertEqual([tuple(point) for point in points],
+                         [(1, [1.0, 2.0], "abc"), (2, [1.0, 2.0], "abc")])
@@ -3,8 +3,13 @@ import logging
 import asyncio
 import sys
 import os
+import glob
+import tempfile
 from time import time, sleep
 
+import h5py
+import numpy
+
 from artiq.experiment import *
 from artiq.master.scheduler import Scheduler
 
@@ -31,10 +36,32 @@ class BackgroundExperiment(EnvExperiment):
                              broadcast=True, save=False)
 
 
+class _BlockingValue:
+    # Blocks the writing of the results until the file ``path`` exists,
+    # after creating ``path + ".started"``.
+    def __init__(self, path):
+        self.path = path
+
+    def __array__(self, dtype=None):
+        open(self.path + ".started", "w").close()
+        deadline = time() + 10.0
+        while not os.path.exists(self.path) and time() < deadline:
+            sleep(0.01)
+        return numpy.zeros(1)
+
+
+class SlowWriteExperiment(EnvExperiment):
+    def build(self):
+        self.setattr_argument("gate", StringValue())
+
+    def run(self):
+        self.set_dataset("x", _BlockingValue(self.gate))
+
+
 def _get_expid(name):
     return {
         "log_level": logging.WARNING,
-        "file": sys.modules[__name__].__file__,
+        "file": os.path.abspath(sys.modules[__name__].__file__),
         "class_name": name,
         "arguments": dict()
     }
@@ -80,6 +107,10 @@ class SchedulerCase(unittest.TestCase):
         else:
             self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
+        # Workers write the results of the runs into the current directory.
+        self.cwd = os.getcwd()
+        self.results_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.results_dir.name)
 
     def test_steps(self):
         loop = self.loop
@@ -219,5 +250,66 @@ class SchedulerCase(unittest.TestCase):
         loop.run_until_complete(done.wait())
         loop.run_until_complete(scheduler.stop())
 
+    def test_background_write(self):
+        loop = self.loop
+        scheduler = Scheduler(_RIDCounter(100), dict(), None)
+        expid_slow = _get_expid("SlowWriteExperiment")
+        expid = _get_expid("EmptyExperiment")
+
+        events = []
+        deleted = {100: asyncio.Event(), 101: asyncio.Event()}
+        def notify(mod):
+            if mod["action"] == "setitem" and mod["key"] == "status" \
+                    and mod["value"] in ("analyzing", "deleting"):
+                events.append((mod["path"][0], mod["value"]))
+            if mod["action"] == "delitem" and mod["key"] in deleted:
+                deleted[mod["key"]].set()
+        scheduler.notifier.publish = notify
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            gate = os.path.join(tmpdir, "gate")
+            expid_slow["arguments"] = {"gate": gate}
+            scheduler.start()
+            scheduler.submit("main", expid_slow, 0, None, False)
+            scheduler.submit("main", expid, 0, None, False)
+
+            # RID 101 is analyzed and deleted while RID 100 is still being
+            # written.
+            loop.run_until_complete(asyncio.wait_for(deleted[101].wait(), 20))
+            self.assertEqual(events, [(100, "analyzing"), (101, "analyzing"),
+                                      (101, "deleting")])
+
+            open(gate, "w").close()
+            loop.run_until_complete(asyncio.wait_for(deleted[100].wait(), 20))
+            self.assertEqual(events[-1], (100, "deleting"))
+            loop.run_until_complete(scheduler.stop())
+
+    def test_stop_during_write(self):
+        loop = self.loop
+        scheduler = Scheduler(_RIDCounter(200), dict(), None)
+        expid = _get_expid("SlowWriteExperiment")
+
+        async def wait_for_file(path):
+            while not os.path.exists(path):
+                await asyncio.sleep(0.01)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            gate = os.path.join(tmpdir, "gate")
+            expid["arguments"] = {"gate": gate}
+            scheduler.start()
+            scheduler.submit("main", expid, 0, None, False)
+            loop.run_until_complete(
+                asyncio.wait_for(wait_for_file(gate + ".started"), 20))
+            # longer than the time given to workers to terminate
+            loop.call_later(3.0, lambda: open(gate, "w").close())
+            loop.run_until_complete(scheduler.stop())
+
+        filename, = glob.glob(os.path.join(
+            "results", "*", "*", "000000200-SlowWriteExperiment.h5"))
+        with h5py.File(filename, "r") as f:
+            self.assertIn("x", f["datasets"])
+
     def tearDown(self):
         self.loop.close()
+        os.chdir(self.cwd)
+        self.results_dir.cleanup()
@@ -3,9 +3,11 @@ import logging
 import asyncio
 import sys
 import os
+import tempfile
 from time import sleep
 
 from artiq.experiment import *
+from artiq.master.databases import DeviceDB, DatasetDB
 from artiq.master.worker import *
 
 
@@ -53,6 +55,40 @@ class WatchdogTimeoutInBuild(EnvExperiment):
         pass
 
 
+class DatasetCache(EnvExperiment):
+    def build(self):
+        pass
+
+    def run(self):
+        for i in range(3):
+            assert self.get_dataset("x", archive=False) == 1
+        self.set_dataset("x", 2, broadcast=True, save=False)
+        assert self.get_dataset("x", archive=False) == 2
+
+
+class DatasetCacheInvalidation(EnvExperiment):
+    def build(self):
+        pass
+
+    def run(self):
+        with watchdog(5*s):
+            assert self.get_dataset("x", archive=False) == 1
+            # makes the master change x once the reply has been sent
+            self.get_dataset("trigger", archive=False)
+            sleep(0.5)
+            assert self.get_dataset("x", archive=False) == 2
+
+
+class DeviceDBSnapshot(EnvExperiment):
+    def build(self):
+        self.setattr_device("dev")
+        self.setattr_device("alias")
+
+    def run(self):
+        for i in range(3):
+            assert "dev" in self.get_device_db()
+
+
 async def _call_worker(worker, expid):
     try:
         await worker.build(0, "main", None, expid, 0)
@@ -63,7 +99,7 @@ async def _call_worker(worker, expid):
         await worker.close()
 
 
-def _run_experiment(class_name):
+def _run_experiment(class_name, handlers={}):
     expid = {
         "log_level": logging.WARNING,
         "file": sys.modules[__name__].__file__,
@@ -71,7 +107,7 @@ def _run_experiment(class_name):
         "arguments": dict()
     }
     loop = asyncio.get_event_loop()
-    worker = Worker({})
+    worker = Worker(handlers)
     loop.run_until_complete(_call_worker(worker, expid))
 
 
@@ -105,5 +141,72 @@ class WorkerCase(unittest.TestCase):
         with self.assertRaises(WorkerWatchdogTimeout):
             _run_experiment("WatchdogTimeoutInBuild")
 
+    @unittest.skipIf(os.name == "nt", "dataset cache not supported")
+    def test_dataset_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dataset_db = DatasetDB(os.path.join(tmpdir, "dataset_db.pyon"))
+            dataset_db.set("x", 1)
+            reads = []
+            def get_dataset(key):
+                reads.append(key)
+                return dataset_db.get(key)
+            handlers = {
+                "get_dataset": get_dataset,
+                "update_dataset": dataset_db.update,
+                "watch_datasets": dataset_db.watch,
+                "unwatch_datasets": dataset_db.unwatch
+            }
+            _run_experiment("DatasetCache", handlers)
+        self.assertEqual(reads, ["x", "x"])
+
+    @unittest.skipIf(os.name == "nt", "dataset cache not supported")
+    def test_dataset_cache_invalidation(self):
+        # The invalidation arrives while the worker is not waiting for a
+        # reply, and is read by the next get_dataset.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dataset_db = DatasetDB(os.path.join(tmpdir, "dataset_db.pyon"))
+            dataset_db.set("x", 1)
+            dataset_db.set("trigger", None)
+            reads = []
+            def get_dataset(key):
+                reads.append(key)
+                if key == "trigger":
+                    asyncio.get_event_loop().call_later(
+                        0.1, dataset_db.set, "x", 2)
+                return dataset_db.get(key)
+            handlers = {
+                "get_dataset": get_dataset,
+                "update_dataset": dataset_db.update,
+                "watch_datasets": dataset_db.watch,
+                "unwatch_datasets": dataset_db.unwatch
+            }
+            _run_experiment("DatasetCacheInvalidation", handlers)
+        self.assertEqual(reads, ["x", "trigger", "x"])
+
+    def test_device_db_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            device_db_file = os.path.join(tmpdir, "device_db.py")
+            with open(device_db_file, "w") as f:
+                f.write("device_db = {\"dev\": {\"type\": \"dummy\"}, "
+                        "\"alias\": \"dev\"}")
+            device_db = DeviceDB(device_db_file)
+            snapshots = []
+            def get_snapshot(version):
+                snapshot = device_db.get_snapshot(version)
+                snapshots.append(snapshot)
+                return snapshot
+            handlers = {
+                "get_device_db_snapshot": get_snapshot
+            }
+            _run_experiment("DeviceDBSnapshot", handlers)
+            self.assertEqual(snapshots, [(0, device_db.get_device_db())])
+
+            device_db.scan()
+            self.assertIsNone(device_db.get_snapshot(0))
+            with open(device_db_file, "w") as f:
+                f.write("device_db = {}")
+            device_db.scan()
+            self.assertEqual(device_db.get_snapshot(0), (1, {}))
+
     def tearDown(self):
         self.loop.close()
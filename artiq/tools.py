@@ -15,7 +15,10 @@ from artiq.appdirs import user_config_dir
 from artiq import __version__ as artiq_version
 
 
-__all__ = ["parse_arguments", "elide", "short_format", "file_import",
+__all__ = ["parse_arguments", "elide", "short_format",
+           "RING_DATASET_KEY", "make_ring_dataset", "make_ring_buffer",
+           "is_ring_dataset", "ring_dataset_view",
+           "file_import",
            "get_experiment", "verbosity_args", "simple_network_args",
            "multiline_log_config", "init_logger", "bind_address_from_args",
            "atexit_register_coroutine", "exc_to_warning",
@@ -54,9 +57,59 @@ def elide(s, maxlen):
     return s
 
 
+# Key of the sample buffer in the value of a ring buffer dataset, which
+# plain dict datasets may not use.
+RING_DATASET_KEY = "__ring__"
+
+
+def make_ring_dataset(samples, size):
+    """Creates the value of a ring buffer dataset holding ``size`` samples,
+    initialized with the last samples of ``samples``.
+
+    The returned structure can be synchronized with ``sync_struct``; each
+    new sample only modifies one buffer element and the head index. If
+    ``samples`` is empty, the buffer is allocated when the first sample is
+    appended, with the type of that sample."""
+    if size < 1:
+        raise ValueError("ring buffer datasets must hold at least one sample")
+    samples = np.asarray(samples)
+    n = min(len(samples), size)
+    if n:
+        buffer = np.zeros((size,) + samples.shape[1:], samples.dtype)
+        buffer[:n] = samples[len(samples)-n:]
+    else:
+        buffer = None
+    return {RING_DATASET_KEY: buffer, "size": size,
+            "head": n % size, "length": n}
+
+
+def make_ring_buffer(size, sample):
+    """Allocates the buffer of a ring buffer dataset that was created
+    empty, for samples like ``sample``."""
+    sample = np.asarray(sample)
+    return np.zeros((size,) + sample.shape, sample.dtype)
+
+
+def is_ring_dataset(v):
+    return type(v) is dict and RING_DATASET_KEY in v
+
+
+def ring_dataset_view(v):
+    """Returns the samples of a ring buffer dataset, oldest first."""
+    buffer, head, length = v[RING_DATASET_KEY], v["head"], v["length"]
+    if buffer is None:
+        return np.zeros(0)
+    elif length < len(buffer):
+        return buffer[:length]
+    else:
+        return np.concatenate((buffer[head:], buffer[:head]))
+
+
 def short_format(v):
     if v is None:
         return "None"
+    if is_ring_dataset(v):
+        return "ring ({}/{})".format(v["length"], v["size"])
     t = type(v)
     if np.issubdtype(t, np.number) or np.issubdtype(t, np.bool_):
         return str(v)